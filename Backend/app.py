@@ -4,6 +4,8 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
 from config import Config
+from utils.negotiation import NegotiatingJSONProvider, compress_response
+from utils.cache import single_flight
 import datetime
 from werkzeug.security import generate_password_hash
 
@@ -12,15 +14,41 @@ from auth.routes import auth_bp
 from routes.admin import admin_bp
 from routes.faculty import faculty_bp
 from routes.student import student_bp
+from routes.events import events_bp
+from routes.jobs import jobs_bp
+from routes.calendar import calendar_bp
+from routes.rooms import rooms_bp
+from models.user import User
+from models.timetable import Timetable
+from models.class_session import ClassSession
+from models.room import Room
+from services.notification import NotificationService
+from services.events import event_broker
+from services.cache_bus import cache_bus
+from services.retention import NotificationRetention
+from services.background import PeriodicTask
+from services.jobs import JobQueue, JobWorkerPool
+from services.session_stats import SessionStats
+from services.calendar_feed import CalendarFeed
+from services.free_busy import FreeBusy
+from services.session_conflicts import SessionConflicts
+from services.history_search import HistorySearch
+from services.reminders import reminder_scheduler
+from services.sms_digest import SmsDigest
+from services.user_import import UserImporter
+import services.job_handlers  # Registers background job handlers
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+app.json = NegotiatingJSONProvider(app)
+app.after_request(compress_response)
 CORS(app)
 
 # Load configuration
 app.config.from_object(Config)
+single_flight.ttl = Config.SINGLE_FLIGHT_TTL_MS / 1000
 
 # MongoDB connection
 try:
@@ -51,6 +79,69 @@ try:
         print("Default admin user created with credentials:")
         print("Registration Number: ADM001")
         print("Password: admin123")
+    
+    # Ensure indexes used by the hot read paths
+    with app.app_context():
+        User.ensure_indexes()
+        Timetable.ensure_indexes()
+        ClassSession.ensure_indexes()
+        Room.ensure_indexes()
+        SessionStats.ensure_indexes()
+        SessionConflicts.ensure_indexes()
+        CalendarFeed.ensure_indexes()
+        FreeBusy.ensure_indexes()
+        HistorySearch.ensure_indexes()
+        reminder_scheduler.ensure_indexes()
+        SmsDigest.ensure_indexes()
+        NotificationService.ensure_indexes()
+        NotificationRetention.ensure_indexes()
+        JobQueue.ensure_indexes()
+        UserImporter.ensure_indexes()
+    
+    # Process pools started from a forkserver or spawned import this module
+    # again as __mp_main__; only the server itself runs background work
+    if __name__ != '__mp_main__':
+        # Start tailing the shared event stream for push delivery
+        event_broker.start(db, Config.EVENTS_COLLECTION_SIZE)
+        
+        # Follow changes that invalidate in-process caches on every worker
+        cache_bus.start(db, Config.CACHE_EVENTS_COLLECTION_SIZE)
+        
+        # Archive expired notifications in the background
+        PeriodicTask(
+            app,
+            "notification-archiver",
+            Config.NOTIFICATION_ARCHIVE_INTERVAL_SECONDS,
+            NotificationRetention.run
+        ).start()
+        
+        # Re-scan for group clashes missed by the write paths
+        PeriodicTask(
+            app,
+            "conflict-rescan",
+            Config.CONFLICT_RESCAN_INTERVAL_SECONDS,
+            SessionConflicts.run
+        ).start()
+        
+        # Send SMS digests whose window has closed
+        PeriodicTask(
+            app,
+            "sms-digest",
+            Config.SMS_DIGEST_FLUSH_SECONDS,
+            SmsDigest.run
+        ).start()
+        
+        # Remind faculty and students shortly before classes and meetings
+        reminder_scheduler.start(
+            app,
+            Config.REMINDER_LEAD_MINUTES,
+            Config.REMINDER_HORIZON_HOURS,
+            Config.REMINDER_TICK_SECONDS,
+            Config.REMINDER_REFRESH_SECONDS
+        )
+        
+        # Run queued background jobs
+        JobWorkerPool(app, Config.JOB_WORKERS, Config.JOB_POLL_SECONDS).start()
 except Exception as e:
     print(f"MongoDB connection error: {e}")
     # Don't crash if MongoDB is not available during startup
@@ -61,6 +152,10 @@ app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(faculty_bp, url_prefix='/api/faculty')
 app.register_blueprint(student_bp, url_prefix='/api/student')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+app.register_blueprint(calendar_bp, url_prefix='/api/calendar')
+app.register_blueprint(rooms_bp, url_prefix='/api/rooms')
 
 # Error handlers
 @app.errorhandler(404)
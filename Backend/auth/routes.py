@@ -30,7 +30,7 @@ def register():
         return jsonify({"error": "Invalid registration number format"}), 400
     
     # Check if user already exists
-    if get_db().users.find_one({"registration_number": reg_number}):
+    if get_db().users.find_one({"registration_number": reg_number}, {"_id": 1}):
         return jsonify({"error": "Registration number already exists"}), 409
     
     # If new user, proceed to password creation
@@ -85,7 +85,10 @@ def login():
     print(f"Login attempt: registration_number={reg_number}")
     
     # Find user by registration number
-    user = get_db().users.find_one({"registration_number": reg_number})
+    user = get_db().users.find_one(
+        {"registration_number": reg_number},
+        {"password": 1, "registration_number": 1, "role": 1, "name": 1}
+    )
     
     if not user:
         print(f"User not found: {reg_number}")
@@ -135,7 +138,7 @@ def reset_password_request():
     reg_number = data.get('registration_number')
     
     # Find user by registration number
-    user = get_db().users.find_one({"registration_number": reg_number})
+    user = get_db().users.find_one({"registration_number": reg_number}, {"_id": 1})
     
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -175,7 +178,10 @@ def reset_password():
     new_password = data.get('new_password')
     
     # Find user by registration number
-    user = get_db().users.find_one({"registration_number": reg_number})
+    user = get_db().users.find_one(
+        {"registration_number": reg_number},
+        {"reset_token": 1, "reset_token_expiry": 1}
+    )
     
     if not user:
         return jsonify({"error": "User not found"}), 404
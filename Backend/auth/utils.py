@@ -3,7 +3,7 @@ import jwt
 from flask import request, jsonify, current_app
 from functools import wraps
 import datetime
-from bson.objectid import ObjectId
+from models.user import User
 
 def validate_registration_number(reg_number):
     """
@@ -43,6 +43,10 @@ def token_required(f):
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
         
+        # EventSource cannot set headers, so event streams may pass the token in the query string
+        if not token and 'text/event-stream' in request.headers.get('Accept', ''):
+            token = request.args.get('token')
+        
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         
@@ -55,13 +59,11 @@ def token_required(f):
             )
             
             # Get current user from database
-            current_user = current_app.config['MONGO_DB'].users.find_one(
-                {"_id": ObjectId(data['sub'])}
-            )
+            current_user = User.get_principal(data['sub'])
             
             if not current_user:
                 return jsonify({'error': 'User not found'}), 401
-            
+        
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
@@ -0,0 +1,98 @@
+"""Measure how quickly the cache invalidation bus reaches other workers
+
+Starts two buses in this process, standing in for two workers, bumps
+calendar stamps the way writers do and times how long each bump takes to
+reach both buses' subscribers. Against a replica set the buses follow a
+change stream; against a standalone mongod they fall back to the capped
+`cache_events` collection.
+
+A local single-node replica set:
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval "rs.initiate()"
+
+Usage:
+    python benchmarks/cache_bus.py --mongo-uri "mongodb://localhost:27017/?replicaSet=rs0" [--events 500]
+"""
+from pymongo import MongoClient
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache_bus import CacheBus
+
+def percentile(values, fraction):
+    """Get a percentile of a list of values"""
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/?replicaSet=rs0", help="Server to run against")
+    parser.add_argument("--database", default="cache_bus_benchmark", help="Scratch database, dropped afterwards")
+    parser.add_argument("--events", type=int, default=500, help="Number of stamp bumps")
+    args = parser.parse_args()
+    
+    client = MongoClient(args.mongo_uri)
+    client.drop_database(args.database)
+    db = client[args.database]
+    
+    pending = {}
+    lock = threading.Lock()
+    
+    def on_change(key):
+        with lock:
+            waiter = pending.get(key)
+            if waiter:
+                waiter[1] -= 1
+                if waiter[1] == 0:
+                    waiter[0].set()
+    
+    buses = [CacheBus(), CacheBus()]
+    for bus in buses:
+        bus.subscribe("calendar_versions", on_change)
+        bus.start(db)
+    
+    deadline = time.monotonic() + 30
+    while not all(bus.is_live() for bus in buses):
+        if time.monotonic() > deadline:
+            print("Buses did not connect within 30 seconds")
+            return 1
+        time.sleep(0.05)
+    
+    print(f"mode: {buses[0].get_stats()['mode']}")
+    
+    latencies = []
+    missed = 0
+    for i in range(args.events):
+        key = f"faculty:benchmark-{i}"
+        done = threading.Event()
+        with lock:
+            pending[key] = [done, len(buses)]
+        
+        started = time.perf_counter()
+        db.calendar_versions.update_one({"_id": key}, {"$inc": {"version": 1}}, upsert=True)
+        buses[0].publish("calendar_versions", [key])  # Only writes on a standalone server
+        
+        if done.wait(5):
+            latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            missed += 1
+    
+    if latencies:
+        print(f"{len(latencies)} stamps reached both buses, {missed} missed")
+        print(f"p50 {statistics.median(latencies):.2f} ms, p95 {percentile(latencies, 0.95):.2f} ms, max {max(latencies):.2f} ms")
+    
+    for index, bus in enumerate(buses):
+        stats = bus.get_stats()
+        print(f"bus {index}: events {stats['events']}, mean lag {stats['mean_lag_ms']} ms, max lag {stats['max_lag_ms']} ms")
+    
+    client.drop_database(args.database)
+    return 1 if missed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""Benchmark JSON encoding of large class session list responses
+
+Compares the previous approach (converting ObjectIds to strings in a
+loop, then encoding with Flask's default provider) with MongoJSONProvider.
+
+Usage:
+    python benchmarks/json_encoding.py [--sessions 10000] [--repeat 5]
+"""
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from bson.objectid import ObjectId
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import MongoJSONProvider
+
+def make_sessions(count):
+    """Build class session documents shaped like the ones in MongoDB"""
+    faculty_ids = [ObjectId() for _ in range(50)]
+    start = datetime.datetime(2024, 1, 1, 9)
+    now = datetime.datetime.utcnow()
+    
+    return [
+        {
+            "_id": ObjectId(),
+            "faculty_id": faculty_ids[i % len(faculty_ids)],
+            "group_id": f"G{i % 20}",
+            "subject": f"Subject {i % 30}",
+            "date": start + datetime.timedelta(hours=i),
+            "duration": 1,
+            "status": "not_completed",
+            "topic": "Introduction to the topic of the week",
+            "notes": "",
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(count)
+    ]
+
+def encode_before(provider, sessions):
+    """Convert ids in a loop, then encode with Flask's default provider"""
+    classes = [dict(c) for c in sessions]
+    for c in classes:
+        c["_id"] = str(c["_id"])
+        c["faculty_id"] = str(c["faculty_id"])
+    return provider.dumps({"classes": classes, "total": len(classes)})
+
+def encode_after(provider, sessions):
+    """Encode the raw documents with the BSON-aware provider"""
+    classes = [dict(c) for c in sessions]
+    return provider.dumps_bytes({"classes": classes, "total": len(classes)})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000, help="Number of sessions in the response")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs")
+    args = parser.parse_args()
+    
+    app = Flask(__name__)
+    sessions = make_sessions(args.sessions)
+    providers = {
+        "before": (encode_before, DefaultJSONProvider(app)),
+        "after": (encode_after, MongoJSONProvider(app))
+    }
+    
+    results = {}
+    for name, (encode, provider) in providers.items():
+        with app.app_context():
+            encode(provider, sessions)  # Warm up
+            times = timeit.repeat(lambda: encode(provider, sessions), number=1, repeat=args.repeat)
+        results[name] = min(times)
+        print(f"{name:>6}: {results[name] * 1000:8.1f} ms for {args.sessions} sessions (best of {args.repeat})")
+    
+    print(f"speedup: {results['before'] / results['after']:.1f}x")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
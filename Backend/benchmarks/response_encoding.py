@@ -0,0 +1,105 @@
+"""Benchmark payload size and CPU cost of the negotiated response encodings
+
+Encodes a class session list response as JSON and MessagePack, then
+compresses each body with gzip and brotli at the configured levels, both
+in one shot and chunk by chunk as compress_response streams large bodies.
+Sessions are read from the database when --mongo-uri is given, otherwise
+a synthetic list shaped like the stored documents is used.
+
+Usage:
+    python benchmarks/response_encoding.py [--sessions 10000] [--repeat 5] [--mongo-uri URI]
+"""
+from flask import Flask
+from pymongo import MongoClient
+import argparse
+import brotli
+import msgpack
+import os
+import sys
+import timeit
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from utils.helpers import MongoJSONProvider, encode_default
+from benchmarks.json_encoding import make_sessions
+
+def load_sessions(mongo_uri, count):
+    """Read class sessions from the seeded database"""
+    db = MongoClient(mongo_uri).faculty_scheduler
+    return list(db.class_sessions.find({}).sort("date", 1).limit(count))
+
+def gzip_compress(body):
+    """Compress a body with gzip in one shot"""
+    compressor = zlib.compressobj(Config.GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+def brotli_compress(body):
+    """Compress a body with brotli in one shot"""
+    return brotli.compress(body, quality=Config.BROTLI_QUALITY)
+
+def streamed(make_compressor):
+    """Compress a body chunk by chunk, as large responses are sent"""
+    def compress(body):
+        process, finish = make_compressor()
+        size = Config.COMPRESSION_CHUNK_BYTES
+        parts = [process(body[start:start + size]) for start in range(0, len(body), size)]
+        parts.append(finish())
+        return b"".join(parts)
+    return compress
+
+def gzip_stream():
+    """Get the functions of a streaming gzip compressor"""
+    compressor = zlib.compressobj(Config.GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def brotli_stream():
+    """Get the functions of a streaming brotli compressor"""
+    compressor = brotli.Compressor(quality=Config.BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+def best_of(func, repeat):
+    """Time a function, returning the best run in milliseconds"""
+    func()  # Warm up
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000, help="Number of sessions in the response")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs")
+    parser.add_argument("--mongo-uri", help="Read sessions from this database instead of generating them")
+    args = parser.parse_args()
+    
+    sessions = load_sessions(args.mongo_uri, args.sessions) if args.mongo_uri else make_sessions(args.sessions)
+    payload = {"classes": sessions, "total": len(sessions)}
+    provider = MongoJSONProvider(Flask(__name__))
+    
+    formats = {
+        "json": lambda: provider.dumps_bytes(payload),
+        "msgpack": lambda: msgpack.packb(payload, default=encode_default)
+    }
+    compressions = {
+        "identity": lambda body: body,
+        "gzip": gzip_compress,
+        "br": brotli_compress,
+        "gzip-stream": streamed(gzip_stream),
+        "br-stream": streamed(brotli_stream)
+    }
+    
+    print(f"{len(sessions)} sessions, best of {args.repeat}")
+    print(f"{'format':<8} {'encoding':<12} {'bytes':>10} {'ratio':>6} {'encode ms':>10} {'compress ms':>12}")
+    
+    baseline = None
+    for format_name, encode in formats.items():
+        body = encode()
+        encode_ms = best_of(encode, args.repeat)
+        
+        for encoding, compress in compressions.items():
+            size = len(compress(body))
+            baseline = baseline or size
+            compress_ms = best_of(lambda: compress(body), args.repeat) if encoding != "identity" else 0.0
+            print(f"{format_name:<8} {encoding:<12} {size:>10} {size / baseline:>6.2f} {encode_ms:>10.1f} {compress_ms:>12.1f}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
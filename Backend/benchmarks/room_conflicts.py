@@ -0,0 +1,106 @@
+"""Benchmark room conflict checks and free room searches
+
+Books a semester of weekday classes into every room, then times a
+single-room conflict check and a search for free rooms across all of them
+with the per-room interval indexes, against scanning each room's bookings.
+With --mongo-uri the search also runs through RoomSchedule against the
+seeded database, once cold (indexes built) and then warm (stamps checked).
+
+Usage:
+    python benchmarks/room_conflicts.py [--rooms 300] [--weeks 18] [--repeat 5] [--mongo-uri URI]
+"""
+from flask import Flask
+from pymongo import MongoClient
+import argparse
+import datetime
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intervals import IntervalIndex
+
+def make_bookings(weeks, seed):
+    """Build one room's classes: a random share of the weekday hours over a semester"""
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1)
+    bookings = []
+    
+    for day in range(weeks * 7):
+        date = start + datetime.timedelta(days=day)
+        if date.weekday() >= 5:
+            continue
+        for hour in range(8, 18):
+            if rng.random() < 0.6:
+                class_start = date + datetime.timedelta(hours=hour)
+                bookings.append((class_start, class_start + datetime.timedelta(hours=1), {"title": "Class"}))
+    
+    return bookings
+
+def scan_overlap(bookings, start, end):
+    """Check a room by scanning every booking"""
+    return any(booking_start < end and booking_end > start for booking_start, booking_end, _ in bookings)
+
+def best_of(func, repeat, number):
+    """Time a function, returning the best run in microseconds per call"""
+    func()  # Warm up
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=300, help="Number of rooms")
+    parser.add_argument("--weeks", type=int, default=18, help="Length of the semester in weeks")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs")
+    parser.add_argument("--mongo-uri", help="Also time RoomSchedule against this seeded database")
+    args = parser.parse_args()
+    
+    rooms = {f"room-{i}": make_bookings(args.weeks, i) for i in range(args.rooms)}
+    build_ms = best_of(lambda: {room: IntervalIndex(b) for room, b in rooms.items()}, args.repeat, 1) / 1000
+    indexes = {room: IntervalIndex(bookings) for room, bookings in rooms.items()}
+    
+    start = datetime.datetime(2024, 3, 13, 10, 30)
+    end = start + datetime.timedelta(hours=2)
+    room, bookings = next(iter(rooms.items()))
+    
+    print(f"{args.rooms} rooms, {sum(len(b) for b in rooms.values())} bookings, best of {args.repeat}")
+    print(f"build all indexes: {build_ms:.1f} ms")
+    print(f"{'check':<28} {'indexed us':>11} {'scan us':>10}")
+    
+    rows = {
+        "one room, any overlap": (
+            lambda: indexes[room].any_overlap(start, end),
+            lambda: scan_overlap(bookings, start, end)
+        ),
+        "one room, list overlaps": (
+            lambda: indexes[room].overlapping(start, end),
+            lambda: [b for b in bookings if b[0] < end and b[1] > start]
+        ),
+        "free rooms, all rooms": (
+            lambda: [r for r, index in indexes.items() if not index.any_overlap(start, end)],
+            lambda: [r for r, b in rooms.items() if not scan_overlap(b, start, end)]
+        )
+    }
+    
+    for name, (indexed, scan) in rows.items():
+        print(f"{name:<28} {best_of(indexed, args.repeat, 1000):>11.1f} {best_of(scan, args.repeat, 10):>10.1f}")
+    
+    if args.mongo_uri:
+        from services.room_schedule import RoomSchedule
+        
+        app = Flask(__name__)
+        app.config['MONGO_DB'] = MongoClient(args.mongo_uri).faculty_scheduler
+        now = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        window = (now + datetime.timedelta(days=7), now + datetime.timedelta(days=7, hours=2))
+        
+        with app.app_context():
+            def cold():
+                RoomSchedule.clear()
+                RoomSchedule.find_free_rooms(*window)
+            
+            print(f"RoomSchedule free rooms, cold: {best_of(cold, args.repeat, 1) / 1000:.1f} ms")
+            print(f"RoomSchedule free rooms, warm: {best_of(lambda: RoomSchedule.find_free_rooms(*window), args.repeat, 10) / 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
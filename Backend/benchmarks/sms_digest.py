@@ -0,0 +1,190 @@
+"""Measure how much SMS digests cut SMS volume on a replayed notification trace
+
+Replays a trace of notifications through per-user digest windows and
+compares the SMS and billed segments against sending one SMS per
+notification. The trace is read from an application database (personal
+notifications plus broadcasts expanded to their current audience), from an
+NDJSON file of {"at", "recipients", "type", "message"} lines, or generated:
+faculty cancelling and rescheduling classes in bursts, each change going to
+every student of the group.
+
+Usage:
+    python benchmarks/sms_digest.py [--windows 0 5 10 30]
+    python benchmarks/sms_digest.py --trace trace.ndjson
+    python benchmarks/sms_digest.py --mongo-uri mongodb://localhost:27017 --database faculty_scheduler --days 30
+"""
+from pymongo import MongoClient
+import argparse
+import datetime
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sms_digest import SmsDigest
+
+def generated_trace(days, faculty, groups, group_size, seed):
+    """Generate bursts of class changes sent to whole groups, plus meeting replies and reminders"""
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1)
+    students = {group: [f"{group}-student-{i}" for i in range(group_size)] for group in range(groups)}
+    teaches = {member: rng.sample(range(groups), min(3, groups)) for member in range(faculty)}
+    events = []
+    
+    for day in range(days):
+        for member in range(faculty):
+            # Most days a faculty member changes nothing; some days several classes at once
+            if rng.random() < 0.15:
+                at = start + datetime.timedelta(days=day, hours=rng.randint(7, 18), minutes=rng.randint(0, 59))
+                for change in range(rng.randint(1, 5)):
+                    group = rng.choice(teaches[member])
+                    action = rng.choice(["cancelled", "rescheduled"])
+                    events.append({
+                        "at": at + datetime.timedelta(seconds=rng.randint(5, 90) * change),
+                        "recipients": students[group],
+                        "type": "class",
+                        "message": f"Class {action}: Subject {member}-{change} on {at:%Y-%m-%d} {rng.randint(8, 16)}:00"
+                    })
+            
+            if rng.random() < 0.3:
+                student = rng.choice(students[rng.randrange(groups)])
+                events.append({
+                    "at": start + datetime.timedelta(days=day, hours=rng.randint(8, 18)),
+                    "recipients": [student],
+                    "type": "system",
+                    "message": f"Your meeting request with Faculty {member} has been approved."
+                })
+        
+        for group in range(groups):
+            events.append({
+                "at": start + datetime.timedelta(days=day, hours=8, minutes=30),
+                "recipients": students[group],
+                "type": "reminder",
+                "message": f"Reminder: first class of group {group} starts at 09:00"
+            })
+    
+    return sorted(events, key=lambda event: event["at"])
+
+def file_trace(path):
+    """Read a trace from NDJSON"""
+    events = []
+    with open(path) as trace:
+        for line in trace:
+            if line.strip():
+                event = json.loads(line)
+                event["at"] = datetime.datetime.fromisoformat(event["at"])
+                events.append(event)
+    return sorted(events, key=lambda event: event["at"])
+
+def database_trace(uri, database, days):
+    """Rebuild a trace from the notifications and broadcasts of the last days"""
+    db = MongoClient(uri)[database]
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    with_mobile = {"mobile_number": {"$nin": [None, ""]}}
+    events = []
+    
+    for notification in db.notifications.find({"created_at": {"$gte": since}}, {"user_id": 1, "type": 1, "message": 1, "created_at": 1}):
+        events.append({
+            "at": notification["created_at"],
+            "recipients": [str(notification["user_id"])],
+            "type": notification.get("type", "system"),
+            "message": notification.get("message", "")
+        })
+    
+    audiences = {}
+    for broadcast in db.broadcasts.find({"created_at": {"$gte": since}}):
+        key = (broadcast["audience_type"], broadcast["audience"])
+        if key not in audiences:
+            query = {"role": "student", "group_id": broadcast["audience"]} if key[0] == "group" else {"role": broadcast["audience"]}
+            audiences[key] = [str(user["_id"]) for user in db.users.find({**query, **with_mobile}, {"_id": 1})]
+        events.append({
+            "at": broadcast["created_at"],
+            "recipients": audiences[key],
+            "type": broadcast.get("type", "system"),
+            "message": broadcast.get("message", "")
+        })
+    
+    return sorted(events, key=lambda event: event["at"])
+
+def replay(events, window, urgent_types):
+    """Replay a trace through digests of one window, returning (sms, segments, delays in seconds)"""
+    window = datetime.timedelta(minutes=window)
+    pending = {}
+    due = []
+    sms = segments = 0
+    delays = []
+    
+    def flush(until):
+        nonlocal sms, segments
+        while due and due[0][0] <= until:
+            send_at, user = heapq.heappop(due)
+            messages = pending.pop(user)
+            sms += 1
+            segments += SmsDigest.segments(SmsDigest.compose([message for _, message in messages]))
+            delays.extend((send_at - at).total_seconds() for at, _ in messages)
+    
+    for event in events:
+        flush(event["at"])
+        
+        for user in event["recipients"]:
+            if window <= datetime.timedelta(0) or event["type"] in urgent_types:
+                sms += 1
+                segments += SmsDigest.segments(event["message"])
+                delays.append(0.0)
+            elif user in pending:
+                pending[user].append((event["at"], event["message"]))
+            else:
+                pending[user] = [(event["at"], event["message"])]
+                heapq.heappush(due, (event["at"] + window, user))
+    
+    flush(datetime.datetime.max)
+    return sms, segments, delays
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trace", help="NDJSON trace to replay")
+    parser.add_argument("--mongo-uri", help="Rebuild the trace from this server's notifications")
+    parser.add_argument("--database", default="faculty_scheduler", help="Database to read the trace from")
+    parser.add_argument("--days", type=int, default=30, help="Days of history or of generated trace")
+    parser.add_argument("--faculty", type=int, default=40, help="Faculty members in a generated trace")
+    parser.add_argument("--groups", type=int, default=20, help="Groups in a generated trace")
+    parser.add_argument("--group-size", type=int, default=60, help="Students per group in a generated trace")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--windows", type=int, nargs="+", default=[0, 5, 10, 30], help="Digest windows in minutes")
+    parser.add_argument("--urgent-types", default="reminder", help="Comma separated types that skip the digest")
+    args = parser.parse_args()
+    
+    if args.trace:
+        events = file_trace(args.trace)
+    elif args.mongo_uri:
+        events = database_trace(args.mongo_uri, args.database, args.days)
+    else:
+        events = generated_trace(args.days, args.faculty, args.groups, args.group_size, args.seed)
+    
+    urgent_types = set(args.urgent_types.split(","))
+    notifications = sum(len(event["recipients"]) for event in events)
+    urgent = sum(len(event["recipients"]) for event in events if event["type"] in urgent_types)
+    print(f"{len(events)} events, {notifications} notifications with SMS, {urgent} of them urgent")
+    if not notifications:
+        return 1
+    
+    # One SMS per notification
+    baseline = replay(events, 0, urgent_types)[:2]
+    
+    for window in args.windows:
+        sms, segments, delays = replay(events, window, urgent_types)
+        delayed = sorted(delay for delay in delays if delay > 0) or [0.0]
+        print(
+            f"window {window:>3} min: {sms:>8} SMS ({1 - sms / baseline[0]:6.1%} fewer), "
+            f"{segments:>8} segments ({1 - segments / baseline[1]:6.1%} fewer), "
+            f"median delay {statistics.median(delayed) / 60:.1f} min, max {delayed[-1] / 60:.1f} min"
+        )
+    
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
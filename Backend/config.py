@@ -17,6 +17,11 @@ class Config:
     SMS_AUTH_TOKEN = os.getenv("SMS_AUTH_TOKEN", "")
     SMS_FROM_NUMBER = os.getenv("SMS_FROM_NUMBER", "")
     
+    # SMS Digest Configuration
+    SMS_DIGEST_WINDOW_MINUTES = int(os.getenv("SMS_DIGEST_WINDOW_MINUTES", 10))  # Per-user sms_digest_minutes overrides; 0 sends at once
+    SMS_URGENT_TYPES = tuple(os.getenv("SMS_URGENT_TYPES", "reminder").split(","))  # Notification types that skip the digest
+    SMS_DIGEST_FLUSH_SECONDS = int(os.getenv("SMS_DIGEST_FLUSH_SECONDS", 30))
+    
     # OTP Configuration
     OTP_EXPIRY_SECONDS = 24 * 60 * 60  # 24 hours
     
@@ -27,6 +32,57 @@ class Config:
     DEBUG = os.getenv("DEBUG", "True") == "True"
     TESTING = os.getenv("TESTING", "False") == "True"
     
+    # Event Stream Configuration
+    EVENTS_COLLECTION_SIZE = int(os.getenv("EVENTS_COLLECTION_SIZE", 16 * 1024 * 1024))  # bytes
+    EVENTS_HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+    
+    # Cache Invalidation Configuration
+    CACHE_EVENTS_COLLECTION_SIZE = int(os.getenv("CACHE_EVENTS_COLLECTION_SIZE", 4 * 1024 * 1024))  # bytes, standalone servers only
+    
+    # Notification Retention Configuration
+    NOTIFICATION_READ_TTL_DAYS = int(os.getenv("NOTIFICATION_READ_TTL_DAYS", 30))
+    NOTIFICATION_MAX_AGE_DAYS = int(os.getenv("NOTIFICATION_MAX_AGE_DAYS", 180))
+    NOTIFICATION_ARCHIVE_BATCH_SIZE = int(os.getenv("NOTIFICATION_ARCHIVE_BATCH_SIZE", 1000))
+    NOTIFICATION_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("NOTIFICATION_ARCHIVE_INTERVAL_SECONDS", 60 * 60))
+    
+    # Bulk Import Configuration
+    USER_IMPORT_HASH_WORKERS = int(os.getenv("USER_IMPORT_HASH_WORKERS", 0)) or None  # Defaults to CPU count
+    USER_IMPORT_ASYNC_ROWS = int(os.getenv("USER_IMPORT_ASYNC_ROWS", 500))  # Larger imports run as a background job
+    
+    # Background Job Configuration
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1))
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 60))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", 7))
+    
+    # Timetable Generation Configuration
+    TIMETABLE_SOLVER_WORKERS = int(os.getenv("TIMETABLE_SOLVER_WORKERS", 0)) or None  # Defaults to CPU count
+    TIMETABLE_SOLVER_RESTARTS = int(os.getenv("TIMETABLE_SOLVER_RESTARTS", 0)) or None  # Defaults to one per worker
+    TIMETABLE_SOLVER_SECONDS = int(os.getenv("TIMETABLE_SOLVER_SECONDS", 60))
+    
+    # Conflict Detection Configuration
+    CONFLICT_RESCAN_INTERVAL_SECONDS = int(os.getenv("CONFLICT_RESCAN_INTERVAL_SECONDS", 6 * 60 * 60))
+    
+    # Reminder Configuration
+    REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", 30))  # How long before a class or meeting to remind
+    REMINDER_HORIZON_HOURS = int(os.getenv("REMINDER_HORIZON_HOURS", 3))  # How far ahead reminders are held in memory
+    REMINDER_TICK_SECONDS = int(os.getenv("REMINDER_TICK_SECONDS", 15))
+    REMINDER_REFRESH_SECONDS = int(os.getenv("REMINDER_REFRESH_SECONDS", 10 * 60))
+    
+    # Read Coalescing Configuration
+    SINGLE_FLIGHT_TTL_MS = int(os.getenv("SINGLE_FLIGHT_TTL_MS", 250))  # How long a shared read is reused
+    
+    # Dashboard Configuration
+    DASHBOARD_CACHE_SECONDS = int(os.getenv("DASHBOARD_CACHE_SECONDS", 15))
+    
+    # Response Compression Configuration
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    COMPRESSION_STREAM_BYTES = int(os.getenv("COMPRESSION_STREAM_BYTES", 256 * 1024))  # Larger bodies are compressed in chunks
+    COMPRESSION_CHUNK_BYTES = int(os.getenv("COMPRESSION_CHUNK_BYTES", 64 * 1024))
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))  # Low qualities keep per-request CPU cost close to gzip
+    
     # Logging Configuration
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
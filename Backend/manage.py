@@ -0,0 +1,97 @@
+"""Command line tools for maintenance tasks
+
+Usage:
+    python manage.py import-users students.csv [--format csv] [--default-password PASSWORD] [--workers N]
+    python manage.py rebuild-session-stats [--start-date YYYY-MM-DD] [--end-date YYYY-MM-DD]
+    python manage.py rebuild-timetable-slots
+"""
+from flask import Flask
+from pymongo import MongoClient
+import argparse
+import datetime
+import json
+import os
+import sys
+
+from config import Config
+from utils.helpers import MongoJSONProvider
+
+def create_app():
+    """Create a minimal application with a database connection"""
+    app = Flask(__name__)
+    app.json = MongoJSONProvider(app)
+    app.config.from_object(Config)
+    app.config['MONGO_DB'] = MongoClient(app.config.get("MONGO_URI")).faculty_scheduler
+    return app
+
+def import_users(args):
+    """Bulk import users from a CSV or NDJSON file"""
+    from services.user_import import UserImporter
+    
+    file_format = args.format or os.path.splitext(args.path)[1].lstrip('.').lower()
+    
+    with open(args.path, 'rb') as f:
+        rows = UserImporter.parse(f.read(), file_format)
+    
+    report = UserImporter.import_users(rows, args.default_password, args.workers)
+    
+    print(f"Created {report['created']}, reassigned {report['reassigned']}, failed {report['failed']} of {report['total']} rows")
+    for error in report['errors']:
+        print(json.dumps(error))
+    
+    return 1 if report['failed'] else 0
+
+def rebuild_session_stats(args):
+    """Recompute the class session rollups from class sessions"""
+    from services.session_stats import SessionStats
+    
+    start_date = datetime.datetime.fromisoformat(args.start_date) if args.start_date else None
+    end_date = datetime.datetime.fromisoformat(args.end_date) if args.end_date else None
+    
+    SessionStats.ensure_indexes()
+    buckets = SessionStats.rebuild(start_date, end_date)
+    
+    print(f"Rebuilt {buckets} session stat buckets")
+    
+    return 0
+
+def rebuild_timetable_slots(args):
+    """Rebuild the normalised timetable slots from the weekly schedules"""
+    from models.timetable import Timetable
+    
+    Timetable.ensure_indexes()
+    written, skipped = Timetable.rebuild_slots()
+    
+    print(f"Rebuilt {written} timetable slots")
+    if skipped:
+        print(f"Skipped {skipped} slots with an invalid day or period")
+    
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Faculty Schedule Management System maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = subparsers.add_parser("import-users", help="Bulk import users from CSV or NDJSON")
+    import_parser.add_argument("path", help="Path to the CSV or NDJSON file")
+    import_parser.add_argument("--format", choices=["csv", "ndjson", "jsonl"], help="File format (defaults to the file extension)")
+    import_parser.add_argument("--default-password", help="Password for rows without one")
+    import_parser.add_argument("--workers", type=int, help="Number of password hashing processes")
+    import_parser.set_defaults(func=import_users)
+    
+    stats_parser = subparsers.add_parser("rebuild-session-stats", help="Recompute class session rollups for analytics")
+    stats_parser.add_argument("--start-date", help="First day to rebuild (defaults to all sessions)")
+    stats_parser.add_argument("--end-date", help="Day after the last day to rebuild")
+    stats_parser.set_defaults(func=rebuild_session_stats)
+    
+    slots_parser = subparsers.add_parser("rebuild-timetable-slots", help="Rebuild timetable slots from weekly schedules")
+    slots_parser.set_defaults(func=rebuild_timetable_slots)
+    
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
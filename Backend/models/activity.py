@@ -1,6 +1,9 @@
 from flask import current_app
 from bson.objectid import ObjectId
 import datetime
+from services.calendar_feed import CalendarFeed
+from services.free_busy import FreeBusy
+from utils.helpers import build_projection
 
 class Activity:
     """Activity model for database operations"""
@@ -13,6 +16,12 @@ class Activity:
         "other"
     ]
     
+    # Fields clients may request with ?fields=
+    FIELDS = (
+        "faculty_id", "activity_type", "title", "description", "start_time", "end_time",
+        "room_id", "meeting_id", "created_at", "updated_at"
+    )
+    
     @staticmethod
     def get_db():
         """Get the database connection"""
@@ -37,6 +46,10 @@ class Activity:
         
         # Insert activity
         result = Activity.get_db().activities.insert_one(activity_data)
+        CalendarFeed.touch(
+            CalendarFeed.owner_key("faculty", activity_data.get("faculty_id")),
+            CalendarFeed.owner_key("room", activity_data.get("room_id"))
+        )
         
         return {
             **activity_data,
@@ -44,13 +57,10 @@ class Activity:
         }
     
     @staticmethod
-    def get_by_id(activity_id):
-        """Get an activity by ID"""
+    def get_by_id(activity_id, projection=None):
+        """Get an activity by ID, optionally limited to a projection"""
         try:
-            activity = Activity.get_db().activities.find_one({"_id": ObjectId(activity_id)})
-            if activity:
-                activity["_id"] = str(activity["_id"])
-                activity["faculty_id"] = str(activity["faculty_id"])
+            activity = Activity.get_db().activities.find_one({"_id": ObjectId(activity_id)}, projection)
             return activity
         except:
             return None
@@ -60,22 +70,40 @@ class Activity:
         """Update an activity"""
         update_data["updated_at"] = datetime.datetime.utcnow()
         
-        result = Activity.get_db().activities.update_one(
+        activity = Activity.get_db().activities.find_one_and_update(
             {"_id": ObjectId(activity_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection={"faculty_id": 1, "room_id": 1}
         )
         
-        return result.modified_count > 0
+        if activity:
+            CalendarFeed.touch(
+                CalendarFeed.owner_key("faculty", activity["faculty_id"]),
+                CalendarFeed.owner_key("room", activity.get("room_id")),
+                CalendarFeed.owner_key("room", update_data.get("room_id"))
+            )
+        
+        return activity is not None
     
     @staticmethod
     def delete(activity_id):
         """Delete an activity"""
-        result = Activity.get_db().activities.delete_one({"_id": ObjectId(activity_id)})
-        return result.deleted_count > 0
+        activity = Activity.get_db().activities.find_one_and_delete(
+            {"_id": ObjectId(activity_id)},
+            projection={"faculty_id": 1, "room_id": 1}
+        )
+        
+        if activity:
+            CalendarFeed.touch(
+                CalendarFeed.owner_key("faculty", activity["faculty_id"]),
+                CalendarFeed.owner_key("room", activity.get("room_id"))
+            )
+        
+        return activity is not None
     
     @staticmethod
-    def get_faculty_activities(faculty_id, start_date=None, end_date=None, activity_type=None):
-        """Get activities for a faculty member with optional filters"""
+    def get_faculty_activities(faculty_id, start_date=None, end_date=None, activity_type=None, fields=None):
+        """Get activities for a faculty member with optional filters and sparse fieldset"""
         query = {"faculty_id": ObjectId(faculty_id)}
         
         # Apply date filters
@@ -94,12 +122,7 @@ class Activity:
             query["activity_type"] = activity_type
         
         # Get activities
-        activities = list(Activity.get_db().activities.find(query).sort("start_time", 1))
-        
-        # Convert ObjectId to string for JSON serialization
-        for a in activities:
-            a["_id"] = str(a["_id"])
-            a["faculty_id"] = str(a["faculty_id"])
+        activities = list(Activity.get_db().activities.find(query, build_projection(fields)).sort("start_time", 1))
         
         return activities
     
@@ -115,45 +138,13 @@ class Activity:
             "end_time": {"$lte": end_datetime}
         }).sort("start_time", 1))
         
-        # Convert ObjectId to string for JSON serialization
-        for a in activities:
-            a["_id"] = str(a["_id"])
-            a["faculty_id"] = str(a["faculty_id"])
-        
         return activities
     
     @staticmethod
-    def check_conflict(faculty_id, start_time, end_time):
-        """Check if there's a conflict with existing activities"""
-        # Find activities that overlap with the given time range
-        activities = list(Activity.get_db().activities.find({
-            "faculty_id": ObjectId(faculty_id),
-            "start_time": {"$lt": end_time},
-            "end_time": {"$gt": start_time}
-        }))
-        
-        # Check if there are classes during this time
-        date = start_time.date()
-        day_name = date.strftime("%A").lower()
-        
-        # Get faculty timetable
-        timetable = current_app.config['MONGO_DB'].timetables.find_one({"faculty_id": ObjectId(faculty_id)})
-        
-        classes_conflict = False
-        if timetable and day_name in timetable["weekly_schedule"]:
-            for period, data in timetable["weekly_schedule"][day_name].items():
-                period_start = datetime.datetime.combine(date, datetime.time(int(period), 0))
-                period_end = period_start + datetime.timedelta(hours=data.get("duration", 1))
-                
-                if period_start < end_time and period_end > start_time:
-                    classes_conflict = True
-                    break
-        
-        # Check for existing class sessions
-        class_sessions = list(current_app.config['MONGO_DB'].class_sessions.find({
-            "faculty_id": ObjectId(faculty_id),
-            "date": {"$gte": start_time, "$lt": end_time},
-            "status": {"$nin": ["cancelled", "rescheduled"]}
-        }))
+    def check_conflict(faculty_id, start_time, end_time, exclude=None):
+        """Check if there's a conflict with existing activities, timetable classes or class sessions
         
-        return len(activities) > 0 or classes_conflict or len(class_sessions) > 0
\ No newline at end of file
+        exclude is the ID of an activity being moved, which cannot conflict
+        with itself.
+        """
+        return FreeBusy.first_conflict(faculty_id, start_time, end_time, ("activity", "class", "session"), exclude) is not None
\ No newline at end of file
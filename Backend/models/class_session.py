@@ -1,6 +1,15 @@
 from flask import current_app
 from bson.objectid import ObjectId
+from pymongo import ASCENDING, InsertOne, UpdateMany, UpdateOne
+from collections import Counter, defaultdict
 import datetime
+from models.timetable import Timetable
+from services.events import event_broker
+from services.session_stats import SessionStats
+from services.calendar_feed import CalendarFeed
+from services.session_conflicts import SessionConflicts
+from services.reminders import reminder_scheduler
+from utils.helpers import build_projection, wants
 
 class ClassSession:
     """Class session model for database operations"""
@@ -9,14 +18,36 @@ class ClassSession:
         "COMPLETED": "completed",
         "NOT_COMPLETED": "not_completed",
         "CANCELLED": "cancelled",
-        "RESCHEDULED": "rescheduled"
+        "RESCHEDULED": "rescheduled",
+        "HOLIDAY": "holiday"
     }
     
+    # Fields clients may request with ?fields=
+    FIELDS = (
+        "faculty_id", "group_id", "subject", "date", "duration", "status", "topic", "notes",
+        "room_id", "rescheduled_to", "rescheduled_from", "holiday_id", "created_at", "updated_at"
+    )
+    
+    # Read before a write so the stats, the calendar, group and room stamps and the conflicts can be updated
+    CHANGE_PROJECTION = {**SessionStats.PROJECTION, "room_id": 1, "duration": 1}
+    
+    # Note left on sessions cancelled because their slot left the timetable
+    REMOVED_NOTE = "Removed from timetable"
+    
     @staticmethod
     def get_db():
         """Get the database connection"""
         return current_app.config['MONGO_DB']
     
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes used by class session queries"""
+        class_sessions = ClassSession.get_db().class_sessions
+        class_sessions.create_index([("faculty_id", ASCENDING), ("date", ASCENDING)])
+        class_sessions.create_index([("group_id", ASCENDING), ("date", ASCENDING)])
+        class_sessions.create_index([("date", ASCENDING), ("status", ASCENDING)])
+        class_sessions.create_index([("holiday_id", ASCENDING)], sparse=True)
+    
     @staticmethod
     def create(class_data):
         """Create a new class session"""
@@ -26,6 +57,9 @@ class ClassSession:
         if "status" not in class_data:
             class_data["status"] = ClassSession.STATUS["NOT_COMPLETED"]
         
+        # Sessions created directly do not follow timetable changes
+        class_data.setdefault("from_timetable", False)
+        
         # Set timestamps
         class_data["created_at"] = now
         class_data["updated_at"] = now
@@ -36,6 +70,10 @@ class ClassSession:
         
         # Insert class session
         result = ClassSession.get_db().class_sessions.insert_one(class_data)
+        SessionStats.record_inserted([class_data])
+        CalendarFeed.touch_sessions([class_data])
+        SessionConflicts.detect([class_data])
+        reminder_scheduler.schedule("class", result.inserted_id, class_data["date"])
         
         return {
             **class_data,
@@ -43,10 +81,39 @@ class ClassSession:
         }
     
     @staticmethod
-    def create_from_timetable(faculty_id, semester_start_date, semester_end_date):
-        """Create class sessions for a semester based on the weekly timetable"""
+    def _session_from_slot(faculty_id, class_time, class_data):
+        """Build a new class session document from a timetable slot"""
+        now = datetime.datetime.utcnow()
+        return {
+            "faculty_id": ObjectId(faculty_id),
+            "group_id": class_data.get("group_id"),
+            "subject": class_data.get("subject"),
+            "room_id": class_data.get("room_id"),
+            "date": class_time,
+            "duration": class_data.get("duration", 1),  # Default 1 hour
+            "status": ClassSession.STATUS["NOT_COMPLETED"],
+            "topic": class_data.get("topic", ""),
+            "notes": "",
+            "from_timetable": True,
+            "created_at": now,
+            "updated_at": now
+        }
+    
+    @staticmethod
+    def create_from_timetable(faculty_id, semester_start_date, semester_end_date, progress=None, generation_id=None):
+        """Create class sessions for a semester based on the weekly timetable
+        
+        progress, if given, is called with the fraction of days processed.
+        Sessions are upserted by faculty, date and generation_id, so running
+        again with the same generation_id after a failure inserts only the
+        sessions still missing; stats count only those, while the calendar,
+        conflict and reminder updates are repeated for the whole generation.
+        """
         # Get faculty timetable
-        timetable = current_app.config['MONGO_DB'].timetables.find_one({"faculty_id": ObjectId(faculty_id)})
+        timetable = current_app.config['MONGO_DB'].timetables.find_one(
+            {"faculty_id": ObjectId(faculty_id)},
+            {"weekly_schedule": 1}
+        )
         
         if not timetable:
             return False
@@ -56,14 +123,20 @@ class ClassSession:
         end_date = datetime.datetime.fromisoformat(semester_end_date)
         
         # Get holidays
-        holidays = list(current_app.config['MONGO_DB'].holidays.find({}))
-        holiday_dates = [holiday["date"].date() for holiday in holidays]
+        holidays = current_app.config['MONGO_DB'].holidays.find({}, {"date": 1})
+        holiday_dates = {holiday["date"].date() for holiday in holidays}
         
         # Create class sessions for each day in the semester
         class_sessions = []
         current_date = start_date
+        total_days = (end_date - start_date).days + 1
         
         while current_date <= end_date:
+            # Report progress once per week of the semester
+            days_done = (current_date - start_date).days
+            if progress and days_done % 7 == 0:
+                progress(0.9 * days_done / total_days, "Generating class sessions")
+            
             day_name = current_date.strftime("%A").lower()
             
             # Skip if it's a holiday
@@ -76,58 +149,293 @@ class ClassSession:
                 day_schedule = timetable["weekly_schedule"][day_name]
                 
                 for period, class_data in day_schedule.items():
+                    if not class_data:
+                        continue
+                    
                     # Create datetime for this class
-                    hour = int(period)
-                    class_time = current_date.replace(hour=hour, minute=0, second=0)
+                    start = Timetable.parse_period(period)
+                    class_time = current_date.replace(hour=start // 60, minute=start % 60, second=0)
                     
                     # Create class session
-                    class_session = {
-                        "faculty_id": ObjectId(faculty_id),
-                        "group_id": class_data.get("group_id"),
-                        "subject": class_data.get("subject"),
-                        "date": class_time,
-                        "duration": class_data.get("duration", 1),  # Default 1 hour
-                        "status": ClassSession.STATUS["NOT_COMPLETED"],
-                        "topic": class_data.get("topic", ""),
-                        "notes": "",
-                        "created_at": datetime.datetime.utcnow(),
-                        "updated_at": datetime.datetime.utcnow()
-                    }
-                    
-                    class_sessions.append(class_session)
+                    class_sessions.append(ClassSession._session_from_slot(faculty_id, class_time, class_data))
             
             # Move to next day
             current_date += datetime.timedelta(days=1)
         
-        # Insert all class sessions
+        # Insert the class sessions this generation has not inserted yet
         if class_sessions:
-            ClassSession.get_db().class_sessions.insert_many(class_sessions)
+            db = ClassSession.get_db()
+            generation_id = generation_id or str(ObjectId())
+            key_fields = ("faculty_id", "date", "generation_id")
+            for session in class_sessions:
+                session["generation_id"] = generation_id
+            
+            result = db.class_sessions.bulk_write([
+                UpdateOne(
+                    {field: session[field] for field in key_fields},
+                    {"$setOnInsert": {field: value for field, value in session.items() if field not in key_fields}},
+                    upsert=True
+                )
+                for session in class_sessions
+            ], ordered=False)
+            
+            for index, session_id in result.upserted_ids.items():
+                class_sessions[index]["_id"] = session_id
+            
+            # Sessions inserted by an earlier run of this generation
+            existing = {
+                session["date"]: session["_id"]
+                for session in db.class_sessions.find(
+                    {
+                        "faculty_id": ObjectId(faculty_id),
+                        "date": {"$in": [session["date"] for session in class_sessions if "_id" not in session]},
+                        "generation_id": generation_id
+                    },
+                    {"date": 1}
+                )
+            } if len(result.upserted_ids) < len(class_sessions) else {}
+            for session in class_sessions:
+                session.setdefault("_id", existing.get(session["date"]))
+            
+            SessionStats.record_inserted([class_sessions[index] for index in result.upserted_ids])
+            CalendarFeed.touch_sessions(class_sessions)
+            SessionConflicts.detect(class_sessions)
+            for session in class_sessions:
+                reminder_scheduler.schedule("class", session["_id"], session["date"])
         
         return len(class_sessions)
     
     @staticmethod
-    def get_by_id(class_id):
-        """Get a class session by ID"""
+    def sync_with_timetable(faculty_id, old_schedule, new_schedule, now=None):
+        """Apply a weekly schedule change to already generated future sessions
+        
+        Only the slots that changed are touched: sessions of removed slots
+        are cancelled, sessions of edited slots are updated in place and
+        sessions for new slots are inserted across the range that has
+        already been generated. Past, completed, cancelled and rescheduled
+        sessions are left alone, as are sessions that were not generated
+        from a slot: the new dates of rescheduled classes and sessions
+        created directly. All writes go through one unordered
+        bulk_write. Returns the counts per change and per affected group.
+        """
+        summary = {"inserted": 0, "updated": 0, "cancelled": 0, "groups": {}}
+        added, removed, changed = Timetable.diff_schedules(old_schedule, new_schedule)
+        
+        if not (added or removed or changed):
+            return summary
+        
+        now = now or datetime.datetime.utcnow()
+        db = ClassSession.get_db()
+        
+        # Load the faculty's future sessions once and bucket them by weekly slot
+        future_sessions = list(db.class_sessions.find(
+            {"faculty_id": ObjectId(faculty_id), "date": {"$gte": now}},
+            {**ClassSession.CHANGE_PROJECTION, "notes": 1, "rescheduled_from": 1, "from_timetable": 1}
+        ))
+        
+        # Sessions generated before the from_timetable marker have neither field
+        future_sessions = [
+            session for session in future_sessions
+            if not session.get("rescheduled_from") and session.get("from_timetable", True)
+        ]
+        
+        if not future_sessions:
+            return summary  # Nothing generated yet
+        
+        sessions_by_slot = defaultdict(list)
+        for session in future_sessions:
+            date = session["date"]
+            sessions_by_slot[(date.strftime("%A").lower(), date.hour * 60 + date.minute)].append(session)
+        
+        pending = [ClassSession.STATUS["NOT_COMPLETED"], ClassSession.STATUS["HOLIDAY"]]
+        groups = defaultdict(Counter)
+        rooms = set()
+        deltas = Counter()
+        operations = []
+        
+        # Sessions whose conflicts must be resolved, and those to check for new ones
+        changed_ids = []
+        written = []
+        
+        # Cancel sessions of removed slots
+        for (day, period), slot in removed.items():
+            sessions = [s for s in sessions_by_slot[(day, Timetable.parse_period(period))] if s["status"] in pending]
+            if not sessions:
+                continue
+            
+            operations.append(UpdateMany(
+                {"_id": {"$in": [s["_id"] for s in sessions]}, "status": {"$in": pending}},
+                {"$set": {
+                    "status": ClassSession.STATUS["CANCELLED"],
+                    "notes": ClassSession.REMOVED_NOTE,
+                    "updated_at": now
+                }}
+            ))
+            summary["cancelled"] += len(sessions)
+            for session in sessions:
+                groups[session.get("group_id")]["cancelled"] += 1
+                changed_ids.append(session["_id"])
+                rooms.add(session.get("room_id"))
+                SessionStats.move(deltas, session, {**session, "status": ClassSession.STATUS["CANCELLED"]})
+        
+        # Update sessions of edited slots in place
+        for (day, period), slot in changed.items():
+            sessions = [s for s in sessions_by_slot[(day, Timetable.parse_period(period))] if s["status"] in pending]
+            if not sessions:
+                continue
+            
+            operations.append(UpdateMany(
+                {"_id": {"$in": [s["_id"] for s in sessions]}, "status": {"$in": pending}},
+                {"$set": {
+                    "group_id": slot.get("group_id"),
+                    "subject": slot.get("subject"),
+                    "room_id": slot.get("room_id"),
+                    "duration": slot.get("duration", 1),
+                    "topic": slot.get("topic", ""),
+                    "updated_at": now
+                }}
+            ))
+            summary["updated"] += len(sessions)
+            for session in sessions:
+                groups[session.get("group_id")]["updated"] += 1
+                if slot.get("group_id") != session.get("group_id"):
+                    groups[slot.get("group_id")]["updated"] += 1
+                rooms.update((session.get("room_id"), slot.get("room_id")))
+                SessionStats.move(deltas, session, {**session, "group_id": slot.get("group_id"), "subject": slot.get("subject")})
+                changed_ids.append(session["_id"])
+                written.append({
+                    **session,
+                    "group_id": slot.get("group_id"),
+                    "subject": slot.get("subject"),
+                    "duration": slot.get("duration", 1)
+                })
+        
+        # Insert sessions for new slots up to the last generated date
+        if added:
+            last_date = max(session["date"] for session in future_sessions).date()
+            holiday_dates = {
+                holiday["date"].date()
+                for holiday in db.holidays.find(
+                    {"date": {"$gte": datetime.datetime.combine(now.date(), datetime.time.min)}},
+                    {"date": 1}
+                )
+            }
+            
+            current_date = now.date()
+            while current_date <= last_date:
+                day_name = current_date.strftime("%A").lower()
+                
+                for (day, period), slot in added.items():
+                    if day != day_name or current_date in holiday_dates:
+                        continue
+                    
+                    start = Timetable.parse_period(period)
+                    class_time = datetime.datetime.combine(current_date, datetime.time(start // 60, start % 60))
+                    if class_time < now:
+                        continue
+                    
+                    existing = [s for s in sessions_by_slot[(day, start)] if s["date"] == class_time]
+                    removed_before = [
+                        s for s in existing
+                        if s["status"] == ClassSession.STATUS["CANCELLED"] and s.get("notes") == ClassSession.REMOVED_NOTE
+                    ]
+                    
+                    # A slot added back brings back the sessions its removal cancelled
+                    if removed_before and len(removed_before) == len(existing):
+                        session = removed_before[0]
+                        revived = {
+                            "status": ClassSession.STATUS["NOT_COMPLETED"],
+                            "group_id": slot.get("group_id"),
+                            "subject": slot.get("subject"),
+                            "room_id": slot.get("room_id"),
+                            "duration": slot.get("duration", 1),
+                            "topic": slot.get("topic", ""),
+                            "notes": ""
+                        }
+                        operations.append(UpdateOne(
+                            {"_id": session["_id"], "status": ClassSession.STATUS["CANCELLED"], "notes": ClassSession.REMOVED_NOTE},
+                            {"$set": {**revived, "updated_at": now}}
+                        ))
+                        SessionStats.move(deltas, session, {**session, **revived})
+                        written.append({**session, **revived})
+                        summary["inserted"] += 1
+                        groups[slot.get("group_id")]["inserted"] += 1
+                        rooms.add(slot.get("room_id"))
+                        continue
+                    
+                    if existing:
+                        continue
+                    
+                    new_session = ClassSession._session_from_slot(faculty_id, class_time, slot)
+                    operations.append(InsertOne(new_session))
+                    written.append(new_session)  # Given its _id by the bulk write
+                    deltas[SessionStats.bucket(new_session)] += 1
+                    summary["inserted"] += 1
+                    groups[slot.get("group_id")]["inserted"] += 1
+                    rooms.add(slot.get("room_id"))
+                
+                current_date += datetime.timedelta(days=1)
+        
+        if operations:
+            db.class_sessions.bulk_write(operations, ordered=False)
+            SessionStats.apply(deltas)
+            CalendarFeed.touch(
+                CalendarFeed.owner_key("faculty", faculty_id),
+                *[CalendarFeed.owner_key("group", group_id) for group_id in groups if group_id],
+                *[CalendarFeed.owner_key("room", room_id) for room_id in rooms if room_id]
+            )
+            SessionConflicts.resolve(changed_ids, "timetable_changed")
+            SessionConflicts.detect(written)
+            
+            # Inserted and revived sessions may start within the reminder window
+            for session in written:
+                if session["status"] == ClassSession.STATUS["NOT_COMPLETED"]:
+                    reminder_scheduler.schedule("class", session["_id"], session["date"])
+        
+        summary["groups"] = {
+            group_id: dict(counts)
+            for group_id, counts in groups.items()
+            if group_id
+        }
+        
+        return summary
+    
+    @staticmethod
+    def get_by_id(class_id, projection=None):
+        """Get a class session by ID, optionally limited to a projection"""
         try:
-            class_session = ClassSession.get_db().class_sessions.find_one({"_id": ObjectId(class_id)})
-            if class_session:
-                class_session["_id"] = str(class_session["_id"])
-                class_session["faculty_id"] = str(class_session["faculty_id"])
+            class_session = ClassSession.get_db().class_sessions.find_one({"_id": ObjectId(class_id)}, projection)
             return class_session
         except:
             return None
     
+    @staticmethod
+    def _recheck_conflicts(before, update_data):
+        """Re-check the conflicts of a session that a write moved, reactivated or took off"""
+        after = {**before, **update_data}
+        moved = any(before.get(field) != after.get(field) for field in ("date", "duration", "group_id"))
+        
+        if moved or SessionConflicts.is_active(before) != SessionConflicts.is_active(after):
+            SessionConflicts.resolve([before["_id"]], "changed")
+            SessionConflicts.detect([after])
+    
     @staticmethod
     def update(class_id, update_data):
         """Update a class session"""
         update_data["updated_at"] = datetime.datetime.utcnow()
         
-        result = ClassSession.get_db().class_sessions.update_one(
+        before = ClassSession.get_db().class_sessions.find_one_and_update(
             {"_id": ObjectId(class_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection=ClassSession.CHANGE_PROJECTION
         )
         
-        return result.modified_count > 0
+        if before:
+            SessionStats.record_change(before, update_data)
+            CalendarFeed.touch_sessions([before, update_data])
+            ClassSession._recheck_conflicts(before, update_data)
+        
+        return before is not None
     
     @staticmethod
     def mark_complete(class_id, topic=None, notes=None):
@@ -143,12 +451,18 @@ class ClassSession:
         if notes:
             update_data["notes"] = notes
         
-        result = ClassSession.get_db().class_sessions.update_one(
+        before = ClassSession.get_db().class_sessions.find_one_and_update(
             {"_id": ObjectId(class_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection=ClassSession.CHANGE_PROJECTION
         )
         
-        return result.modified_count > 0
+        if before:
+            SessionStats.record_change(before, update_data)
+            CalendarFeed.touch_sessions([before, update_data])
+            ClassSession._recheck_conflicts(before, update_data)
+        
+        return before is not None
     
     @staticmethod
     def mark_incomplete(class_id, notes=None):
@@ -161,12 +475,32 @@ class ClassSession:
         if notes:
             update_data["notes"] = notes
         
-        result = ClassSession.get_db().class_sessions.update_one(
+        before = ClassSession.get_db().class_sessions.find_one_and_update(
             {"_id": ObjectId(class_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection=ClassSession.CHANGE_PROJECTION
         )
         
-        return result.modified_count > 0
+        if before:
+            SessionStats.record_change(before, update_data)
+            CalendarFeed.touch_sessions([before, update_data])
+            ClassSession._recheck_conflicts(before, update_data)
+        
+        return before is not None
+    
+    @staticmethod
+    def _publish_change(class_session, event_type, data):
+        """Push a class schedule change to the faculty member and the group"""
+        channels = [f"user:{class_session['faculty_id']}"]
+        if class_session.get("group_id"):
+            channels.append(f"group:{class_session['group_id']}")
+        
+        event_broker.publish(channels, event_type, {
+            "class_id": str(class_session["_id"]),
+            "subject": class_session.get("subject"),
+            "date": class_session.get("date"),
+            **data
+        })
     
     @staticmethod
     def cancel_class(class_id, reason=None):
@@ -179,13 +513,23 @@ class ClassSession:
         if reason:
             update_data["notes"] = reason
         
-        result = ClassSession.get_db().class_sessions.update_one(
+        before = ClassSession.get_db().class_sessions.find_one_and_update(
             {"_id": ObjectId(class_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection=ClassSession.CHANGE_PROJECTION
         )
         
+        if before:
+            SessionStats.record_change(before, update_data)
+            CalendarFeed.touch_sessions([before, update_data])
+            SessionConflicts.resolve([before["_id"]], "cancelled")
+            reminder_scheduler.cancel("class", before["_id"])
+        
         # Trigger student notification here
-        class_session = ClassSession.get_by_id(class_id)
+        class_session = ClassSession.get_by_id(
+            class_id,
+            {"faculty_id": 1, "group_id": 1, "subject": 1, "date": 1}
+        )
         if class_session:
             from services.notification import NotificationService
             group_id = class_session.get("group_id")
@@ -194,44 +538,58 @@ class ClassSession:
                 if reason:
                     message += f" Reason: {reason}"
                 NotificationService.notify_group(group_id, message)
+            
+            ClassSession._publish_change(class_session, "class_cancelled", {"reason": reason})
         
-        return result.modified_count > 0
+        return before is not None
     
     @staticmethod
-    def reschedule_class(class_id, new_date, notes=None):
-        """Reschedule a class session"""
+    def reschedule_class(class_id, new_date, notes=None, room_id=None):
+        """Reschedule a class session, keeping its room unless another is given"""
         # Get current class info
         class_session = ClassSession.get_by_id(class_id)
         if not class_session:
             return False
         
         # Mark original class as rescheduled
-        ClassSession.get_db().class_sessions.update_one(
+        before = ClassSession.get_db().class_sessions.find_one_and_update(
             {"_id": ObjectId(class_id)},
             {"$set": {
                 "status": ClassSession.STATUS["RESCHEDULED"],
                 "rescheduled_to": new_date,
                 "updated_at": datetime.datetime.utcnow(),
                 "notes": notes or class_session.get("notes", "")
-            }}
+            }},
+            projection=ClassSession.CHANGE_PROJECTION
         )
         
+        if before:
+            SessionStats.record_change(before, {"status": ClassSession.STATUS["RESCHEDULED"]})
+            SessionConflicts.resolve([before["_id"]], "rescheduled")
+            reminder_scheduler.cancel("class", before["_id"])
+        
         # Create new class session
         new_class = {
             "faculty_id": ObjectId(class_session["faculty_id"]) if isinstance(class_session["faculty_id"], str) else class_session["faculty_id"],
             "group_id": class_session.get("group_id"),
             "subject": class_session.get("subject"),
+            "room_id": room_id or class_session.get("room_id"),
             "date": new_date,
             "duration": class_session.get("duration", 1),
             "status": ClassSession.STATUS["NOT_COMPLETED"],
             "topic": class_session.get("topic", ""),
             "notes": notes or class_session.get("notes", ""),
             "rescheduled_from": str(class_session["_id"]),
+            "from_timetable": False,
             "created_at": datetime.datetime.utcnow(),
             "updated_at": datetime.datetime.utcnow()
         }
         
         result = ClassSession.get_db().class_sessions.insert_one(new_class)
+        SessionStats.record_inserted([new_class])
+        CalendarFeed.touch_sessions([before or class_session, new_class])
+        SessionConflicts.detect([new_class])
+        reminder_scheduler.schedule("class", result.inserted_id, new_date)
         
         # Trigger student notification
         if class_session.get("group_id"):
@@ -239,11 +597,16 @@ class ClassSession:
             message = f"Class rescheduled: {class_session.get('subject')} moved to {new_date.strftime('%Y-%m-%d %H:%M')}"
             NotificationService.notify_group(class_session.get("group_id"), message)
         
+        ClassSession._publish_change(class_session, "class_rescheduled", {
+            "new_class_id": str(result.inserted_id),
+            "new_date": new_date
+        })
+        
         return str(result.inserted_id)
     
     @staticmethod
-    def get_faculty_classes(faculty_id, start_date=None, end_date=None, status=None):
-        """Get class sessions for a faculty member with optional filters"""
+    def get_faculty_classes(faculty_id, start_date=None, end_date=None, status=None, fields=None):
+        """Get class sessions for a faculty member with optional filters and sparse fieldset"""
         query = {"faculty_id": ObjectId(faculty_id)}
         
         # Apply date filters
@@ -260,18 +623,13 @@ class ClassSession:
             query["status"] = status
         
         # Get classes
-        classes = list(ClassSession.get_db().class_sessions.find(query).sort("date", 1))
-        
-        # Convert ObjectId to string for JSON serialization
-        for c in classes:
-            c["_id"] = str(c["_id"])
-            c["faculty_id"] = str(c["faculty_id"])
+        classes = list(ClassSession.get_db().class_sessions.find(query, build_projection(fields)).sort("date", 1))
         
         return classes
     
     @staticmethod
-    def get_student_classes(group_id, start_date=None, end_date=None):
-        """Get class sessions for a student group with optional date filters"""
+    def get_student_classes(group_id, start_date=None, end_date=None, fields=None):
+        """Get class sessions for a student group with faculty names, optional date filters and sparse fieldset"""
         query = {"group_id": group_id}
         
         # Apply date filters
@@ -284,11 +642,177 @@ class ClassSession:
             query["date"] = date_query
         
         # Get classes
-        classes = list(ClassSession.get_db().class_sessions.find(query).sort("date", 1))
-        
-        # Convert ObjectId to string for JSON serialization
-        for c in classes:
-            c["_id"] = str(c["_id"])
-            c["faculty_id"] = str(c["faculty_id"])
+        classes = list(ClassSession.get_db().class_sessions.find(
+            query,
+            build_projection(fields, {"faculty_name": "faculty_id"})
+        ).sort("date", 1))
+        
+        # Add faculty names with a single query
+        if wants(fields, "faculty_name"):
+            names = {
+                f["_id"]: f.get("name", "")
+                for f in ClassSession.get_db().users.find(
+                    {"_id": {"$in": list({cls["faculty_id"] for cls in classes})}},
+                    {"name": 1}
+                )
+            }
+            
+            for cls in classes:
+                if cls["faculty_id"] in names:
+                    cls["faculty_name"] = names[cls["faculty_id"]]
         
         return classes
+    
+    @staticmethod
+    def _summarize_impact(match):
+        """Count sessions matching a filter by faculty and by group in one aggregation"""
+        result = list(ClassSession.get_db().class_sessions.aggregate([
+            {"$match": match},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "by_faculty": [
+                    {"$group": {"_id": "$faculty_id", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}}
+                ],
+                "by_group": [
+                    {"$match": {"group_id": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$group_id", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}}
+                ]
+            }}
+        ]))[0]
+        
+        # Resolve faculty names with a single query
+        faculty_ids = [f["_id"] for f in result["by_faculty"]]
+        names = {
+            f["_id"]: f.get("name", "")
+            for f in ClassSession.get_db().users.find({"_id": {"$in": faculty_ids}}, {"name": 1})
+        }
+        
+        return {
+            "total": result["total"][0]["count"] if result["total"] else 0,
+            "by_faculty": [
+                {"faculty_id": str(f["_id"]), "faculty_name": names.get(f["_id"], ""), "count": f["count"]}
+                for f in result["by_faculty"]
+            ],
+            "by_group": [
+                {"group_id": g["_id"], "count": g["count"]}
+                for g in result["by_group"]
+            ]
+        }
+    
+    @staticmethod
+    def _holiday_match(date):
+        """Filter for pending sessions on a holiday's date"""
+        day_start = datetime.datetime.combine(date.date(), datetime.time.min)
+        return {
+            "date": {"$gte": day_start, "$lt": day_start + datetime.timedelta(days=1)},
+            "status": ClassSession.STATUS["NOT_COMPLETED"]
+        }
+    
+    @staticmethod
+    def get_holiday_impact(date):
+        """Preview the sessions a holiday on this date would cancel"""
+        return ClassSession._summarize_impact(ClassSession._holiday_match(date))
+    
+    @staticmethod
+    def mark_holiday(holiday_id, date):
+        """Mark all pending sessions on a holiday's date with the holiday status
+        
+        The sessions are read once and updated by ID, so the stats, rooms
+        and conflicts all follow the same set of sessions.
+        """
+        db = ClassSession.get_db()
+        sessions = list(db.class_sessions.find(ClassSession._holiday_match(date), ClassSession.CHANGE_PROJECTION))
+        if not sessions:
+            return 0
+        
+        ids = [session["_id"] for session in sessions]
+        result = db.class_sessions.update_many(
+            {"_id": {"$in": ids}, "status": ClassSession.STATUS["NOT_COMPLETED"]},
+            {"$set": {
+                "status": ClassSession.STATUS["HOLIDAY"],
+                "holiday_id": str(holiday_id),
+                "updated_at": datetime.datetime.utcnow()
+            }}
+        )
+        
+        # Sessions whose status changed in between were left alone
+        if result.modified_count < len(sessions):
+            marked = set(db.class_sessions.distinct(
+                "_id",
+                {"_id": {"$in": ids}, "holiday_id": str(holiday_id), "status": ClassSession.STATUS["HOLIDAY"]}
+            ))
+            sessions = [session for session in sessions if session["_id"] in marked]
+        
+        deltas = Counter()
+        for session in sessions:
+            SessionStats.move(deltas, session, {**session, "status": ClassSession.STATUS["HOLIDAY"]})
+        SessionStats.apply(deltas)
+        
+        # Sessions off for the holiday free their rooms and no longer clash
+        rooms = {session.get("room_id") for session in sessions}
+        CalendarFeed.touch(*[CalendarFeed.owner_key("room", room_id) for room_id in rooms if room_id])
+        SessionConflicts.resolve([session["_id"] for session in sessions], "holiday")
+        
+        return result.modified_count
+    
+    @staticmethod
+    def get_holiday_restore_impact(holiday_id):
+        """Preview the sessions that removing a holiday would restore"""
+        return ClassSession._summarize_impact({
+            "holiday_id": str(holiday_id),
+            "status": ClassSession.STATUS["HOLIDAY"]
+        })
+    
+    @staticmethod
+    def restore_from_holiday(holiday_id):
+        """Return sessions marked for a holiday to not completed
+        
+        As in mark_holiday, the sessions are read once and updated by ID, so
+        the stats, rooms, conflicts and reminders follow the same set.
+        """
+        db = ClassSession.get_db()
+        sessions = list(db.class_sessions.find(
+            {"holiday_id": str(holiday_id), "status": ClassSession.STATUS["HOLIDAY"]},
+            {**ClassSession.CHANGE_PROJECTION, **SessionConflicts.PROJECTION}
+        ))
+        if not sessions:
+            return 0
+        
+        ids = [session["_id"] for session in sessions]
+        # Stored dates keep milliseconds, so the stamp is truncated to find the restored sessions by it
+        now = datetime.datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        result = db.class_sessions.update_many(
+            {"_id": {"$in": ids}, "status": ClassSession.STATUS["HOLIDAY"]},
+            {
+                "$set": {
+                    "status": ClassSession.STATUS["NOT_COMPLETED"],
+                    "updated_at": now
+                },
+                "$unset": {"holiday_id": ""}
+            }
+        )
+        
+        # Sessions whose status changed in between were left alone
+        if result.modified_count < len(sessions):
+            restored = set(db.class_sessions.distinct(
+                "_id",
+                {"_id": {"$in": ids}, "status": ClassSession.STATUS["NOT_COMPLETED"], "updated_at": now}
+            ))
+            sessions = [session for session in sessions if session["_id"] in restored]
+        
+        sessions = [{**session, "status": ClassSession.STATUS["NOT_COMPLETED"]} for session in sessions]
+        deltas = Counter()
+        for session in sessions:
+            SessionStats.move(deltas, {**session, "status": ClassSession.STATUS["HOLIDAY"]}, session)
+        SessionStats.apply(deltas)
+        
+        rooms = {session.get("room_id") for session in sessions}
+        CalendarFeed.touch(*[CalendarFeed.owner_key("room", room_id) for room_id in rooms if room_id])
+        SessionConflicts.detect(sessions)
+        for session in sessions:
+            reminder_scheduler.schedule("class", session["_id"], session["date"])
+        
+        return result.modified_count
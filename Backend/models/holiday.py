@@ -1,15 +1,34 @@
 from flask import current_app
 from bson.objectid import ObjectId
 import datetime
+from services.calendar_feed import CalendarFeed
+from utils.cache import single_flight
+from utils.helpers import build_projection
 
 class Holiday:
     """Holiday model for database operations"""
     
+    # Fields clients may request with ?fields=
+    FIELDS = ("name", "date", "description", "is_recurring", "created_at", "updated_at")
+    
     @staticmethod
     def get_db():
         """Get the database connection"""
         return current_app.config['MONGO_DB']
     
+    @staticmethod
+    def parse_date(value):
+        """Parse a holiday date string, returning None if it is invalid"""
+        if isinstance(value, datetime.datetime):
+            return value
+        
+        try:
+            if 'T' in value:
+                return datetime.datetime.fromisoformat(value)
+            return datetime.datetime.fromisoformat(value + "T00:00:00")
+        except (TypeError, ValueError):
+            return None
+    
     @staticmethod
     def create(holiday_data):
         """Create a new holiday"""
@@ -32,12 +51,14 @@ class Holiday:
                 except ValueError:
                     # Fallback to today's date if conversion fails
                     holiday_data["date"] = datetime.datetime.combine(
-                        datetime.datetime.utcnow().date(), 
+                        datetime.datetime.utcnow().date(),
                         datetime.time.min
                     )
         
         # Insert holiday
         result = Holiday.get_db().holidays.insert_one(holiday_data)
+        CalendarFeed.touch(CalendarFeed.HOLIDAYS)
+        single_flight.forget("holidays")
         
         return {
             **holiday_data,
@@ -45,12 +66,10 @@ class Holiday:
         }
     
     @staticmethod
-    def get_by_id(holiday_id):
-        """Get a holiday by ID"""
+    def get_by_id(holiday_id, projection=None):
+        """Get a holiday by ID, optionally limited to a projection"""
         try:
-            holiday = Holiday.get_db().holidays.find_one({"_id": ObjectId(holiday_id)})
-            if holiday:
-                holiday["_id"] = str(holiday["_id"])
+            holiday = Holiday.get_db().holidays.find_one({"_id": ObjectId(holiday_id)}, projection)
             return holiday
         except Exception:
             return None
@@ -80,6 +99,10 @@ class Holiday:
                 {"$set": update_data}
             )
             
+            if result.modified_count > 0:
+                CalendarFeed.touch(CalendarFeed.HOLIDAYS)
+                single_flight.forget("holidays")
+            
             return result.modified_count > 0
         except Exception:
             return False
@@ -89,13 +112,21 @@ class Holiday:
         """Delete a holiday"""
         try:
             result = Holiday.get_db().holidays.delete_one({"_id": ObjectId(holiday_id)})
+            
+            if result.deleted_count > 0:
+                CalendarFeed.touch(CalendarFeed.HOLIDAYS)
+                single_flight.forget("holidays")
+            
             return result.deleted_count > 0
         except Exception:
             return False
     
     @staticmethod
-    def get_all(start_date=None, end_date=None):
-        """Get all holidays with optional date filters"""
+    def get_all(start_date=None, end_date=None, fields=None):
+        """Get all holidays with optional date filters and sparse fieldset
+        
+        Identical concurrent reads share one query.
+        """
         query = {}
         
         # Apply date filters
@@ -108,7 +139,7 @@ class Holiday:
                         start_date = datetime.datetime.fromisoformat(start_date.replace('Z', '+00:00'))
                     except ValueError:
                         start_date = datetime.datetime.combine(
-                            datetime.datetime.utcnow().date(), 
+                            datetime.datetime.utcnow().date(),
                             datetime.time.min
                         )
                 
@@ -121,7 +152,7 @@ class Holiday:
                         end_date = datetime.datetime.fromisoformat(end_date.replace('Z', '+00:00'))
                     except ValueError:
                         end_date = datetime.datetime.combine(
-                            datetime.datetime.utcnow().date() + datetime.timedelta(days=30), 
+                            datetime.datetime.utcnow().date() + datetime.timedelta(days=30),
                             datetime.time.max
                         )
                 
@@ -131,13 +162,11 @@ class Holiday:
         
         try:
             # Get holidays
-            holidays = list(Holiday.get_db().holidays.find(query).sort("date", 1))
-            
-            # Convert ObjectId to string for JSON serialization
-            for h in holidays:
-                h["_id"] = str(h["_id"])
-            
-            return holidays
+            return single_flight.do(
+                "holidays",
+                {"query": query, "fields": fields},
+                lambda: list(Holiday.get_db().holidays.find(query, build_projection(fields)).sort("date", 1))
+            )
         except Exception:
             # Return empty list on error
             return []
@@ -1,6 +1,10 @@
 from flask import current_app
 from bson.objectid import ObjectId
 import datetime
+from services.events import event_broker
+from services.calendar_feed import CalendarFeed
+from services.reminders import reminder_scheduler
+from utils.helpers import build_projection, wants
 
 class Meeting:
     """Meeting model for database operations"""
@@ -13,6 +17,12 @@ class Meeting:
         "CANCELLED": "cancelled"
     }
     
+    # Fields clients may request with ?fields=
+    FIELDS = (
+        "student_id", "faculty_id", "student_name", "preferred_time", "duration", "reason",
+        "status", "response_message", "created_at", "updated_at"
+    )
+    
     @staticmethod
     def get_db():
         """Get the database connection"""
@@ -87,14 +97,10 @@ class Meeting:
             return None
     
     @staticmethod
-    def get_by_id(meeting_id):
-        """Get a meeting by ID"""
+    def get_by_id(meeting_id, projection=None):
+        """Get a meeting by ID, optionally limited to a projection"""
         try:
-            meeting = Meeting.get_db().meetings.find_one({"_id": ObjectId(meeting_id)})
-            if meeting:
-                meeting["_id"] = str(meeting["_id"])
-                meeting["faculty_id"] = str(meeting["faculty_id"])
-                meeting["student_id"] = str(meeting["student_id"])
+            meeting = Meeting.get_db().meetings.find_one({"_id": ObjectId(meeting_id)}, projection)
             return meeting
         except Exception:
             return None
@@ -138,11 +144,14 @@ class Meeting:
                             pass
                     
                     # Check if activity already exists
-                    existing_activity = current_app.config['MONGO_DB'].activities.find_one({
-                        "faculty_id": faculty_id,
-                        "activity_type": "meeting",
-                        "meeting_id": str(meeting_id)
-                    })
+                    existing_activity = current_app.config['MONGO_DB'].activities.find_one(
+                        {
+                            "faculty_id": faculty_id,
+                            "activity_type": "meeting",
+                            "meeting_id": str(meeting_id)
+                        },
+                        {"_id": 1}
+                    )
                     
                     if existing_activity:
                         # Update existing activity
@@ -192,7 +201,10 @@ class Meeting:
                             pass
                     
                     # Get faculty name
-                    faculty = current_app.config['MONGO_DB'].users.find_one({"_id": ObjectId(meeting["faculty_id"])})
+                    faculty = current_app.config['MONGO_DB'].users.find_one(
+                        {"_id": ObjectId(meeting["faculty_id"])},
+                        {"name": 1}
+                    )
                     faculty_name = faculty.get("name", "Faculty") if faculty else "Faculty"
                     
                     if status == Meeting.STATUS["APPROVED"]:
@@ -206,14 +218,28 @@ class Meeting:
                 except Exception as e:
                     print(f"Error sending notification for meeting: {e}")
             
+            CalendarFeed.touch(CalendarFeed.owner_key("faculty", meeting["faculty_id"]))
+            
+            if status == Meeting.STATUS["APPROVED"]:
+                reminder_scheduler.schedule("meeting", meeting_id, meeting["preferred_time"])
+            else:
+                reminder_scheduler.cancel("meeting", meeting_id)
+            
+            # Push the status change to both participants
+            event_broker.publish(
+                [f"user:{meeting['student_id']}", f"user:{meeting['faculty_id']}"],
+                "meeting_status",
+                {"meeting_id": str(meeting_id), "status": status}
+            )
+            
             return result.modified_count > 0
         except Exception as e:
             print(f"Error updating meeting status: {e}")
             return False
     
     @staticmethod
-    def get_student_meetings(student_id, status=None):
-        """Get meetings requested by a student"""
+    def get_student_meetings(student_id, status=None, fields=None):
+        """Get meetings requested by a student, limited to the given fields"""
         try:
             query = {"student_id": ObjectId(student_id)}
             
@@ -222,21 +248,24 @@ class Meeting:
                 query["status"] = status
             
             # Get meetings
-            meetings = list(Meeting.get_db().meetings.find(query).sort("preferred_time", 1))
+            meetings = list(Meeting.get_db().meetings.find(
+                query,
+                build_projection(fields, {"faculty_name": "faculty_id"})
+            ).sort("preferred_time", 1))
             
-            # Convert ObjectId to string for JSON serialization
-            for m in meetings:
-                m["_id"] = str(m["_id"])
-                m["faculty_id"] = str(m["faculty_id"])
-                m["student_id"] = str(m["student_id"])
+            # Get faculty details with a single query
+            if wants(fields, "faculty_name"):
+                faculty = {
+                    f["_id"]: f
+                    for f in current_app.config['MONGO_DB'].users.find(
+                        {"_id": {"$in": list({m["faculty_id"] for m in meetings})}},
+                        {"name": 1}
+                    )
+                }
                 
-                # Get faculty details
-                try:
-                    faculty = current_app.config['MONGO_DB'].users.find_one({"_id": ObjectId(m["faculty_id"])})
-                    if faculty:
-                        m["faculty_name"] = faculty.get("name", "")
-                except Exception:
-                    pass
+                for m in meetings:
+                    if m["faculty_id"] in faculty:
+                        m["faculty_name"] = faculty[m["faculty_id"]].get("name", "")
             
             return meetings
         except Exception as e:
@@ -244,8 +273,8 @@ class Meeting:
             return []
     
     @staticmethod
-    def get_faculty_meetings(faculty_id, status=None, start_date=None, end_date=None):
-        """Get meetings requested to a faculty member"""
+    def get_faculty_meetings(faculty_id, status=None, start_date=None, end_date=None, fields=None):
+        """Get meetings requested to a faculty member, limited to the given fields"""
         try:
             query = {"faculty_id": ObjectId(faculty_id)}
             
@@ -279,22 +308,25 @@ class Meeting:
                     query["preferred_time"] = date_query
             
             # Get meetings
-            meetings = list(Meeting.get_db().meetings.find(query).sort("preferred_time", 1))
+            meetings = list(Meeting.get_db().meetings.find(
+                query,
+                build_projection(fields, {"student_name": "student_id", "student_reg_number": "student_id"})
+            ).sort("preferred_time", 1))
             
-            # Convert ObjectId to string for JSON serialization
-            for m in meetings:
-                m["_id"] = str(m["_id"])
-                m["faculty_id"] = str(m["faculty_id"])
-                m["student_id"] = str(m["student_id"])
+            # Get student details with a single query
+            if wants(fields, "student_name") or wants(fields, "student_reg_number"):
+                students = {
+                    student["_id"]: student
+                    for student in current_app.config['MONGO_DB'].users.find(
+                        {"_id": {"$in": list({m["student_id"] for m in meetings})}},
+                        {"name": 1, "registration_number": 1}
+                    )
+                }
                 
-                # Get student details
-                try:
-                    student = current_app.config['MONGO_DB'].users.find_one({"_id": ObjectId(m["student_id"])})
-                    if student:
-                        m["student_name"] = student.get("name", "")
-                        m["student_reg_number"] = student.get("registration_number", "")
-                except Exception:
-                    pass
+                for m in meetings:
+                    if m["student_id"] in students:
+                        m["student_name"] = students[m["student_id"]].get("name", "")
+                        m["student_reg_number"] = students[m["student_id"]].get("registration_number", "")
             
             return meetings
         except Exception as e:
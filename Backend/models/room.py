@@ -0,0 +1,158 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+import datetime
+from utils.helpers import build_projection
+
+class Room:
+    """Room model for database operations
+    
+    Timetable slots, class sessions and activities refer to a room by its
+    string ID in `room_id`.
+    """
+    
+    ROOM_TYPES = [
+        "lecture_hall",
+        "lab",
+        "seminar_room",
+        "tutorial_room",
+        "other"
+    ]
+    
+    # Fields clients may request with ?fields=
+    FIELDS = ("name", "building", "capacity", "room_type", "is_active", "created_at", "updated_at")
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the room indexes and the room lookups on bookings"""
+        db = Room.get_db()
+        try:
+            db.rooms.create_index([("name", ASCENDING)], unique=True)
+        except OperationFailure:
+            # Existing duplicates prevent a unique index; index for lookups only
+            db.rooms.create_index([("name", ASCENDING)])
+        db.rooms.create_index([("is_active", ASCENDING), ("capacity", ASCENDING)])
+        db.class_sessions.create_index([("room_id", ASCENDING), ("date", ASCENDING)], sparse=True)
+        db.activities.create_index([("room_id", ASCENDING), ("start_time", ASCENDING)], sparse=True)
+        db.timetable_slots.create_index(
+            [("room_id", ASCENDING), ("weekday", ASCENDING), ("start", ASCENDING)],
+            sparse=True
+        )
+    
+    @staticmethod
+    def validate(room_data, partial=False):
+        """Check and normalise room fields in place, raising ValueError"""
+        if not partial or "name" in room_data:
+            name = str(room_data.get("name") or "").strip()
+            if not name:
+                raise ValueError("Room name is required")
+            room_data["name"] = name
+        
+        if not partial or "capacity" in room_data:
+            try:
+                room_data["capacity"] = int(room_data.get("capacity"))
+            except (TypeError, ValueError):
+                raise ValueError("Capacity must be a whole number")
+            if room_data["capacity"] < 1:
+                raise ValueError("Capacity must be at least 1")
+        
+        if "room_type" in room_data and room_data["room_type"] not in Room.ROOM_TYPES:
+            raise ValueError(f"Invalid room type: {room_data['room_type']}")
+        
+        if "is_active" in room_data:
+            room_data["is_active"] = bool(room_data["is_active"])
+    
+    @staticmethod
+    def create(room_data):
+        """Create a new room, returning None if the name is taken"""
+        now = datetime.datetime.utcnow()
+        room = {
+            "name": room_data["name"],
+            "building": room_data.get("building", ""),
+            "capacity": room_data["capacity"],
+            "room_type": room_data.get("room_type", "other"),
+            "is_active": room_data.get("is_active", True),
+            "created_at": now,
+            "updated_at": now
+        }
+        
+        try:
+            result = Room.get_db().rooms.insert_one(room)
+        except DuplicateKeyError:
+            return None
+        
+        return {
+            **room,
+            "_id": result.inserted_id
+        }
+    
+    @staticmethod
+    def get_by_id(room_id, projection=None):
+        """Get a room by ID, optionally limited to a projection"""
+        try:
+            return Room.get_db().rooms.find_one({"_id": ObjectId(room_id)}, projection)
+        except Exception:
+            return None
+    
+    @staticmethod
+    def exists(room_id, active_only=True):
+        """Check that a room ID refers to a (by default active) room"""
+        room = Room.get_by_id(room_id, {"is_active": 1})
+        return room is not None and (room.get("is_active", True) or not active_only)
+    
+    @staticmethod
+    def update(room_id, update_data):
+        """Update a room"""
+        if not ObjectId.is_valid(room_id):
+            return False
+        
+        update_data = {key: value for key, value in update_data.items() if key in Room.FIELDS}
+        update_data.pop("created_at", None)
+        update_data["updated_at"] = datetime.datetime.utcnow()
+        
+        try:
+            result = Room.get_db().rooms.update_one({"_id": ObjectId(room_id)}, {"$set": update_data})
+        except DuplicateKeyError:
+            raise ValueError(f"A room named {update_data.get('name')} already exists")
+        
+        return result.matched_count > 0
+    
+    @staticmethod
+    def delete(room_id):
+        """Delete a room"""
+        result = Room.get_db().rooms.delete_one({"_id": ObjectId(room_id)})
+        return result.deleted_count > 0
+    
+    @staticmethod
+    def has_bookings(room_id, since=None):
+        """Check whether any weekly slot, upcoming session or activity uses a room"""
+        db = Room.get_db()
+        since = since or datetime.datetime.utcnow()
+        
+        return (
+            db.timetable_slots.find_one({"room_id": str(room_id)}, {"_id": 1}) is not None
+            or db.class_sessions.find_one({"room_id": str(room_id), "date": {"$gte": since}}, {"_id": 1}) is not None
+            or db.activities.find_one({"room_id": str(room_id), "start_time": {"$gte": since}}, {"_id": 1}) is not None
+        )
+    
+    @staticmethod
+    def list_all(room_type=None, min_capacity=None, active_only=False, fields=None):
+        """List rooms by name with optional filters and sparse fieldset"""
+        query = {}
+        
+        if room_type:
+            query["room_type"] = room_type
+        
+        if min_capacity:
+            query["capacity"] = {"$gte": int(min_capacity)}
+        
+        if active_only:
+            query["is_active"] = {"$ne": False}
+        
+        return list(Room.get_db().rooms.find(query, build_projection(fields)).sort("name", ASCENDING))
\ No newline at end of file
@@ -1,15 +1,219 @@
 from flask import current_app
 from bson.objectid import ObjectId
+from pymongo import ASCENDING, DeleteOne, ReplaceOne, UpdateOne
 import datetime
+from services.calendar_feed import CalendarFeed
+from services.free_busy import FreeBusy
+from utils.cache import single_flight
 
 class Timetable:
-    """Timetable model for database operations"""
+    """Timetable model for database operations
+    
+    Each faculty member's `weekly_schedule` maps day names to period keys
+    ("9" for whole hours or "10:30") and slot data with a duration in
+    hours. Every slot is also kept as a document in `timetable_slots` with
+    its weekday and start/end minute, so lookups by group, faculty and time
+    are indexed range queries instead of scans over every timetable.
+    """
+    
+    WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+    
+    # Slot document fields that are not part of the slot data
+    SLOT_FIELDS = ("faculty_id", "day", "weekday", "period", "start", "end", "updated_at")
     
     @staticmethod
     def get_db():
         """Get the database connection"""
         return current_app.config['MONGO_DB']
     
+    @staticmethod
+    def ensure_indexes():
+        """Create the slot indexes, building the slots on first run"""
+        db = Timetable.get_db()
+        db.timetable_slots.create_index([("group_id", ASCENDING), ("weekday", ASCENDING), ("start", ASCENDING)])
+        db.timetable_slots.create_index([("faculty_id", ASCENDING), ("weekday", ASCENDING), ("start", ASCENDING)])
+        db.timetable_slots.create_index(
+            [("faculty_id", ASCENDING), ("day", ASCENDING), ("period", ASCENDING)],
+            unique=True
+        )
+        
+        if not db.timetable_slots.estimated_document_count() and db.timetables.estimated_document_count():
+            Timetable.rebuild_slots()
+    
+    @staticmethod
+    def parse_period(period):
+        """Get the start of a period key in minutes after midnight
+        
+        Accepts whole hours ("9") and HH:MM times ("10:30"). Raises
+        ValueError for anything else.
+        """
+        hours, _, minutes = str(period).strip().partition(":")
+        
+        try:
+            hour = int(hours)
+            minute = int(minutes) if minutes else 0
+        except ValueError:
+            raise ValueError(f"Invalid period: {period}")
+        
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid period: {period}")
+        
+        return hour * 60 + minute
+    
+    @staticmethod
+    def slot_bounds(period, data):
+        """Get the start and end of a slot in minutes after midnight"""
+        start = Timetable.parse_period(period)
+        
+        try:
+            duration = float(data.get("duration", 1) or 1)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid duration for period {period}")
+        
+        return start, min(start + round(duration * 60), 24 * 60)
+    
+    @staticmethod
+    def validate_schedule(weekly_schedule):
+        """Check the day names and period keys of a weekly schedule, raising ValueError"""
+        if not isinstance(weekly_schedule, dict):
+            raise ValueError("Weekly schedule must be an object")
+        
+        for day, periods in weekly_schedule.items():
+            if day not in Timetable.WEEKDAYS:
+                raise ValueError(f"Invalid day: {day}")
+            
+            for period, data in (periods or {}).items():
+                if data:
+                    Timetable.slot_bounds(period, data)
+    
+    @staticmethod
+    def _slot_document(faculty_id, day, period, data, now):
+        """Build the timetable_slots document for one slot"""
+        start, end = Timetable.slot_bounds(period, data)
+        
+        return {
+            **data,
+            "faculty_id": ObjectId(faculty_id),
+            "day": day,
+            "weekday": Timetable.WEEKDAYS.index(day),
+            "period": str(period),
+            "start": start,
+            "end": end,
+            "updated_at": now
+        }
+    
+    @staticmethod
+    def _slot_operations(faculty_id, old_schedule, new_schedule, now):
+        """Get the timetable_slots writes that mirror a weekly schedule change"""
+        added, removed, changed = Timetable.diff_schedules(old_schedule, new_schedule)
+        
+        def key(day, period):
+            return {"faculty_id": ObjectId(faculty_id), "day": day, "period": str(period)}
+        
+        operations = [DeleteOne(key(day, period)) for day, period in removed]
+        operations += [
+            ReplaceOne(key(day, period), Timetable._slot_document(faculty_id, day, period, data, now), upsert=True)
+            for (day, period), data in {**added, **changed}.items()
+        ]
+        
+        return operations
+    
+    @staticmethod
+    def _sync_slots(faculty_id, old_schedule, new_schedule):
+        """Mirror a weekly schedule change into timetable_slots"""
+        operations = Timetable._slot_operations(faculty_id, old_schedule, new_schedule, datetime.datetime.utcnow())
+        
+        if operations:
+            Timetable.get_db().timetable_slots.bulk_write(operations, ordered=False)
+            single_flight.forget("group_slots")
+    
+    @staticmethod
+    def rebuild_slots():
+        """Rebuild timetable_slots from the stored weekly schedules
+        
+        Slots with an invalid day or period key are skipped. Returns the
+        number of slots written and the number skipped.
+        """
+        db = Timetable.get_db()
+        now = datetime.datetime.utcnow()
+        written, skipped = 0, 0
+        
+        for timetable in db.timetables.find({}, {"faculty_id": 1, "weekly_schedule": 1}):
+            slots = []
+            for day, periods in (timetable.get("weekly_schedule") or {}).items():
+                for period, data in (periods or {}).items():
+                    if not data:
+                        continue
+                    try:
+                        slots.append(Timetable._slot_document(timetable["faculty_id"], day, period, data, now))
+                    except ValueError:
+                        skipped += 1
+            
+            db.timetable_slots.delete_many({"faculty_id": timetable["faculty_id"]})
+            if slots:
+                db.timetable_slots.insert_many(slots)
+            written += len(slots)
+        
+        single_flight.forget("group_slots")
+        return written, skipped
+    
+    @staticmethod
+    def get_room_conflicts(faculty_id, weekly_schedule, previous_schedule=None):
+        """Get the slots that would share a room with another faculty member's slot
+        
+        Only slots with a room_id are checked, and when the previous schedule
+        is given only the slots added or changed since then. Returns one entry
+        per clashing slot with the slot it clashes with.
+        """
+        if previous_schedule is None:
+            slots = {
+                (day, period): data
+                for day, periods in (weekly_schedule or {}).items()
+                for period, data in (periods or {}).items()
+                if data
+            }
+        else:
+            added, _, changed = Timetable.diff_schedules(previous_schedule, weekly_schedule)
+            slots = {**added, **changed}
+        
+        conflicts = []
+        for (day, period), data in slots.items():
+            if not data.get("room_id"):
+                continue
+            
+            start, end = Timetable.slot_bounds(period, data)
+            clash = Timetable.get_db().timetable_slots.find_one(
+                {
+                    "room_id": data["room_id"],
+                    "weekday": Timetable.WEEKDAYS.index(day),
+                    "start": {"$lt": end},
+                    "end": {"$gt": start},
+                    "faculty_id": {"$ne": ObjectId(faculty_id)}
+                },
+                {"_id": 0, "faculty_id": 1, "day": 1, "period": 1, "subject": 1, "group_id": 1}
+            )
+            
+            if clash:
+                conflicts.append({"day": day, "period": str(period), "room_id": data["room_id"], "conflicts_with": clash})
+        
+        return conflicts
+    
+    @staticmethod
+    def _touch_calendars(faculty_id, *schedules):
+        """Bump the calendar feed versions of the faculty and the groups in the schedules"""
+        group_ids = {
+            slot.get("group_id")
+            for schedule in schedules
+            for periods in (schedule or {}).values()
+            for slot in (periods or {}).values()
+            if isinstance(slot, dict) and slot.get("group_id")
+        }
+        
+        CalendarFeed.touch(
+            CalendarFeed.owner_key("faculty", faculty_id),
+            *[CalendarFeed.owner_key("group", group_id) for group_id in group_ids]
+        )
+    
     @staticmethod
     def create_weekly_timetable(faculty_id, timetable_data):
         """Create a weekly timetable for a faculty member"""
@@ -23,6 +227,8 @@ class Timetable:
         
         # Insert timetable
         result = Timetable.get_db().timetables.insert_one(timetable)
+        Timetable._sync_slots(faculty_id, {}, timetable_data)
+        Timetable._touch_calendars(faculty_id, timetable_data)
         
         return {
             **timetable,
@@ -30,12 +236,9 @@ class Timetable:
         }
     
     @staticmethod
-    def get_faculty_timetable(faculty_id):
-        """Get the timetable for a faculty member"""
-        timetable = Timetable.get_db().timetables.find_one({"faculty_id": ObjectId(faculty_id)})
-        if timetable:
-            timetable["_id"] = str(timetable["_id"])
-            timetable["faculty_id"] = str(timetable["faculty_id"])
+    def get_faculty_timetable(faculty_id, projection=None):
+        """Get the timetable for a faculty member, optionally limited to a projection"""
+        timetable = Timetable.get_db().timetables.find_one({"faculty_id": ObjectId(faculty_id)}, projection)
         return timetable
     
     @staticmethod
@@ -43,25 +246,84 @@ class Timetable:
         """Update a timetable by ID"""
         update_data['updated_at'] = datetime.datetime.utcnow()
         
-        result = Timetable.get_db().timetables.update_one(
+        # The document before the update holds the schedule being replaced
+        timetable = Timetable.get_db().timetables.find_one_and_update(
             {"_id": ObjectId(timetable_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection={"faculty_id": 1, "weekly_schedule": 1}
         )
         
-        return result.modified_count > 0
+        if timetable:
+            if "weekly_schedule" in update_data:
+                Timetable._sync_slots(timetable["faculty_id"], timetable.get("weekly_schedule"), update_data["weekly_schedule"])
+            # Groups dropped from the schedule lose their sessions too
+            Timetable._touch_calendars(timetable["faculty_id"], timetable.get("weekly_schedule"), update_data.get("weekly_schedule"))
+        
+        return timetable is not None
+    
+    @staticmethod
+    def replace_schedules(schedules):
+        """Write the weekly schedules of many faculty members at once
+        
+        schedules maps faculty IDs to weekly schedules. Timetables and their
+        slots are each written with one bulk write. Returns the schedules
+        that were replaced, keyed the same way ({} where there was none).
+        """
+        db = Timetable.get_db()
+        now = datetime.datetime.utcnow()
+        
+        previous = {
+            str(timetable["faculty_id"]): timetable.get("weekly_schedule") or {}
+            for timetable in db.timetables.find(
+                {"faculty_id": {"$in": [ObjectId(faculty_id) for faculty_id in schedules]}},
+                {"faculty_id": 1, "weekly_schedule": 1}
+            )
+        }
+        
+        db.timetables.bulk_write([
+            UpdateOne(
+                {"faculty_id": ObjectId(faculty_id)},
+                {"$set": {"weekly_schedule": schedule, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            )
+            for faculty_id, schedule in schedules.items()
+        ], ordered=False)
+        
+        operations = []
+        owners = set()
+        for faculty_id, schedule in schedules.items():
+            old_schedule = previous.get(str(faculty_id), {})
+            operations += Timetable._slot_operations(faculty_id, old_schedule, schedule, now)
+            
+            owners.add(CalendarFeed.owner_key("faculty", faculty_id))
+            owners.update(
+                CalendarFeed.owner_key("group", slot["group_id"])
+                for weekly_schedule in (old_schedule, schedule)
+                for periods in weekly_schedule.values()
+                for slot in (periods or {}).values()
+                if isinstance(slot, dict) and slot.get("group_id")
+            )
+        
+        if operations:
+            db.timetable_slots.bulk_write(operations, ordered=False)
+            single_flight.forget("group_slots")
+        CalendarFeed.touch(*owners)
+        
+        return {faculty_id: previous.get(str(faculty_id), {}) for faculty_id in schedules}
     
     @staticmethod
     def update_weekly_schedule(faculty_id, day, period, data):
         """Update a specific time slot in the weekly schedule"""
-        # Find the timetable
-        timetable = Timetable.get_db().timetables.find_one({"faculty_id": ObjectId(faculty_id)})
+        # Find the timetable, reading only the day being changed
+        timetable = Timetable.get_db().timetables.find_one(
+            {"faculty_id": ObjectId(faculty_id)},
+            {f"weekly_schedule.{day}": 1}
+        )
         
         if not timetable:
             return False
         
-        # Update the specific slot
-        timetable['weekly_schedule'][day][period] = data
-        timetable['updated_at'] = datetime.datetime.utcnow()
+        previous = timetable.get('weekly_schedule', {}).get(day, {}).get(period)
         
         # Save the updated timetable
         result = Timetable.get_db().timetables.update_one(
@@ -72,8 +334,40 @@ class Timetable:
             }}
         )
         
+        Timetable._sync_slots(faculty_id, {day: {period: previous}}, {day: {period: data}})
+        Timetable._touch_calendars(faculty_id, {day: {"new": data, "previous": previous}})
+        
         return result.modified_count > 0
     
+    @staticmethod
+    def diff_schedules(old_schedule, new_schedule):
+        """Compare two weekly schedules slot by slot
+        
+        Returns (added, removed, changed) dicts keyed by (day, period),
+        holding the new slot data for added and changed slots and the old
+        slot data for removed ones. Empty slots count as absent.
+        """
+        old_schedule = old_schedule or {}
+        new_schedule = new_schedule or {}
+        added, removed, changed = {}, {}, {}
+        
+        for day in set(old_schedule) | set(new_schedule):
+            old_day = old_schedule.get(day) or {}
+            new_day = new_schedule.get(day) or {}
+            
+            for period in set(old_day) | set(new_day):
+                old_slot = old_day.get(period)
+                new_slot = new_day.get(period)
+                
+                if old_slot and not new_slot:
+                    removed[(day, period)] = old_slot
+                elif new_slot and not old_slot:
+                    added[(day, period)] = new_slot
+                elif new_slot and new_slot != old_slot:
+                    changed[(day, period)] = new_slot
+        
+        return added, removed, changed
+    
     @staticmethod
     def get_student_timetable(student_id):
         """Get the timetable for a student based on group assignment"""
@@ -88,10 +382,18 @@ class Timetable:
         
         group_id = student["group_id"]
         
-        # Get all faculty timetables that include this group
-        faculty_timetables = list(Timetable.get_db().timetables.find({}))
+        # Get the group's slots from every faculty timetable in weekday and start order,
+        # one query for all of the group's students asking at once
+        slots = single_flight.do(
+            "group_slots",
+            {"group_id": group_id},
+            lambda: list(Timetable.get_db().timetable_slots.find(
+                {"group_id": group_id},
+                {"_id": 0, "weekday": 0, "start": 0, "end": 0, "updated_at": 0}
+            ).sort([("weekday", ASCENDING), ("start", ASCENDING)]))
+        )
         
-        # Build student timetable from faculty timetables
+        # Build student timetable from the slots
         student_timetable = {
             "student_id": str(student_id),
             "group_id": group_id,
@@ -105,121 +407,46 @@ class Timetable:
             }
         }
         
-        # Loop through all faculty timetables
-        for faculty_timetable in faculty_timetables:
-            faculty_id = str(faculty_timetable["faculty_id"])
-            
-            # Loop through days and periods
-            for day in faculty_timetable["weekly_schedule"]:
-                for period, data in faculty_timetable["weekly_schedule"][day].items():
-                    # Check if this slot is for the student's group
-                    if data.get("group_id") == group_id:
-                        # Add to student timetable
-                        student_timetable["weekly_schedule"][day][period] = {
-                            **data,
-                            "faculty_id": faculty_id
-                        }
+        for slot in slots:
+            slot = dict(slot)  # Shared with other requests
+            day = slot.pop("day")
+            period = slot.pop("period")
+            slot["faculty_id"] = str(slot["faculty_id"])
+            student_timetable["weekly_schedule"].setdefault(day, {})[period] = slot
         
         return student_timetable
     
     @staticmethod
     def find_available_slots(faculty_id, duration=1):
-        """Find available time slots for a faculty member"""
-        # Get faculty timetable
-        timetable = Timetable.get_db().timetables.find_one({"faculty_id": ObjectId(faculty_id)})
-        
-        if not timetable:
-            return []
-        
-        # Get faculty activities
-        activities = list(current_app.config['MONGO_DB'].activities.find(
-            {"faculty_id": ObjectId(faculty_id)}
-        ))
-        
-        # Get holidays
-        holidays = list(current_app.config['MONGO_DB'].holidays.find({}))
-        
-        # Calculate available slots
-        available_slots = []
-        
-        # Define working hours (e.g., 9 AM to 5 PM)
-        working_hours = range(9, 17)
-        
-        # Get current date
+        """Find the free working hours of a faculty member over the next seven days"""
         today = datetime.datetime.now().date()
+        free_hours = FreeBusy.find_free_hours(faculty_id, today, duration=duration)
         
-        # Check for available slots for the next 7 days
-        for i in range(7):
-            date = today + datetime.timedelta(days=i)
-            day_name = date.strftime("%A").lower()
-            
-            # Skip if it's a holiday
-            is_holiday = any(holiday["date"].date() == date for holiday in holidays)
-            if is_holiday:
-                continue
-            
-            # Check each hour in working hours
-            for hour in working_hours:
-                # Skip if there's a class scheduled in weekly timetable
-                if day_name in timetable["weekly_schedule"]:
-                    if str(hour) in timetable["weekly_schedule"][day_name]:
-                        continue
-                
-                # Skip if there's an activity scheduled
-                time_slot = datetime.datetime.combine(date, datetime.time(hour, 0))
-                is_activity = any(
-                    activity["start_time"] <= time_slot and 
-                    activity["end_time"] >= time_slot 
-                    for activity in activities
-                )
-                
-                if is_activity:
-                    continue
-                
-                # This slot is available
-                available_slots.append({
-                    "date": date.isoformat(),
-                    "day": day_name,
-                    "time": f"{hour}:00"
-                })
+        if free_hours is None:
+            return []  # No timetable
         
-        return available_slots
+        return [
+            {
+                "date": hour.date().isoformat(),
+                "day": hour.strftime("%A").lower(),
+                "time": f"{hour.hour}:00"
+            }
+            for hour in free_hours
+        ]
     
     @staticmethod
     def check_conflict(faculty_id, date, start_time, end_time):
-        """Check if there's a conflict in the schedule"""
-        # Convert inputs to datetime objects
-        date_obj = datetime.datetime.fromisoformat(date)
-        day_name = date_obj.strftime("%A").lower()
-        
-        # Get faculty timetable
-        timetable = Timetable.get_db().timetables.find_one({"faculty_id": ObjectId(faculty_id)})
-        
-        # Check if there are classes in the weekly schedule
-        if timetable and day_name in timetable["weekly_schedule"]:
-            for period, data in timetable["weekly_schedule"][day_name].items():
-                period_hour = int(period)
-                if period_hour >= start_time.hour and period_hour < end_time.hour:
-                    return True, "Class scheduled at this time"
-        
-        # Check if there are activities
-        activities = list(current_app.config['MONGO_DB'].activities.find({
-            "faculty_id": ObjectId(faculty_id),
-            "start_time": {"$lt": end_time},
-            "end_time": {"$gt": start_time}
-        }))
-        
-        if activities:
-            return True, "Activity scheduled at this time"
+        """Check if there's a conflict in the schedule
         
-        # Check if it's a holiday
-        holidays = list(current_app.config['MONGO_DB'].holidays.find({
-            "date": {"$gte": date_obj.replace(hour=0, minute=0, second=0),
-                    "$lt": date_obj.replace(hour=23, minute=59, second=59)}
-        }))
+        Classes in the weekly timetable, activities (approved meetings
+        included) and holidays count, read from the free/busy cache.
+        """
+        conflict = FreeBusy.first_conflict(faculty_id, start_time, end_time, ("class", "activity", "holiday"))
         
-        if holidays:
-            return True, "Holiday on this date"
+        reasons = {
+            "class": "Class scheduled at this time",
+            "activity": "Activity scheduled at this time",
+            "holiday": "Holiday on this date"
+        }
         
-        # No conflicts
-        return False, None
\ No newline at end of file
+        return conflict is not None, reasons.get(conflict)
\ No newline at end of file
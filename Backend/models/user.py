@@ -2,27 +2,99 @@ from flask import current_app
 from bson.objectid import ObjectId
 import datetime
 from werkzeug.security import generate_password_hash
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from services.cache_bus import cache_bus
+from services.faculty_directory import FacultyDirectory
+from utils.cache import TTLCache, single_flight
+from utils.helpers import build_projection
 
 class User:
     """User model for database operations"""
     
+    # Credentials and one-time codes never leave the database
+    PRIVATE_PROJECTION = {
+        "password": 0,
+        "otp": 0,
+        "otp_expiry": 0,
+        "reset_otp": 0,
+        "reset_otp_expiry": 0,
+        "reset_token": 0,
+        "reset_token_expiry": 0
+    }
+    
+    # Fields clients may request with ?fields=
+    FIELDS = (
+        "registration_number", "name", "email", "mobile_number", "role",
+        "department", "group_id", "is_verified", "created_at", "updated_at"
+    )
+    
+    # What authentication loads for the signed-in user on every request
+    PRINCIPAL_PROJECTION = {"name": 1, "role": 1, "group_id": 1}
+    
+    _principals = TTLCache(ttl=300, maxsize=10000)
+    
     @staticmethod
     def get_db():
         """Get the database connection"""
         return current_app.config['MONGO_DB']
     
     @staticmethod
-    def get_by_id(user_id):
-        """Get a user by ID"""
+    def ensure_indexes():
+        """Create the indexes used by user lookups"""
+        users = User.get_db().users
+        try:
+            users.create_index([("registration_number", ASCENDING)], unique=True)
+        except OperationFailure:
+            # Existing duplicates prevent a unique index; index for lookups only
+            users.create_index([("registration_number", ASCENDING)])
+        users.create_index([("role", ASCENDING), ("group_id", ASCENDING)])
+    
+    @staticmethod
+    def get_by_id(user_id, projection=None):
+        """Get a user by ID, without private fields unless a projection is given"""
         try:
-            return User.get_db().users.find_one({"_id": ObjectId(user_id)})
+            return User.get_db().users.find_one(
+                {"_id": ObjectId(user_id)},
+                projection or User.PRIVATE_PROJECTION
+            )
         except:
             return None
     
     @staticmethod
-    def get_by_registration(registration_number):
-        """Get a user by registration number"""
-        return User.get_db().users.find_one({"registration_number": registration_number})
+    def get_principal(user_id):
+        """Get the name, role and group of a signed-in user
+        
+        Principals are only cached while the cache bus is live, so a role
+        or group change made on any worker takes effect straight away.
+        """
+        user_id = str(user_id)
+        if cache_bus.is_live():
+            principal = User._principals.get(user_id)
+            if principal is not None:
+                return dict(principal)
+        
+        generation = cache_bus.generation()
+        principal = User.get_db().users.find_one({"_id": ObjectId(user_id)}, User.PRINCIPAL_PROJECTION)
+        
+        # A principal loaded while the bus handled events may already be stale
+        if principal and cache_bus.is_live() and cache_bus.generation() == generation:
+            User._principals.set(user_id, dict(principal))
+        
+        return principal
+    
+    @staticmethod
+    def evict(user_id):
+        """Drop the cached principal of a changed user"""
+        User._principals.delete(str(user_id))
+    
+    @staticmethod
+    def get_by_registration(registration_number, projection=None):
+        """Get a user by registration number, without private fields unless a projection is given"""
+        return User.get_db().users.find_one(
+            {"registration_number": registration_number},
+            projection or User.PRIVATE_PROJECTION
+        )
     
     @staticmethod
     def create(user_data):
@@ -38,6 +110,9 @@ class User:
         
         # Insert user
         result = User.get_db().users.insert_one(user_data)
+        cache_bus.publish("users", [result.inserted_id])
+        single_flight.forget("users")
+        FacultyDirectory.invalidate()
         
         return {
             **user_data,
@@ -48,17 +123,27 @@ class User:
     def update(user_id, update_data):
         """Update a user by ID"""
         # Set updated timestamp
-        update_data['updated_at'] = datetime.datetime.utcnow()
+        now = datetime.datetime.utcnow()
+        update_data['updated_at'] = now
         
         # Hash password if provided
         if 'password' in update_data:
             update_data['password'] = generate_password_hash(update_data['password'])
         
+        # A student new to a group only sees its broadcasts from now on
+        if 'group_id' in update_data:
+            current = User.get_db().users.find_one({"_id": ObjectId(user_id)}, {"group_id": 1}) or {}
+            if update_data['group_id'] != current.get("group_id"):
+                update_data['group_joined_at'] = now
+        
         # Update user
         result = User.get_db().users.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        cache_bus.publish("users", [user_id])
+        single_flight.forget("users")
+        FacultyDirectory.invalidate()
         
         return result.modified_count > 0
     
@@ -66,31 +151,29 @@ class User:
     def delete(user_id):
         """Delete a user by ID"""
         result = User.get_db().users.delete_one({"_id": ObjectId(user_id)})
+        cache_bus.publish("users", [user_id])
+        single_flight.forget("users")
+        FacultyDirectory.invalidate()
         return result.deleted_count > 0
     
     @staticmethod
-    def list_all(role=None, limit=100, skip=0):
-        """List all users, optionally filtered by role"""
+    def list_all(role=None, limit=100, skip=0, fields=None):
+        """List all users, optionally filtered by role and limited to the given fields
+        
+        Identical concurrent reads share one query.
+        """
         query = {}
         if role:
             query["role"] = role
         
-        users = list(User.get_db().users.find(
-            query,
-            {
-                "password": 0,
-                "otp": 0,
-                "otp_expiry": 0,
-                "reset_otp": 0,
-                "reset_otp_expiry": 0
-            }
-        ).skip(skip).limit(limit))
-        
-        # Convert ObjectId to string for JSON serialization
-        for user in users:
-            user["_id"] = str(user["_id"])
-        
-        return users
+        return single_flight.do(
+            "users",
+            {"query": query, "limit": limit, "skip": skip, "fields": fields},
+            lambda: list(User.get_db().users.find(
+                query,
+                build_projection(fields) or User.PRIVATE_PROJECTION
+            ).skip(skip).limit(limit))
+        )
     
     @staticmethod
     def count(role=None):
@@ -102,23 +185,13 @@ class User:
         return User.get_db().users.count_documents(query)
     
     @staticmethod
-    def get_students_by_group(group_id):
-        """Get all students in a specific group"""
+    def get_students_by_group(group_id, fields=None):
+        """Get all students in a specific group, limited to the given fields"""
         students = list(User.get_db().users.find(
             {"role": "student", "group_id": group_id},
-            {
-                "password": 0,
-                "otp": 0,
-                "otp_expiry": 0,
-                "reset_otp": 0,
-                "reset_otp_expiry": 0
-            }
+            build_projection(fields) or User.PRIVATE_PROJECTION
         ))
         
-        # Convert ObjectId to string for JSON serialization
-        for student in students:
-            student["_id"] = str(student["_id"])
-        
         return students
     
     @staticmethod
@@ -126,29 +199,35 @@ class User:
         """Get all faculty in a specific department"""
         faculty = list(User.get_db().users.find(
             {"role": "faculty", "department": department},
-            {
-                "password": 0,
-                "otp": 0,
-                "otp_expiry": 0,
-                "reset_otp": 0,
-                "reset_otp_expiry": 0
-            }
+            User.PRIVATE_PROJECTION
         ))
         
-        # Convert ObjectId to string for JSON serialization
-        for f in faculty:
-            f["_id"] = str(f["_id"])
-        
         return faculty
     
     @staticmethod
     def update_group_assignment(student_ids, group_id):
         """Assign multiple students to a group"""
         object_ids = [ObjectId(id) for id in student_ids]
+        now = datetime.datetime.utcnow()
+        
+        # Students new to the group only see its broadcasts from now on
+        joining = User.get_db().users.distinct(
+            "_id",
+            {"_id": {"$in": object_ids}, "role": "student", "group_id": {"$ne": group_id}}
+        )
+        if joining:
+            User.get_db().users.update_many(
+                {"_id": {"$in": joining}},
+                {"$set": {"group_id": group_id, "group_joined_at": now}}
+            )
         
         result = User.get_db().users.update_many(
             {"_id": {"$in": object_ids}, "role": "student"},
-            {"$set": {"group_id": group_id, "updated_at": datetime.datetime.utcnow()}}
+            {"$set": {"group_id": group_id, "updated_at": now}}
         )
+        cache_bus.publish("users", object_ids)
+        single_flight.forget("users")
         
-        return result.modified_count
\ No newline at end of file
+        return result.modified_count
+
+cache_bus.subscribe("users", User.evict, User._principals.clear)
\ No newline at end of file
@@ -6,7 +6,17 @@ from auth.utils import admin_required
 from models.user import User
 from models.holiday import Holiday
 from models.class_session import ClassSession
-from services.notification import NotificationService
+from services.retention import NotificationRetention
+from services.user_import import UserImporter
+from services.jobs import JobQueue
+from services.session_stats import SessionStats
+from services.session_conflicts import SessionConflicts
+from services.cache_bus import cache_bus
+from services.reminders import reminder_scheduler
+from services.sms_digest import SmsDigest
+from services.timetable_generator import TimetableGenerator
+from utils.cache import single_flight
+from utils.helpers import parse_fields
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -14,12 +24,17 @@ admin_bp = Blueprint('admin', __name__)
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_users(current_user):
-    """Get all users with optional role filter"""
+    """Get all users with optional role filter and sparse fieldset"""
     role = request.args.get('role')
     limit = int(request.args.get('limit', 100))
     skip = int(request.args.get('skip', 0))
     
-    users = User.list_all(role, limit, skip)
+    try:
+        fields = parse_fields(request.args.get('fields'), User.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    users = User.list_all(role, limit, skip, fields)
     count = User.count(role)
     
     return jsonify({
@@ -38,16 +53,6 @@ def get_user(current_user, user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # Remove sensitive fields
-    user.pop('password', None)
-    user.pop('otp', None)
-    user.pop('otp_expiry', None)
-    user.pop('reset_otp', None)
-    user.pop('reset_otp_expiry', None)
-    
-    # Convert ObjectId to string for JSON serialization
-    user['_id'] = str(user['_id'])
-    
     return jsonify({"user": user}), 200
 
 @admin_bp.route('/users', methods=['POST'])
@@ -65,7 +70,7 @@ def create_user(current_user):
             return jsonify({"error": f"Missing required field: {field}"}), 400
     
     # Check if user already exists
-    existing_user = User.get_by_registration(data['registration_number'])
+    existing_user = User.get_by_registration(data['registration_number'], {"_id": 1})
     if existing_user:
         return jsonify({"error": "Registration number already exists"}), 409
     
@@ -77,11 +82,58 @@ def create_user(current_user):
     new_user.pop('otp', None)
     new_user.pop('otp_expiry', None)
     
-    # Convert ObjectId to string for JSON serialization
-    new_user['_id'] = str(new_user['_id'])
-    
     return jsonify({"user": new_user, "message": "User created successfully"}), 201
 
+@admin_bp.route('/users/import', methods=['POST'])
+@admin_required
+def import_users(current_user):
+    """Bulk import users from a CSV or NDJSON upload"""
+    upload = request.files.get('file')
+    if upload:
+        content = upload.read()
+        filename = (upload.filename or '').lower()
+    else:
+        content = request.get_data()
+        filename = ''
+    
+    if not content:
+        return jsonify({"error": "No data provided"}), 400
+    
+    # Work out the format from the parameter, file name or content type
+    file_format = request.args.get('format') or request.form.get('format')
+    if not file_format:
+        if filename.endswith('.csv') or request.mimetype == 'text/csv':
+            file_format = 'csv'
+        elif filename.endswith(('.ndjson', '.jsonl')) or request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            file_format = 'ndjson'
+        else:
+            return jsonify({"error": "Unable to determine import format. Use CSV or NDJSON."}), 400
+    
+    try:
+        rows = UserImporter.parse(content, file_format)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Failed to parse import file: {str(e)}"}), 400
+    
+    # Hashing a large upload takes longer than a request should
+    if len(rows) > current_app.config.get('USER_IMPORT_ASYNC_ROWS', 500):
+        job = JobQueue.enqueue(
+            "import_users",
+            {"import_id": UserImporter.stage(rows, request.form.get('default_password'))},
+            created_by=str(current_user['_id'])
+        )
+        
+        return jsonify({
+            "message": f"Import of {len(rows)} rows started",
+            "job_id": str(job['_id'])
+        }), 202
+    
+    report = UserImporter.import_users(rows, request.form.get('default_password'))
+    
+    return jsonify({
+        "message": f"Imported {report['created']} users, {report['failed']} rows failed",
+        "report": report
+    }), 200
+
 @admin_bp.route('/users/<user_id>', methods=['PUT'])
 @admin_required
 def update_user(current_user, user_id):
@@ -95,6 +147,11 @@ def update_user(current_user, user_id):
     if 'registration_number' in data:
         data.pop('registration_number')
     
+    # Minutes to collect SMS into one digest, or null for the default
+    if data.get('sms_digest_minutes') is not None:
+        if not isinstance(data['sms_digest_minutes'], int) or isinstance(data['sms_digest_minutes'], bool) or data['sms_digest_minutes'] < 0:
+            return jsonify({"error": "sms_digest_minutes must be a non-negative integer"}), 400
+    
     # Update user
     success = User.update(user_id, data)
     
@@ -141,8 +198,13 @@ def assign_group(current_user):
 @admin_bp.route('/groups/<group_id>/students', methods=['GET'])
 @admin_required
 def get_group_students(current_user, group_id):
-    """Get all students in a group"""
-    students = User.get_students_by_group(group_id)
+    """Get all students in a group with an optional sparse fieldset"""
+    try:
+        fields = parse_fields(request.args.get('fields'), User.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    students = User.get_students_by_group(group_id, fields)
     
     return jsonify({
         "students": students,
@@ -154,59 +216,140 @@ def get_group_students(current_user, group_id):
 @admin_bp.route('/holidays', methods=['GET'])
 @admin_required
 def get_holidays(current_user):
-    """Get all holidays with optional date filters"""
+    """Get all holidays with optional date filters and sparse fieldset"""
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), Holiday.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     if start_date:
         start_date = datetime.datetime.fromisoformat(start_date)
     
     if end_date:
         end_date = datetime.datetime.fromisoformat(end_date)
     
-    holidays = Holiday.get_all(start_date, end_date)
+    holidays = Holiday.get_all(start_date, end_date, fields)
     
     return jsonify({
         "holidays": holidays,
         "total": len(holidays)
     }), 200
 
+def is_dry_run():
+    """Check whether the request only asks for an impact preview"""
+    return request.args.get('dry_run', 'false').lower() == 'true'
+
+def group_notifications(impact, date_str, message):
+    """Build one notification per affected group from a session impact summary"""
+    return [
+        {
+            "group_id": group["group_id"],
+            "message": f"{group['count']} class{'es' if group['count'] != 1 else ''} on {date_str} {message}"
+        }
+        for group in impact["by_group"]
+    ]
+
+def enqueue_group_notifications(notifications, related_id, current_user):
+    """Queue notifications for affected groups, returning the job ID if any"""
+    if not notifications:
+        return None
+    
+    job = JobQueue.enqueue(
+        "notify_groups",
+        {
+            "notifications": notifications,
+            "notification_type": "holiday",
+            "related_id": related_id
+        },
+        created_by=str(current_user['_id'])
+    )
+    
+    return str(job['_id'])
+
 @admin_bp.route('/holidays', methods=['POST'])
 @admin_required
 def create_holiday(current_user):
-    """Create a new holiday"""
+    """Create a new holiday and mark the class sessions on its date
+    
+    With ?dry_run=true only the affected session counts are returned.
+    """
     data = request.get_json()
     
     if not data or 'date' not in data or 'name' not in data:
         return jsonify({"error": "Date and name are required"}), 400
     
+    if is_dry_run():
+        date = Holiday.parse_date(data['date'])
+        if not date:
+            return jsonify({"error": "Invalid date format"}), 400
+        
+        return jsonify({"dry_run": True, "impact": ClassSession.get_holiday_impact(date)}), 200
+    
     # Create holiday
     holiday = Holiday.create(data)
+    holiday_id = str(holiday['_id'])
+    date_str = holiday['date'].strftime('%Y-%m-%d')
     
-    # Convert ObjectId to string for JSON serialization
-    holiday['_id'] = str(holiday['_id'])
+    # Mark the sessions already generated for this date
+    impact = ClassSession.get_holiday_impact(holiday['date'])
+    impact["updated"] = ClassSession.mark_holiday(holiday_id, holiday['date'])
     
     # Notify all faculty members about the new holiday
-    NotificationService.notify_all_faculty(
-        f"New holiday: {holiday['name']} on {holiday['date'].strftime('%Y-%m-%d')}",
-        "holiday",
-        str(holiday['_id'])
+    job = JobQueue.enqueue(
+        "notify_all_faculty",
+        {
+            "message": f"New holiday: {holiday['name']} on {date_str}",
+            "notification_type": "holiday",
+            "related_id": holiday_id
+        },
+        created_by=str(current_user['_id'])
+    )
+    
+    # Notify the affected student groups
+    group_job_id = enqueue_group_notifications(
+        group_notifications(impact, date_str, f"cancelled for holiday: {holiday['name']}"),
+        holiday_id,
+        current_user
     )
     
     return jsonify({
         "holiday": holiday,
-        "message": "Holiday created successfully"
+        "message": "Holiday created successfully",
+        "impact": impact,
+        "job_id": str(job['_id']),
+        "group_job_id": group_job_id
     }), 201
 
 @admin_bp.route('/holidays/<holiday_id>', methods=['PUT'])
 @admin_required
 def update_holiday(current_user, holiday_id):
-    """Update a holiday"""
+    """Update a holiday, moving the session cascade if its date changes
+    
+    With ?dry_run=true only the affected session counts are returned.
+    """
     data = request.get_json()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
+    previous = Holiday.get_by_id(holiday_id)
+    
+    if not previous:
+        return jsonify({"error": "Holiday not found"}), 404
+    
+    new_date = Holiday.parse_date(data['date']) if 'date' in data else None
+    date_changed = new_date is not None and new_date.date() != previous['date'].date()
+    
+    if is_dry_run():
+        return jsonify({
+            "dry_run": True,
+            "restored": ClassSession.get_holiday_restore_impact(holiday_id) if date_changed else None,
+            "impact": ClassSession.get_holiday_impact(new_date) if date_changed else None
+        }), 200
+    
     # Update holiday
     success = Holiday.update(holiday_id, data)
     
@@ -215,101 +358,263 @@ def update_holiday(current_user, holiday_id):
     
     # Get updated holiday
     holiday = Holiday.get_by_id(holiday_id)
+    date_str = holiday['date'].strftime('%Y-%m-%d')
+    
+    restored = None
+    impact = None
+    notifications = []
+    if date_changed:
+        # Move the cascade from the old date to the new one
+        restored = ClassSession.get_holiday_restore_impact(holiday_id)
+        restored["updated"] = ClassSession.restore_from_holiday(holiday_id)
+        impact = ClassSession.get_holiday_impact(holiday['date'])
+        impact["updated"] = ClassSession.mark_holiday(holiday_id, holiday['date'])
+        
+        previous_date_str = previous['date'].strftime('%Y-%m-%d')
+        notifications = group_notifications(
+            restored, previous_date_str, f"back on schedule: {holiday['name']} moved to {date_str}"
+        ) + group_notifications(
+            impact, date_str, f"cancelled for holiday: {holiday['name']}"
+        )
     
     # Notify all faculty members about the holiday update
-    NotificationService.notify_all_faculty(
-        f"Holiday update: {holiday['name']} on {holiday['date'].strftime('%Y-%m-%d')}",
-        "holiday",
-        holiday_id
+    job = JobQueue.enqueue(
+        "notify_all_faculty",
+        {
+            "message": f"Holiday update: {holiday['name']} on {date_str}",
+            "notification_type": "holiday",
+            "related_id": holiday_id
+        },
+        created_by=str(current_user['_id'])
     )
     
     return jsonify({
         "message": "Holiday updated successfully",
-        "holiday": holiday
+        "holiday": holiday,
+        "restored": restored,
+        "impact": impact,
+        "job_id": str(job['_id']),
+        "group_job_id": enqueue_group_notifications(notifications, holiday_id, current_user)
     }), 200
 
 @admin_bp.route('/holidays/<holiday_id>', methods=['DELETE'])
 @admin_required
 def delete_holiday(current_user, holiday_id):
-    """Delete a holiday"""
+    """Delete a holiday and restore the class sessions it cancelled
+    
+    With ?dry_run=true only the affected session counts are returned.
+    """
     # Get holiday before deleting for notification
     holiday = Holiday.get_by_id(holiday_id)
     
     if not holiday:
         return jsonify({"error": "Holiday not found"}), 404
     
+    if is_dry_run():
+        return jsonify({"dry_run": True, "restored": ClassSession.get_holiday_restore_impact(holiday_id)}), 200
+    
     success = Holiday.delete(holiday_id)
     
     if not success:
         return jsonify({"error": "Holiday not found"}), 404
     
+    date_str = holiday['date'].strftime('%Y-%m-%d')
+    
+    # Put the sessions cancelled by this holiday back on schedule
+    restored = ClassSession.get_holiday_restore_impact(holiday_id)
+    restored["updated"] = ClassSession.restore_from_holiday(holiday_id)
+    
     # Notify all faculty members about the holiday deletion
-    NotificationService.notify_all_faculty(
-        f"Holiday cancelled: {holiday['name']} on {holiday['date'].strftime('%Y-%m-%d')}",
-        "holiday",
-        holiday_id
+    job = JobQueue.enqueue(
+        "notify_all_faculty",
+        {
+            "message": f"Holiday cancelled: {holiday['name']} on {date_str}",
+            "notification_type": "holiday",
+            "related_id": holiday_id
+        },
+        created_by=str(current_user['_id'])
+    )
+    
+    # Notify the affected student groups
+    group_job_id = enqueue_group_notifications(
+        group_notifications(restored, date_str, f"back on schedule: holiday {holiday['name']} cancelled"),
+        holiday_id,
+        current_user
+    )
+    
+    return jsonify({
+        "message": "Holiday deleted successfully",
+        "restored": restored,
+        "job_id": str(job['_id']),
+        "group_job_id": group_job_id
+    }), 200
+
+# Timetable Generation Routes
+@admin_bp.route('/timetables/generate', methods=['POST'])
+@admin_required
+def generate_timetables(current_user):
+    """Queue automatic generation of weekly timetables from lesson requirements"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    
+    try:
+        TimetableGenerator.validate(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Only one generation runs at a time
+    job = JobQueue.enqueue(
+        "generate_timetables",
+        data,
+        created_by=str(current_user['_id']),
+        dedupe_key="institution"
     )
     
-    return jsonify({"message": "Holiday deleted successfully"}), 200
+    return jsonify({
+        "message": "Timetable generation started",
+        "job_id": str(job['_id'])
+    }), 202
 
 # Conflict Resolution Routes
 @admin_bp.route('/conflicts', methods=['GET'])
 @admin_required
 def get_conflicts(current_user):
-    """Get all scheduling conflicts"""
-    # Get all class sessions
-    class_sessions = list(current_app.config['MONGO_DB'].class_sessions.find({
-        "status": {"$ne": ClassSession.STATUS["CANCELLED"]}
-    }))
-    
-    # Convert ObjectId to string for JSON serialization
-    for session in class_sessions:
-        session["_id"] = str(session["_id"])
-        session["faculty_id"] = str(session["faculty_id"])
-    
-    # Find classes with same group_id and overlapping times
-    conflicts = []
-    
-    for i in range(len(class_sessions)):
-        for j in range(i + 1, len(class_sessions)):
-            session1 = class_sessions[i]
-            session2 = class_sessions[j]
-            
-            # Skip if different groups or group_id is None
-            if not session1.get("group_id") or not session2.get("group_id") or session1.get("group_id") != session2.get("group_id"):
-                continue
-            
-            # Check for time overlap
-            if (
-                session1["date"] <= session2["date"] + datetime.timedelta(hours=session2.get("duration", 1)) and
-                session2["date"] <= session1["date"] + datetime.timedelta(hours=session1.get("duration", 1))
-            ):
-                # Get faculty names
-                faculty1 = current_app.config['MONGO_DB'].users.find_one({"_id": ObjectId(session1["faculty_id"])})
-                faculty2 = current_app.config['MONGO_DB'].users.find_one({"_id": ObjectId(session2["faculty_id"])})
-                
-                conflicts.append({
-                    "session1": {
-                        "_id": session1["_id"],
-                        "faculty_id": session1["faculty_id"],
-                        "faculty_name": faculty1.get("name", "") if faculty1 else "",
-                        "subject": session1.get("subject", ""),
-                        "date": session1["date"].isoformat(),
-                        "duration": session1.get("duration", 1)
-                    },
-                    "session2": {
-                        "_id": session2["_id"],
-                        "faculty_id": session2["faculty_id"],
-                        "faculty_name": faculty2.get("name", "") if faculty2 else "",
-                        "subject": session2.get("subject", ""),
-                        "date": session2["date"].isoformat(),
-                        "duration": session2.get("duration", 1)
-                    },
-                    "group_id": session1["group_id"]
-                })
-    
-    # Return the conflicts
+    """Get the open group clashes between class sessions"""
+    try:
+        start_date = datetime.datetime.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = datetime.datetime.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format"}), 400
+    
+    conflicts = SessionConflicts.get_open(request.args.get('group_id'), start_date, end_date)
+    
     return jsonify({
         "conflicts": conflicts,
         "total": len(conflicts)
-    }), 200
\ No newline at end of file
+    }), 200
+
+@admin_bp.route('/conflicts/rescan', methods=['POST'])
+@admin_required
+def rescan_conflicts(current_user):
+    """Recompute every clash from the class sessions"""
+    job = JobQueue.enqueue(
+        "rescan_conflicts",
+        {},
+        created_by=str(current_user['_id']),
+        dedupe_key="all"
+    )
+    
+    return jsonify({
+        "message": "Conflict re-scan started",
+        "job_id": str(job['_id'])
+    }), 202
+
+# Analytics Routes
+@admin_bp.route('/analytics/completion', methods=['GET'])
+@admin_required
+def get_completion_analytics(current_user):
+    """Get class completion rates by faculty, department, subject or group"""
+    group_by = request.args.get('group_by', 'faculty')
+    
+    if group_by not in ('faculty', 'department', 'subject', 'group'):
+        return jsonify({"error": "group_by must be one of faculty, department, subject, group"}), 400
+    
+    try:
+        start_date = datetime.datetime.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = datetime.datetime.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format"}), 400
+    
+    results = SessionStats.completion(start_date, end_date, group_by)
+    
+    return jsonify({
+        "group_by": group_by,
+        "results": results,
+        "total": len(results)
+    }), 200
+
+@admin_bp.route('/analytics/completion/rebuild', methods=['POST'])
+@admin_required
+def rebuild_completion_analytics(current_user):
+    """Recompute the session rollups from class sessions"""
+    job = JobQueue.enqueue(
+        "rebuild_session_stats",
+        {
+            "start_date": request.args.get('start_date'),
+            "end_date": request.args.get('end_date')
+        },
+        created_by=str(current_user['_id']),
+        dedupe_key="all"
+    )
+    
+    return jsonify({
+        "message": "Session stats rebuild started",
+        "job_id": str(job['_id'])
+    }), 202
+
+# Storage Routes
+@admin_bp.route('/storage/notifications', methods=['GET'])
+@admin_required
+def get_notification_storage(current_user):
+    """Get notification collection and index sizes with their recent trend"""
+    days = int(request.args.get('days', 30))
+    
+    current = NotificationRetention.collection_stats()
+    history = NotificationRetention.get_stats_history(days)
+    
+    # Growth of each collection since the oldest snapshot in the window
+    trend = {}
+    if history:
+        oldest = history[0]["collections"]
+        for name, stats in current.items():
+            previous = oldest.get(name, {})
+            trend[name] = {
+                "count": stats["count"] - previous.get("count", 0),
+                "size": stats["size"] - previous.get("size", 0),
+                "total_index_size": stats["total_index_size"] - previous.get("total_index_size", 0),
+                "since": history[0]["recorded_at"]
+            }
+    
+    return jsonify({
+        "current": current,
+        "trend": trend,
+        "history": history
+    }), 200
+
+@admin_bp.route('/storage/notifications/archive', methods=['POST'])
+@admin_required
+def archive_notifications(current_user):
+    """Archive expired notifications now instead of waiting for the archiver"""
+    result = NotificationRetention.run()
+    
+    return jsonify({
+        "message": f"Archived {result['notifications']} notifications and {result['broadcasts']} broadcasts",
+        "archived": result
+    }), 200
+
+# Cache Routes
+@admin_bp.route('/caches/bus', methods=['GET'])
+@admin_required
+def get_cache_bus_stats(current_user):
+    """Get the mode and event lag of this worker's cache invalidation bus"""
+    return jsonify({"cache_bus": cache_bus.get_stats()}), 200
+
+@admin_bp.route('/caches/single-flight', methods=['GET'])
+@admin_required
+def get_single_flight_stats(current_user):
+    """Get how many of this worker's shared reads were coalesced or served from the micro-TTL"""
+    return jsonify({"single_flight": single_flight.get_stats()}), 200
+
+@admin_bp.route('/reminders', methods=['GET'])
+@admin_required
+def get_reminder_stats(current_user):
+    """Get the reminders this worker holds and how many it has sent"""
+    return jsonify({"reminders": reminder_scheduler.get_stats()}), 200
+
+@admin_bp.route('/sms/digests', methods=['GET'])
+@admin_required
+def get_sms_digest_stats(current_user):
+    """Get the number of SMS digests and messages waiting to be sent"""
+    return jsonify({"sms_digests": SmsDigest.get_stats()}), 200
\ No newline at end of file
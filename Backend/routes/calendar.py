@@ -0,0 +1,37 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+
+from services.calendar_feed import CalendarFeed
+
+calendar_bp = Blueprint('calendar', __name__)
+
+def feed_url(feed):
+    """Get the public URL of a calendar feed"""
+    return f"{request.host_url}api/calendar/{feed['token']}.ics"
+
+# Calendar Feed Routes
+@calendar_bp.route('/<token>.ics', methods=['GET'])
+def get_feed(token):
+    """Get an iCalendar feed by its token"""
+    feed = CalendarFeed.get_by_token(token)
+    
+    if not feed:
+        return jsonify({"error": "Calendar feed not found"}), 404
+    
+    etag = CalendarFeed.etag(feed)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": "private, max-age=300"
+    }
+    
+    # If-None-Match uses weak comparison, and compressed responses carry a weak ETag
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    
+    return Response(
+        stream_with_context(CalendarFeed.stream(feed, etag)),
+        mimetype="text/calendar",
+        headers={
+            **headers,
+            "Content-Disposition": f'inline; filename="{feed["owner_type"]}-schedule.ics"'
+        }
+    )
\ No newline at end of file
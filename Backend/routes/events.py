@@ -0,0 +1,92 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+import math
+
+from auth.utils import token_required
+from services.events import event_broker
+
+events_bp = Blueprint('events', __name__)
+
+def format_event(event):
+    """Format a broker event as a JSON-serializable dict"""
+    return {
+        "id": str(event["_id"]),
+        "event": event["event"],
+        "data": event.get("data", {})
+    }
+
+def sse_message(event):
+    """Encode a broker event in the text/event-stream format"""
+    payload = format_event(event)
+    data = current_app.json.dumps(payload["data"])
+    return f"id: {payload['id']}\nevent: {payload['event']}\ndata: {data}\n\n"
+
+# Server-Sent Events Routes
+@events_bp.route('/stream', methods=['GET'])
+@token_required
+def stream_events(current_user):
+    """Stream notifications and schedule changes for the current user
+    
+    Requires a threaded or async gunicorn worker class, since each open
+    stream holds its worker thread.
+    """
+    channels = event_broker.channels_for_user(current_user)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+    
+    def generate():
+        subscription = event_broker.subscribe(channels)
+        try:
+            yield "retry: 5000\n\n"
+            
+            # Catch up on anything missed while disconnected
+            for event in event_broker.replay(channels, last_event_id):
+                yield sse_message(event)
+            
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_message(event)
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@events_bp.route('/poll', methods=['GET'])
+@token_required
+def poll_events(current_user):
+    """Long-poll for events after a given event ID"""
+    channels = event_broker.channels_for_user(current_user)
+    last_event_id = request.args.get('last_event_id')
+    
+    try:
+        timeout = float(request.args.get('timeout', 25))
+        if not math.isfinite(timeout):
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "timeout must be a number of seconds"}), 400
+    
+    # Stay under the proxy read timeout, and never wait a negative time
+    timeout = max(0.0, min(timeout, 55))
+    
+    subscription = event_broker.subscribe(channels)
+    try:
+        events = event_broker.replay(channels, last_event_id)
+        
+        if not events:
+            event = subscription.get(timeout=timeout)
+            if event is not None:
+                events = [event]
+    finally:
+        event_broker.unsubscribe(subscription)
+    
+    events = [format_event(event) for event in events]
+    
+    return jsonify({
+        "events": events,
+        "last_event_id": events[-1]["id"] if events else last_event_id
+    }), 200
\ No newline at end of file
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
+import copy
 import datetime
 
 from auth.utils import faculty_required
@@ -8,10 +9,99 @@ from models.class_session import ClassSession
 from models.activity import Activity
 from models.meeting import Meeting
 from models.holiday import Holiday
+from models.room import Room
 from services.notification import NotificationService
+from services.jobs import JobQueue
+from services.dashboard import DashboardService
+from services.calendar_feed import CalendarFeed
+from services.room_schedule import RoomSchedule
+from services.history_search import HistorySearch
+from routes.calendar import feed_url
+from utils.helpers import parse_fields
 
 faculty_bp = Blueprint('faculty', __name__)
 
+def notify_timetable_changes(summary, current_user):
+    """Queue one notification per group affected by a timetable change"""
+    notifications = []
+    for group_id, counts in summary["groups"].items():
+        changes = [
+            f"{counts[key]} {label}"
+            for key, label in (("inserted", "added"), ("updated", "updated"), ("cancelled", "cancelled"))
+            if counts.get(key)
+        ]
+        notifications.append({
+            "group_id": group_id,
+            "message": f"Timetable change by {current_user.get('name', 'your faculty')}: upcoming classes {', '.join(changes)}"
+        })
+    
+    if not notifications:
+        return None
+    
+    job = JobQueue.enqueue(
+        "notify_groups",
+        {"notifications": notifications, "notification_type": "class"},
+        created_by=str(current_user['_id'])
+    )
+    
+    return str(job['_id'])
+
+def slot_room_error(faculty_id, weekly_schedule, previous_schedule=None):
+    """Get an error response if a schedule uses an unknown room or one booked by another faculty member"""
+    room_ids = {
+        data.get("room_id")
+        for periods in weekly_schedule.values()
+        for data in (periods or {}).values()
+        if data and data.get("room_id")
+    }
+    
+    for room_id in room_ids:
+        if not isinstance(room_id, str) or not Room.exists(room_id):
+            return jsonify({"error": f"Room not found: {room_id}"}), 400
+    
+    conflicts = Timetable.get_room_conflicts(faculty_id, weekly_schedule, previous_schedule) if room_ids else []
+    if conflicts:
+        return jsonify({
+            "error": "Room is already in use at this time by another timetable",
+            "conflicts": conflicts
+        }), 409
+    
+    return None
+
+def room_booking_error(room_id, start, end, exclude=None):
+    """Get an error response if a room is unknown or already booked over [start, end)"""
+    if not isinstance(room_id, str) or not Room.exists(room_id):
+        return jsonify({"error": "Room not found"}), 400
+    
+    bookings = RoomSchedule.get_bookings(room_id, start, end, exclude)
+    if bookings:
+        return jsonify({
+            "error": "Room is already booked at this time",
+            "bookings": bookings
+        }), 409
+    
+    return None
+
+# Dashboard Route
+@faculty_bp.route('/dashboard', methods=['GET'])
+@faculty_required
+def get_dashboard(current_user):
+    """Get today's classes, weekly schedule, meetings, holidays and unread count in one call"""
+    faculty_id = str(current_user['_id'])
+    
+    return jsonify(DashboardService.get_faculty_dashboard(faculty_id)), 200
+
+# Calendar Feed Route
+@faculty_bp.route('/calendar-feed', methods=['POST'])
+@faculty_required
+def get_calendar_feed(current_user):
+    """Get the faculty's iCalendar feed URL, optionally rotating its token"""
+    data = request.get_json(silent=True) or {}
+    
+    feed = CalendarFeed.get_or_create("faculty", str(current_user['_id']), rotate=bool(data.get('rotate')))
+    
+    return jsonify({"token": feed['token'], "url": feed_url(feed)}), 200
+
 # Timetable Routes
 @faculty_bp.route('/timetable', methods=['GET'])
 @faculty_required
@@ -34,18 +124,23 @@ def create_timetable(current_user):
     if not data or 'weekly_schedule' not in data:
         return jsonify({"error": "Weekly schedule is required"}), 400
     
+    try:
+        Timetable.validate_schedule(data['weekly_schedule'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     faculty_id = str(current_user['_id'])
     
     # Check if timetable already exists
-    existing_timetable = Timetable.get_faculty_timetable(faculty_id)
+    existing_timetable = Timetable.get_faculty_timetable(faculty_id, {"_id": 1})
     if existing_timetable:
         return jsonify({"error": "Timetable already exists. Use PUT to update."}), 409
     
-    timetable = Timetable.create_weekly_timetable(faculty_id, data['weekly_schedule'])
+    error = slot_room_error(faculty_id, data['weekly_schedule'])
+    if error:
+        return error
     
-    # Convert ObjectId to string for JSON serialization
-    timetable['_id'] = str(timetable['_id'])
-    timetable['faculty_id'] = str(timetable['faculty_id'])
+    timetable = Timetable.create_weekly_timetable(faculty_id, data['weekly_schedule'])
     
     return jsonify({
         "message": "Timetable created successfully",
@@ -61,13 +156,22 @@ def update_timetable(current_user):
     if not data or 'weekly_schedule' not in data:
         return jsonify({"error": "Weekly schedule is required"}), 400
     
+    try:
+        Timetable.validate_schedule(data['weekly_schedule'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     faculty_id = str(current_user['_id'])
     
     # Get existing timetable
-    existing_timetable = Timetable.get_faculty_timetable(faculty_id)
+    existing_timetable = Timetable.get_faculty_timetable(faculty_id, {"weekly_schedule": 1})
     if not existing_timetable:
         return jsonify({"error": "Timetable not found. Use POST to create."}), 404
     
+    error = slot_room_error(faculty_id, data['weekly_schedule'], existing_timetable.get('weekly_schedule'))
+    if error:
+        return error
+    
     # Update timetable
     success = Timetable.update_timetable(
         existing_timetable['_id'],
@@ -77,12 +181,21 @@ def update_timetable(current_user):
     if not success:
         return jsonify({"error": "Failed to update timetable"}), 500
     
+    # Bring already generated sessions in line with the new schedule
+    sessions = ClassSession.sync_with_timetable(
+        faculty_id,
+        existing_timetable['weekly_schedule'],
+        data['weekly_schedule']
+    )
+    
     # Get updated timetable
     updated_timetable = Timetable.get_faculty_timetable(faculty_id)
     
     return jsonify({
         "message": "Timetable updated successfully",
-        "timetable": updated_timetable
+        "timetable": updated_timetable,
+        "sessions": sessions,
+        "job_id": notify_timetable_changes(sessions, current_user)
     }), 200
 
 @faculty_bp.route('/timetable/slot', methods=['PUT'])
@@ -96,29 +209,55 @@ def update_timetable_slot(current_user):
     
     faculty_id = str(current_user['_id'])
     day = data['day']
-    period = data['period']
+    period = str(data['period'])
     slot_data = data['data']
     
+    try:
+        Timetable.validate_schedule({day: {period: slot_data}})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    existing_timetable = Timetable.get_faculty_timetable(faculty_id, {"weekly_schedule": 1})
+    if not existing_timetable:
+        return jsonify({"error": "Timetable not found or failed to update slot"}), 404
+    
+    previous_slot = (existing_timetable.get('weekly_schedule', {}).get(day) or {}).get(period)
+    error = slot_room_error(faculty_id, {day: {period: slot_data}}, {day: {period: previous_slot}})
+    if error:
+        return error
+    
     # Update slot
     success = Timetable.update_weekly_schedule(faculty_id, day, period, slot_data)
     
     if not success:
         return jsonify({"error": "Timetable not found or failed to update slot"}), 404
     
+    # Bring already generated sessions in line with the changed slot
+    new_schedule = copy.deepcopy(existing_timetable['weekly_schedule'])
+    new_schedule.setdefault(day, {})[period] = slot_data
+    sessions = ClassSession.sync_with_timetable(faculty_id, existing_timetable['weekly_schedule'], new_schedule)
+    
     return jsonify({
-        "message": f"Slot {day} {period} updated successfully"
+        "message": f"Slot {day} {period} updated successfully",
+        "sessions": sessions,
+        "job_id": notify_timetable_changes(sessions, current_user)
     }), 200
 
 # Class Session Routes
 @faculty_bp.route('/classes', methods=['GET'])
 @faculty_required
 def get_classes(current_user):
-    """Get faculty classes with optional filters"""
+    """Get faculty classes with optional filters and sparse fieldset"""
     faculty_id = str(current_user['_id'])
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     status = request.args.get('status')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), ClassSession.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Convert date strings to datetime objects
     if start_date:
         start_date = datetime.datetime.fromisoformat(start_date)
@@ -126,7 +265,7 @@ def get_classes(current_user):
     if end_date:
         end_date = datetime.datetime.fromisoformat(end_date)
     
-    classes = ClassSession.get_faculty_classes(faculty_id, start_date, end_date, status)
+    classes = ClassSession.get_faculty_classes(faculty_id, start_date, end_date, status, fields)
     
     return jsonify({
         "classes": classes,
@@ -144,19 +283,26 @@ def generate_classes(current_user):
     
     faculty_id = str(current_user['_id'])
     
-    # Create class sessions
-    count = ClassSession.create_from_timetable(
-        faculty_id,
-        data['semester_start_date'],
-        data['semester_end_date']
-    )
-    
-    if count is False:
+    # Check the timetable exists before queuing the work
+    if not Timetable.get_faculty_timetable(faculty_id, {"_id": 1}):
         return jsonify({"error": "Timetable not found or failed to generate classes"}), 404
     
+    # Generate class sessions in the background
+    job = JobQueue.enqueue(
+        "generate_classes",
+        {
+            "faculty_id": faculty_id,
+            "semester_start_date": data['semester_start_date'],
+            "semester_end_date": data['semester_end_date']
+        },
+        created_by=faculty_id,
+        dedupe_key=faculty_id
+    )
+    
     return jsonify({
-        "message": f"Generated {count} class sessions successfully"
-    }), 201
+        "message": "Class generation started",
+        "job_id": str(job['_id'])
+    }), 202
 
 @faculty_bp.route('/classes/<class_id>/complete', methods=['PUT'])
 @faculty_required
@@ -167,7 +313,7 @@ def mark_class_complete(current_user, class_id):
     faculty_id = str(current_user['_id'])
     
     # Check if class belongs to this faculty
-    class_session = ClassSession.get_by_id(class_id)
+    class_session = ClassSession.get_by_id(class_id, {"faculty_id": 1, "duration": 1})
     if not class_session or str(class_session.get('faculty_id')) != faculty_id:
         return jsonify({"error": "Class not found or you don't have permission"}), 404
     
@@ -190,7 +336,7 @@ def mark_class_incomplete(current_user, class_id):
     faculty_id = str(current_user['_id'])
     
     # Check if class belongs to this faculty
-    class_session = ClassSession.get_by_id(class_id)
+    class_session = ClassSession.get_by_id(class_id, {"faculty_id": 1, "duration": 1})
     if not class_session or str(class_session.get('faculty_id')) != faculty_id:
         return jsonify({"error": "Class not found or you don't have permission"}), 404
     
@@ -213,7 +359,7 @@ def cancel_class(current_user, class_id):
     faculty_id = str(current_user['_id'])
     
     # Check if class belongs to this faculty
-    class_session = ClassSession.get_by_id(class_id)
+    class_session = ClassSession.get_by_id(class_id, {"faculty_id": 1, "duration": 1})
     if not class_session or str(class_session.get('faculty_id')) != faculty_id:
         return jsonify({"error": "Class not found or you don't have permission"}), 404
     
@@ -239,19 +385,21 @@ def reschedule_class(current_user, class_id):
     faculty_id = str(current_user['_id'])
     
     # Check if class belongs to this faculty
-    class_session = ClassSession.get_by_id(class_id)
+    class_session = ClassSession.get_by_id(class_id, {"faculty_id": 1, "duration": 1, "room_id": 1})
     if not class_session or str(class_session.get('faculty_id')) != faculty_id:
         return jsonify({"error": "Class not found or you don't have permission"}), 404
     
     # Convert date string to datetime
     new_date = datetime.datetime.fromisoformat(data['new_date'])
+    new_end = new_date + datetime.timedelta(hours=class_session.get('duration', 1))
+    room_id = data.get('room_id') or class_session.get('room_id')
     
     # Check for conflicts
     has_conflict, conflict_reason = Timetable.check_conflict(
         faculty_id,
         new_date.date().isoformat(),
         new_date,
-        new_date + datetime.timedelta(hours=class_session.get('duration', 1))
+        new_end
     )
     
     if has_conflict:
@@ -259,8 +407,13 @@ def reschedule_class(current_user, class_id):
             "error": f"Cannot reschedule to this time due to conflict: {conflict_reason}"
         }), 409
     
+    if room_id:
+        error = room_booking_error(room_id, new_date, new_end, exclude=class_id)
+        if error:
+            return error
+    
     # Reschedule class
-    result = ClassSession.reschedule_class(class_id, new_date, data.get('notes'))
+    result = ClassSession.reschedule_class(class_id, new_date, data.get('notes'), room_id)
     
     if not result:
         return jsonify({"error": "Failed to reschedule class"}), 500
@@ -270,16 +423,57 @@ def reschedule_class(current_user, class_id):
         "new_class_id": result
     }), 200
 
+@faculty_bp.route('/classes/<class_id>/room', methods=['PUT'])
+@faculty_required
+def assign_class_room(current_user, class_id):
+    """Move a class to another room, or clear its room with a null room_id"""
+    data = request.get_json()
+    
+    if not data or 'room_id' not in data:
+        return jsonify({"error": "Room ID is required"}), 400
+    
+    faculty_id = str(current_user['_id'])
+    
+    # Check if class belongs to this faculty
+    class_session = ClassSession.get_by_id(class_id, {"faculty_id": 1, "date": 1, "duration": 1})
+    if not class_session or str(class_session.get('faculty_id')) != faculty_id:
+        return jsonify({"error": "Class not found or you don't have permission"}), 404
+    
+    room_id = data['room_id']
+    if room_id:
+        error = room_booking_error(
+            room_id,
+            class_session['date'],
+            class_session['date'] + datetime.timedelta(hours=class_session.get('duration', 1)),
+            exclude=class_id
+        )
+        if error:
+            return error
+    
+    success = ClassSession.update(class_id, {"room_id": room_id or None})
+    
+    if not success:
+        return jsonify({"error": "Failed to update class room"}), 500
+    
+    return jsonify({
+        "message": "Class room updated successfully"
+    }), 200
+
 # Activity Routes
 @faculty_bp.route('/activities', methods=['GET'])
 @faculty_required
 def get_activities(current_user):
-    """Get faculty activities with optional filters"""
+    """Get faculty activities with optional filters and sparse fieldset"""
     faculty_id = str(current_user['_id'])
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     activity_type = request.args.get('activity_type')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), Activity.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Convert date strings to date objects
     if start_date:
         start_date = datetime.datetime.fromisoformat(start_date).date()
@@ -287,7 +481,7 @@ def get_activities(current_user):
     if end_date:
         end_date = datetime.datetime.fromisoformat(end_date).date()
     
-    activities = Activity.get_faculty_activities(faculty_id, start_date, end_date, activity_type)
+    activities = Activity.get_faculty_activities(faculty_id, start_date, end_date, activity_type, fields)
     
     return jsonify({
         "activities": activities,
@@ -321,16 +515,17 @@ def create_activity(current_user):
             "error": "Cannot create activity due to conflict with existing schedule"
         }), 409
     
+    if data.get('room_id'):
+        error = room_booking_error(data['room_id'], data['start_time'], data['end_time'])
+        if error:
+            return error
+    
     # Add faculty_id to data
     data['faculty_id'] = faculty_id
     
     # Create activity
     activity = Activity.create(data)
     
-    # Convert ObjectId to string for JSON serialization
-    activity['_id'] = str(activity['_id'])
-    activity['faculty_id'] = str(activity['faculty_id'])
-    
     return jsonify({
         "message": "Activity created successfully",
         "activity": activity
@@ -365,15 +560,25 @@ def update_activity(current_user, activity_id):
         end_time = data.get('end_time', activity.get('end_time'))
         
         # Check for conflicts, excluding this activity
-        current_app.config['MONGO_DB'].activities.delete_one({"_id": ObjectId(activity_id)})
-        has_conflict = Activity.check_conflict(faculty_id, start_time, end_time)
-        current_app.config['MONGO_DB'].activities.insert_one(activity)  # Restore activity
+        has_conflict = Activity.check_conflict(faculty_id, start_time, end_time, exclude=activity_id)
         
         if has_conflict:
             return jsonify({
                 "error": "Cannot update activity due to conflict with existing schedule"
             }), 409
     
+    # Check the room if it or the times are changing
+    room_id = data.get('room_id', activity.get('room_id'))
+    if room_id and ('room_id' in data or 'start_time' in data or 'end_time' in data):
+        error = room_booking_error(
+            room_id,
+            data.get('start_time', activity.get('start_time')),
+            data.get('end_time', activity.get('end_time')),
+            exclude=activity_id
+        )
+        if error:
+            return error
+    
     # Update activity
     success = Activity.update(activity_id, data)
     
@@ -395,7 +600,7 @@ def delete_activity(current_user, activity_id):
     faculty_id = str(current_user['_id'])
     
     # Check if activity belongs to this faculty
-    activity = Activity.get_by_id(activity_id)
+    activity = Activity.get_by_id(activity_id, {"faculty_id": 1})
     if not activity or str(activity.get('faculty_id')) != faculty_id:
         return jsonify({"error": "Activity not found or you don't have permission"}), 404
     
@@ -428,12 +633,17 @@ def get_available_slots(current_user):
 @faculty_bp.route('/meetings', methods=['GET'])
 @faculty_required
 def get_meetings(current_user):
-    """Get faculty meetings with optional filters"""
+    """Get faculty meetings with optional filters and sparse fieldset"""
     faculty_id = str(current_user['_id'])
     status = request.args.get('status')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), Meeting.FIELDS + ("student_reg_number",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Convert date strings to datetime objects
     if start_date:
         start_date = datetime.datetime.fromisoformat(start_date)
@@ -441,7 +651,7 @@ def get_meetings(current_user):
     if end_date:
         end_date = datetime.datetime.fromisoformat(end_date)
     
-    meetings = Meeting.get_faculty_meetings(faculty_id, status, start_date, end_date)
+    meetings = Meeting.get_faculty_meetings(faculty_id, status, start_date, end_date, fields)
     
     return jsonify({
         "meetings": meetings,
@@ -462,7 +672,7 @@ def respond_to_meeting(current_user, meeting_id):
     response_message = data.get('response_message')
     
     # Check if meeting belongs to this faculty
-    meeting = Meeting.get_by_id(meeting_id)
+    meeting = Meeting.get_by_id(meeting_id, {"faculty_id": 1, "preferred_time": 1, "duration": 1})
     if not meeting or str(meeting.get('faculty_id')) != faculty_id:
         return jsonify({"error": "Meeting not found or you don't have permission"}), 404
     
@@ -501,19 +711,59 @@ def respond_to_meeting(current_user, meeting_id):
 @faculty_bp.route('/holidays', methods=['GET'])
 @faculty_required
 def get_holidays(current_user):
-    """Get all holidays with optional date filters"""
+    """Get all holidays with optional date filters and sparse fieldset"""
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), Holiday.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     if start_date:
         start_date = datetime.datetime.fromisoformat(start_date)
     
     if end_date:
         end_date = datetime.datetime.fromisoformat(end_date)
     
-    holidays = Holiday.get_all(start_date, end_date)
+    holidays = Holiday.get_all(start_date, end_date, fields)
     
     return jsonify({
         "holidays": holidays,
         "total": len(holidays)
-    }), 200
\ No newline at end of file
+    }), 200
+
+# Search Routes
+@faculty_bp.route('/search', methods=['GET'])
+@faculty_required
+def search_history(current_user):
+    """Search activities, meetings and class topics by relevance
+    
+    Pass the next_cursor of a page as cursor to get the following one.
+    """
+    faculty_id = str(current_user['_id'])
+    types = request.args.get('types')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    try:
+        if start_date:
+            start_date = datetime.datetime.fromisoformat(start_date)
+        
+        if end_date:
+            end_date = datetime.datetime.fromisoformat(end_date)
+        
+        result = HistorySearch.search(
+            faculty_id,
+            request.args.get('q'),
+            kinds=[kind.strip() for kind in types.split(',') if kind.strip()] if types else None,
+            start_date=start_date,
+            end_date=end_date,
+            group_id=request.args.get('group_id'),
+            cursor=request.args.get('cursor'),
+            limit=int(request.args.get('limit', 20))
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(result), 200
\ No newline at end of file
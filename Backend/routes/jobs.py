@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+
+from auth.utils import token_required
+from services.jobs import JobQueue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Job Status Routes
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@token_required
+def get_job(current_user, job_id):
+    """Get the status of a background job"""
+    job = JobQueue.get_by_id(job_id)
+    
+    # Users can only see their own jobs; admins can see all of them
+    if not job or (current_user.get('role') != 'admin' and job.get('created_by') != str(current_user['_id'])):
+        return jsonify({"error": "Job not found or you don't have permission"}), 404
+    
+    return jsonify({"job": JobQueue.serialize(job)}), 200
\ No newline at end of file
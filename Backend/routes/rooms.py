@@ -0,0 +1,165 @@
+from flask import Blueprint, request, jsonify
+import datetime
+
+from auth.utils import token_required, admin_required
+from models.room import Room
+from services.room_schedule import RoomSchedule
+from utils.helpers import parse_fields
+
+rooms_bp = Blueprint('rooms', __name__)
+
+def parse_window():
+    """Read the start and end of a booking window from the query string, raising ValueError"""
+    if not request.args.get('start') or not request.args.get('end'):
+        raise ValueError("Start and end are required")
+    
+    try:
+        start = datetime.datetime.fromisoformat(request.args['start'])
+        end = datetime.datetime.fromisoformat(request.args['end'])
+    except ValueError:
+        raise ValueError("Start and end must be ISO dates")
+    
+    if end <= start:
+        raise ValueError("End must be after start")
+    
+    return start, end
+
+def parse_min_capacity():
+    """Read the minimum capacity filter from the query string, raising ValueError"""
+    try:
+        return int(request.args.get('min_capacity') or 0)
+    except ValueError:
+        raise ValueError("Minimum capacity must be a whole number")
+
+# Room Routes
+@rooms_bp.route('', methods=['GET'])
+@token_required
+def get_rooms(current_user):
+    """List rooms with optional type and capacity filters and sparse fieldset"""
+    try:
+        fields = parse_fields(request.args.get('fields'), Room.FIELDS)
+        min_capacity = parse_min_capacity()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    rooms = Room.list_all(
+        room_type=request.args.get('room_type'),
+        min_capacity=min_capacity,
+        active_only=current_user.get('role') != 'admin',
+        fields=fields
+    )
+    
+    return jsonify({
+        "rooms": rooms,
+        "total": len(rooms)
+    }), 200
+
+@rooms_bp.route('/available', methods=['GET'])
+@token_required
+def get_available_rooms(current_user):
+    """Find the rooms of at least a given capacity that are free over a window"""
+    try:
+        start, end = parse_window()
+        min_capacity = parse_min_capacity()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    rooms = RoomSchedule.find_free_rooms(start, end, min_capacity, request.args.get('room_type'))
+    
+    return jsonify({
+        "rooms": rooms,
+        "total": len(rooms)
+    }), 200
+
+@rooms_bp.route('/<room_id>', methods=['GET'])
+@token_required
+def get_room(current_user, room_id):
+    """Get a room"""
+    room = Room.get_by_id(room_id)
+    if not room:
+        return jsonify({"error": "Room not found"}), 404
+    
+    return jsonify({"room": room}), 200
+
+@rooms_bp.route('/<room_id>/bookings', methods=['GET'])
+@token_required
+def get_room_bookings(current_user, room_id):
+    """Get the class sessions and activities booked in a room over a window"""
+    try:
+        start, end = parse_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not Room.exists(room_id, active_only=False):
+        return jsonify({"error": "Room not found"}), 404
+    
+    bookings = RoomSchedule.get_bookings(room_id, start, end)
+    
+    return jsonify({
+        "bookings": bookings,
+        "total": len(bookings)
+    }), 200
+
+@rooms_bp.route('', methods=['POST'])
+@admin_required
+def create_room(current_user):
+    """Create a room"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    
+    try:
+        Room.validate(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    room = Room.create(data)
+    if not room:
+        return jsonify({"error": f"A room named {data['name']} already exists"}), 409
+    
+    return jsonify({
+        "message": "Room created successfully",
+        "room": room
+    }), 201
+
+@rooms_bp.route('/<room_id>', methods=['PUT'])
+@admin_required
+def update_room(current_user, room_id):
+    """Update a room"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    
+    try:
+        Room.validate(data, partial=True)
+        success = Room.update(room_id, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not success:
+        return jsonify({"error": "Room not found"}), 404
+    
+    return jsonify({
+        "message": "Room updated successfully",
+        "room": Room.get_by_id(room_id)
+    }), 200
+
+@rooms_bp.route('/<room_id>', methods=['DELETE'])
+@admin_required
+def delete_room(current_user, room_id):
+    """Delete a room that nothing is booked in"""
+    if not Room.get_by_id(room_id, {"_id": 1}):
+        return jsonify({"error": "Room not found"}), 404
+    
+    if Room.has_bookings(room_id):
+        return jsonify({
+            "error": "Room is still used by timetables or upcoming bookings; deactivate it instead"
+        }), 409
+    
+    Room.delete(room_id)
+    
+    return jsonify({
+        "message": "Room deleted successfully"
+    }), 200
\ No newline at end of file
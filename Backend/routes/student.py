@@ -8,9 +8,37 @@ from models.class_session import ClassSession
 from models.meeting import Meeting
 from models.user import User
 from services.notification import NotificationService
+from services.dashboard import DashboardService
+from services.calendar_feed import CalendarFeed
+from services.faculty_directory import FacultyDirectory
+from routes.calendar import feed_url
+from utils.helpers import parse_fields
 
 student_bp = Blueprint('student', __name__)
 
+# Dashboard Route
+@student_bp.route('/dashboard', methods=['GET'])
+@student_required
+def get_dashboard(current_user):
+    """Get today's classes, weekly schedule, meetings, holidays and notifications in one call"""
+    student_id = str(current_user['_id'])
+    
+    return jsonify(DashboardService.get_student_dashboard(student_id, current_user.get('group_id'))), 200
+
+# Calendar Feed Route
+@student_bp.route('/calendar-feed', methods=['POST'])
+@student_required
+def get_calendar_feed(current_user):
+    """Get the iCalendar feed URL for the student's group"""
+    group_id = current_user.get('group_id')
+    
+    if not group_id:
+        return jsonify({"error": "You are not assigned to a group"}), 400
+    
+    feed = CalendarFeed.get_or_create("group", group_id)
+    
+    return jsonify({"token": feed['token'], "url": feed_url(feed)}), 200
+
 # Timetable Routes
 @student_bp.route('/timetable', methods=['GET'])
 @student_required
@@ -29,7 +57,7 @@ def get_timetable(current_user):
 @student_bp.route('/classes', methods=['GET'])
 @student_required
 def get_classes(current_user):
-    """Get student classes with optional date filters"""
+    """Get student classes with optional date filters and sparse fieldset"""
     student_id = str(current_user['_id'])
     group_id = current_user.get('group_id')
     
@@ -43,6 +71,11 @@ def get_classes(current_user):
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), ClassSession.FIELDS + ("faculty_name",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Convert date strings to datetime objects
     if start_date:
         start_date = datetime.datetime.fromisoformat(start_date)
@@ -50,13 +83,7 @@ def get_classes(current_user):
     if end_date:
         end_date = datetime.datetime.fromisoformat(end_date)
     
-    classes = ClassSession.get_student_classes(group_id, start_date, end_date)
-    
-    # Add faculty names to each class
-    for cls in classes:
-        faculty = User.get_by_id(cls['faculty_id'])
-        if faculty:
-            cls['faculty_name'] = faculty.get('name', '')
+    classes = ClassSession.get_student_classes(group_id, start_date, end_date, fields)
     
     return jsonify({
         "classes": classes,
@@ -67,23 +94,30 @@ def get_classes(current_user):
 @student_bp.route('/faculty-list', methods=['GET'])
 @student_required
 def get_faculty_list(current_user):
-    """Get all faculty members for meeting requests"""
+    """Search faculty members for meeting requests
+    
+    q matches the start of any word of a member's name or department.
+    Without limit every matching member is returned.
+    """
+    query = request.args.get('q')
+    department = request.args.get('department')
+    
     try:
-        faculty_members = User.list_all(role='faculty')
-        
-        # Format the response to include only necessary fields
-        formatted_faculty = []
-        for faculty in faculty_members:
-            formatted_faculty.append({
-                "_id": faculty["_id"],
-                "name": faculty.get("name", "Unknown"),
-                "department": faculty.get("department", ""),
-                "email": faculty.get("email", "")
-            })
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else None
+        skip = int(request.args.get('skip', 0))
+        if (limit is not None and limit < 0) or skip < 0:
+            raise ValueError("limit and skip must not be negative")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        result = FacultyDirectory.search(query, department, limit, skip)
         
         return jsonify({
-            "faculty": formatted_faculty,
-            "total": len(formatted_faculty)
+            **result,
+            "limit": limit,
+            "skip": skip
         }), 200
     except Exception as e:
         return jsonify({"error": f"Failed to fetch faculty list: {str(e)}"}), 500
@@ -99,7 +133,7 @@ def get_faculty_availability(current_user):
         return jsonify({"error": "Faculty ID is required"}), 400
     
     # Check if faculty exists
-    faculty = User.get_by_id(faculty_id)
+    faculty = User.get_by_id(faculty_id, {"name": 1, "role": 1})
     if not faculty or faculty.get('role') != 'faculty':
         return jsonify({"error": "Faculty not found"}), 404
     
@@ -115,11 +149,16 @@ def get_faculty_availability(current_user):
 @student_bp.route('/meetings', methods=['GET'])
 @student_required
 def get_meetings(current_user):
-    """Get student meeting requests"""
+    """Get student meeting requests with an optional sparse fieldset"""
     student_id = str(current_user['_id'])
     status = request.args.get('status')
     
-    meetings = Meeting.get_student_meetings(student_id, status)
+    try:
+        fields = parse_fields(request.args.get('fields'), Meeting.FIELDS + ("faculty_name",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    meetings = Meeting.get_student_meetings(student_id, status, fields)
     
     return jsonify({
         "meetings": meetings,
@@ -139,7 +178,7 @@ def request_meeting(current_user):
     faculty_id = data['faculty_id']
     
     # Check if faculty exists
-    faculty = User.get_by_id(faculty_id)
+    faculty = User.get_by_id(faculty_id, {"role": 1})
     if not faculty or faculty.get('role') != 'faculty':
         return jsonify({"error": "Faculty not found"}), 404
     
@@ -162,11 +201,6 @@ def request_meeting(current_user):
     # Create meeting
     meeting = Meeting.create(meeting_data)
     
-    # Convert ObjectId to string for JSON serialization
-    meeting['_id'] = str(meeting['_id'])
-    meeting['student_id'] = str(meeting['student_id'])
-    meeting['faculty_id'] = str(meeting['faculty_id'])
-    
     # Notify faculty
     NotificationService.notify_user(
         faculty_id,
@@ -187,7 +221,7 @@ def cancel_meeting(current_user, meeting_id):
     student_id = str(current_user['_id'])
     
     # Check if meeting belongs to this student
-    meeting = Meeting.get_by_id(meeting_id)
+    meeting = Meeting.get_by_id(meeting_id, {"student_id": 1, "faculty_id": 1, "status": 1, "preferred_time": 1})
     if not meeting or str(meeting.get('student_id')) != student_id:
         return jsonify({"error": "Meeting not found or you don't have permission"}), 404
     
@@ -217,16 +251,21 @@ def cancel_meeting(current_user, meeting_id):
 @student_bp.route('/notifications', methods=['GET'])
 @student_required
 def get_notifications(current_user):
-    """Get student notifications"""
+    """Get student notifications with an optional sparse fieldset"""
     student_id = str(current_user['_id'])
     limit = int(request.args.get('limit', 50))
     is_read = request.args.get('is_read')
     
+    try:
+        fields = parse_fields(request.args.get('fields'), NotificationService.FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Convert is_read to boolean if provided
     if is_read is not None:
         is_read = is_read.lower() == 'true'
     
-    notifications = NotificationService.get_user_notifications(student_id, is_read, limit)
+    notifications = NotificationService.get_user_notifications(student_id, is_read, limit, fields)
     unread_count = NotificationService.count_unread(student_id)
     
     return jsonify({
@@ -241,17 +280,55 @@ def mark_notification_read(current_user, notification_id):
     """Mark a notification as read"""
     student_id = str(current_user['_id'])
     
-    # Check if notification belongs to this student
-    notification = current_app.config['MONGO_DB'].notifications.find_one({"_id": ObjectId(notification_id)})
-    if not notification or str(notification.get('user_id')) != student_id:
-        return jsonify({"error": "Notification not found or you don't have permission"}), 404
-    
-    # Mark as read
-    success = NotificationService.mark_as_read(notification_id)
+    # Mark as read, scoped to this student's notifications
+    success = NotificationService.mark_as_read(notification_id, student_id)
     
     if not success:
-        return jsonify({"error": "Failed to mark notification as read"}), 500
+        return jsonify({"error": "Notification not found or you don't have permission"}), 404
     
     return jsonify({
         "message": "Notification marked as read"
+    }), 200
+
+@student_bp.route('/notifications/read', methods=['PUT'])
+@student_required
+def mark_notifications_read(current_user):
+    """Mark several notifications as read"""
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('notification_ids'), list):
+        return jsonify({"error": "Notification IDs are required"}), 400
+    
+    if not all(isinstance(notification_id, str) and ObjectId.is_valid(notification_id) for notification_id in data['notification_ids']):
+        return jsonify({"error": "Invalid notification ID"}), 400
+    
+    student_id = str(current_user['_id'])
+    
+    modified_count = NotificationService.mark_many_as_read(student_id, data['notification_ids'])
+    
+    return jsonify({
+        "message": f"Marked {modified_count} notifications as read",
+        "modified_count": modified_count
+    }), 200
+
+@student_bp.route('/notifications/read-all', methods=['PUT'])
+@student_required
+def mark_all_notifications_read(current_user):
+    """Mark all notifications as read"""
+    student_id = str(current_user['_id'])
+    
+    NotificationService.mark_all_as_read(student_id)
+    
+    return jsonify({
+        "message": "All notifications marked as read"
+    }), 200
+
+@student_bp.route('/notifications/unread-count', methods=['GET'])
+@student_required
+def get_unread_count(current_user):
+    """Get the number of unread notifications"""
+    student_id = str(current_user['_id'])
+    
+    return jsonify({
+        "unread_count": NotificationService.count_unread(student_id)
     }), 200
\ No newline at end of file
@@ -0,0 +1,77 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import datetime
+import os
+import socket
+import threading
+import uuid
+
+class PeriodicTask:
+    """Run a function periodically in a daemon thread
+    
+    When several workers start the same task, a lease document in the
+    `task_leases` collection makes sure only one of them runs it at a time.
+    The function is called inside an application context.
+    """
+    
+    OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def __init__(self, app, name, interval, func):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def start(self):
+        """Start the task thread if it is not already running"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"task-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        """Ask the task thread to stop after its current run"""
+        self._stop.set()
+    
+    def acquire_lease(self):
+        """Take or renew the lease on this task, returning True if held"""
+        db = self.app.config['MONGO_DB']
+        now = datetime.datetime.utcnow()
+        
+        try:
+            lease = db.task_leases.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [
+                        {"owner": PeriodicTask.OWNER_ID},
+                        {"expires_at": {"$lt": now}}
+                    ]
+                },
+                {"$set": {
+                    "owner": PeriodicTask.OWNER_ID,
+                    "expires_at": now + datetime.timedelta(seconds=self.interval * 2)
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker holds an unexpired lease
+            return False
+        
+        return lease is not None and lease.get("owner") == PeriodicTask.OWNER_ID
+    
+    def _run(self):
+        """Run the task every interval while holding the lease"""
+        while not self._stop.is_set():
+            try:
+                if self.acquire_lease():
+                    with self.app.app_context():
+                        self.func()
+            except PyMongoError as e:
+                print(f"Task {self.name} database error: {e}")
+            except Exception as e:
+                print(f"Task {self.name} failed: {e}")
+            
+            self._stop.wait(self.interval)
\ No newline at end of file
@@ -0,0 +1,207 @@
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+from collections import defaultdict
+import datetime
+import threading
+import time
+
+class CacheBus:
+    """Invalidation bus that keeps in-process caches fresh across workers
+    
+    Caches subscribe to the collections their entries are built from. Each
+    worker follows a change stream on those collections and calls the
+    subscribers with the _id of every changed document. A standalone mongod
+    has no change streams, so the bus falls back to tailing a capped
+    `cache_events` collection that writers publish their changes to.
+    
+    While the bus is live a cache may trust its entries without checking
+    the database. Subscribers are reset whenever the bus (re)connects, since
+    changes made while it was down were never seen. An entry loaded while
+    events were being handled may already be stale, so caches compare
+    generation() before and after a load and only keep the entry if it did
+    not move.
+    """
+    
+    # Error codes of a change stream on a standalone server or an unsupported storage engine
+    NO_CHANGE_STREAMS = (40573, 40324, 20)
+    
+    def __init__(self):
+        self._db = None
+        self._collection_size = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(list)
+        self._resets = []
+        self._live = threading.Event()
+        self._generation = 0
+        self._mode = None
+        self._stats = {
+            "events": 0,
+            "last_lag_ms": None,
+            "max_lag_ms": None,
+            "mean_lag_ms": None,
+            "last_event_at": None,
+            "connected_at": None,
+            "reconnects": 0
+        }
+    
+    def subscribe(self, collection, on_change, on_reset=None):
+        """Call on_change with the _id of each changed document of a collection
+        
+        on_reset is called whenever every cached entry must be dropped.
+        """
+        with self._lock:
+            self._subscribers[collection].append(on_change)
+            if on_reset and on_reset not in self._resets:
+                self._resets.append(on_reset)
+    
+    def start(self, db, collection_size=1024 * 1024):
+        """Start following changes in a daemon thread"""
+        self._db = db
+        self._collection_size = collection_size
+        
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cache-bus", daemon=True)
+            self._thread.start()
+    
+    def is_live(self):
+        """Check whether changes are currently being followed"""
+        return self._live.is_set()
+    
+    def generation(self):
+        """Get a counter that moves every time an event is handled or the bus reconnects"""
+        return self._generation
+    
+    def publish(self, collection, ids):
+        """Record changed documents for workers tailing `cache_events`
+        
+        Change streams see every write directly, so this only writes when
+        the bus fell back to the capped collection.
+        """
+        ids = [str(document_id) for document_id in ids if document_id is not None]
+        if self._mode != "capped" or not ids:
+            return
+        
+        try:
+            self._db.cache_events.insert_one({
+                "collection": collection,
+                "ids": ids,
+                "created_at": datetime.datetime.utcnow()
+            })
+        except PyMongoError as e:
+            print(f"Cache event publish failed: {e}")
+    
+    def get_stats(self):
+        """Get the mode, connection state and event lag of the bus"""
+        return {
+            "mode": self._mode,
+            "live": self.is_live(),
+            "subscriptions": {collection: len(handlers) for collection, handlers in self._subscribers.items()},
+            **self._stats
+        }
+    
+    def _connected(self, mode):
+        """Reset every subscriber once a stream is open, so nothing missed survives"""
+        self._mode = mode
+        self._generation += 1
+        
+        for reset in list(self._resets):
+            try:
+                reset()
+            except Exception as e:
+                print(f"Cache reset failed: {e}")
+        
+        self._stats["connected_at"] = datetime.datetime.utcnow()
+        self._live.set()
+    
+    def _handle(self, collection, ids, written_at=None):
+        """Hand changed document ids to the subscribers of a collection and record the lag"""
+        self._generation += 1
+        
+        for document_id in ids:
+            for on_change in list(self._subscribers.get(collection, ())):
+                try:
+                    on_change(str(document_id))
+                except Exception as e:
+                    print(f"Cache eviction failed for {collection}: {e}")
+        
+        now = datetime.datetime.utcnow()
+        stats = self._stats
+        stats["events"] += 1
+        stats["last_event_at"] = now
+        
+        if written_at is not None:
+            lag = max((now - written_at).total_seconds() * 1000, 0.0)
+            stats["last_lag_ms"] = round(lag, 2)
+            stats["max_lag_ms"] = round(max(lag, stats["max_lag_ms"] or 0.0), 2)
+            # Exponentially weighted so the mean follows recent traffic
+            stats["mean_lag_ms"] = round(lag if stats["mean_lag_ms"] is None else 0.9 * stats["mean_lag_ms"] + 0.1 * lag, 2)
+    
+    def _watch(self):
+        """Follow a change stream on the subscribed collections until it fails"""
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": list(self._subscribers)}}},
+            {"$project": {"ns": 1, "documentKey": 1, "clusterTime": 1, "wallTime": 1}}
+        ]
+        
+        with self._db.watch(pipeline, max_await_time_ms=1000) as stream:
+            self._connected("change_stream")
+            
+            while stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    continue
+                
+                # wallTime has millisecond precision but needs MongoDB 6.0
+                written_at = change.get("wallTime")
+                if written_at is None and change.get("clusterTime"):
+                    written_at = change["clusterTime"].as_datetime().replace(tzinfo=None)
+                
+                self._handle(change["ns"]["coll"], [change["documentKey"]["_id"]], written_at)
+    
+    def _tail(self):
+        """Follow the capped cache_events collection until the cursor dies"""
+        try:
+            self._db.create_collection("cache_events", capped=True, size=self._collection_size)
+        except CollectionInvalid:
+            pass  # Collection already exists
+        
+        # A tailable cursor dies when nothing matches, so start it on a marker of our own
+        now = datetime.datetime.utcnow()
+        self._db.cache_events.insert_one({"collection": None, "ids": [], "created_at": now})
+        
+        cursor = self._db.cache_events.find(
+            {"created_at": {"$gte": now - datetime.timedelta(seconds=2)}},
+            cursor_type=CursorType.TAILABLE_AWAIT
+        )
+        self._connected("capped")
+        
+        while cursor.alive:
+            for event in cursor:
+                if event["ids"]:
+                    self._handle(event["collection"], event["ids"], event.get("created_at"))
+    
+    def _run(self):
+        """Keep following changes, falling back to the capped collection on a standalone server"""
+        use_change_streams = True
+        
+        while True:
+            try:
+                if use_change_streams:
+                    self._watch()
+                else:
+                    self._tail()
+            except OperationFailure as e:
+                if use_change_streams and e.code in CacheBus.NO_CHANGE_STREAMS:
+                    print("Change streams are not available, falling back to cache_events")
+                    use_change_streams = False
+                    continue
+                print(f"Cache bus error: {e}")
+            except PyMongoError as e:
+                print(f"Cache bus error: {e}")
+            
+            self._live.clear()
+            self._stats["reconnects"] += 1
+            time.sleep(1)
+
+cache_bus = CacheBus()
\ No newline at end of file
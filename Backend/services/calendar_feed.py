@@ -0,0 +1,406 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from collections import defaultdict
+import datetime
+import secrets
+
+from services.cache_bus import cache_bus
+from utils.cache import TTLCache
+
+class CalendarFeed:
+    """Tokenised iCalendar feeds for faculty and group schedules
+    
+    Feeds are rendered by streaming sorted, indexed cursors over class
+    sessions, activities, approved meetings and holidays. Sessions that
+    belong to a weekly timetable slot are folded into one recurring event
+    per slot (RRULE plus EXDATEs for cancelled or missing weeks) instead of
+    one event per occurrence.
+    
+    Every write that affects a feed bumps a version stamp for its owner in
+    `calendar_versions` (holidays have their own stamp shared by all
+    feeds). The stamps form the ETag, so polling clients get a 304 until
+    something changes, and rendered bodies are cached per ETag.
+    """
+    
+    OWNER_TYPES = ["faculty", "group"]
+    HOLIDAYS = "holidays"
+    PRODID = "-//Faculty Schedule Management System//Calendar Feed//EN"
+    UID_DOMAIN = "faculty-scheduler"
+    
+    _cache = TTLCache(ttl=3600, maxsize=256)
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes used to look up feeds and stream their events"""
+        db = CalendarFeed.get_db()
+        db.calendar_feeds.create_index([("owner_type", ASCENDING), ("owner_id", ASCENDING)], unique=True)
+        db.calendar_feeds.create_index([("token", ASCENDING)], unique=True)
+        db.activities.create_index([("faculty_id", ASCENDING), ("start_time", ASCENDING)])
+        db.meetings.create_index([("faculty_id", ASCENDING), ("status", ASCENDING), ("preferred_time", ASCENDING)])
+        db.holidays.create_index([("date", ASCENDING)])
+    
+    @staticmethod
+    def owner_key(owner_type, owner_id):
+        """Get the version stamp key for a feed owner"""
+        return f"{owner_type}:{owner_id}"
+    
+    @staticmethod
+    def touch(*owners):
+        """Bump the version stamps of the given owner keys"""
+        owners = {owner for owner in owners if owner and not owner.endswith(":None")}
+        if not owners:
+            return
+        
+        CalendarFeed.get_db().calendar_versions.bulk_write([
+            UpdateOne({"_id": owner}, {"$inc": {"version": 1}}, upsert=True)
+            for owner in owners
+        ], ordered=False)
+        cache_bus.publish("calendar_versions", owners)
+    
+    @staticmethod
+    def touch_sessions(sessions):
+        """Bump the stamps of every faculty member, group and room in the given sessions"""
+        owners = set()
+        for session in sessions:
+            owners.add(CalendarFeed.owner_key("faculty", session.get("faculty_id")))
+            if session.get("group_id"):
+                owners.add(CalendarFeed.owner_key("group", session["group_id"]))
+            if session.get("room_id"):
+                owners.add(CalendarFeed.owner_key("room", session["room_id"]))
+        
+        CalendarFeed.touch(*owners)
+    
+    @staticmethod
+    def get_or_create(owner_type, owner_id, rotate=False):
+        """Get the feed for an owner, creating it or rotating its token if asked"""
+        update = {"$setOnInsert": {"created_at": datetime.datetime.utcnow()}}
+        token = secrets.token_urlsafe(24)
+        if rotate:
+            update["$set"] = {"token": token}
+        else:
+            update["$setOnInsert"]["token"] = token
+        
+        return CalendarFeed.get_db().calendar_feeds.find_one_and_update(
+            {"owner_type": owner_type, "owner_id": str(owner_id)},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    @staticmethod
+    def get_by_token(token):
+        """Get a feed by its token"""
+        return CalendarFeed.get_db().calendar_feeds.find_one({"token": token})
+    
+    @staticmethod
+    def etag(feed):
+        """Get the current ETag of a feed from its version stamps"""
+        owner = CalendarFeed.owner_key(feed["owner_type"], feed["owner_id"])
+        versions = {
+            v["_id"]: v.get("version", 0)
+            for v in CalendarFeed.get_db().calendar_versions.find({"_id": {"$in": [owner, CalendarFeed.HOLIDAYS]}})
+        }
+        
+        return f"{feed['_id']}-{versions.get(owner, 0)}-{versions.get(CalendarFeed.HOLIDAYS, 0)}"
+    
+    @staticmethod
+    def _escape(text):
+        """Escape a TEXT property value"""
+        return (
+            str(text or "")
+            .replace("\\", "\\\\")
+            .replace(";", "\\;")
+            .replace(",", "\\,")
+            .replace("\r\n", "\\n")
+            .replace("\n", "\\n")
+        )
+    
+    @staticmethod
+    def _line(name, value):
+        """Format a content line, folding it at 75 octets"""
+        line = f"{name}:{value}"
+        if len(line.encode("utf-8")) <= 75:
+            return line + "\r\n"
+        
+        parts = []
+        current = ""
+        limit = 75
+        for char in line:
+            if len((current + char).encode("utf-8")) > limit:
+                parts.append(current)
+                current = ""
+                limit = 74  # Continuation lines start with a space
+            current += char
+        parts.append(current)
+        
+        return "\r\n ".join(parts) + "\r\n"
+    
+    @staticmethod
+    def _local(dt):
+        """Format a datetime as floating local time"""
+        return dt.strftime("%Y%m%dT%H%M%S")
+    
+    @staticmethod
+    def _utc(dt):
+        """Format a UTC datetime"""
+        return (dt or datetime.datetime.utcnow()).strftime("%Y%m%dT%H%M%SZ")
+    
+    @staticmethod
+    def _event(uid, start, end, summary, stamp, description=None, status=None, all_day=False, extra=()):
+        """Render one VEVENT"""
+        lines = [
+            "BEGIN:VEVENT\r\n",
+            CalendarFeed._line("UID", f"{uid}@{CalendarFeed.UID_DOMAIN}"),
+            CalendarFeed._line("DTSTAMP", CalendarFeed._utc(stamp))
+        ]
+        
+        if all_day:
+            lines.append(CalendarFeed._line("DTSTART;VALUE=DATE", start.strftime("%Y%m%d")))
+            lines.append(CalendarFeed._line("DTEND;VALUE=DATE", end.strftime("%Y%m%d")))
+        else:
+            lines.append(CalendarFeed._line("DTSTART", CalendarFeed._local(start)))
+            lines.append(CalendarFeed._line("DTEND", CalendarFeed._local(end)))
+        
+        lines.append(CalendarFeed._line("SUMMARY", CalendarFeed._escape(summary)))
+        if description:
+            lines.append(CalendarFeed._line("DESCRIPTION", CalendarFeed._escape(description)))
+        if status:
+            lines.append(CalendarFeed._line("STATUS", status))
+        for name, value in extra:
+            lines.append(CalendarFeed._line(name, value))
+        lines.append("END:VEVENT\r\n")
+        
+        return "".join(lines)
+    
+    @staticmethod
+    def _timetable_slots(feed):
+        """Get the weekly slots that the feed's sessions may be folded into
+        
+        Returns a dict keyed by (faculty_id, day, start minute).
+        """
+        if feed["owner_type"] == "faculty":
+            query = {"faculty_id": ObjectId(feed["owner_id"])}
+        else:
+            query = {"group_id": feed["owner_id"]}
+        
+        return {
+            (slot["faculty_id"], slot["day"], slot["start"]): slot
+            for slot in CalendarFeed.get_db().timetable_slots.find(query)
+        }
+    
+    @staticmethod
+    def _session_events(feed, faculty_names):
+        """Stream class sessions, folding timetable occurrences into recurring events"""
+        from models.class_session import ClassSession
+        
+        db = CalendarFeed.get_db()
+        active = [ClassSession.STATUS["NOT_COMPLETED"], ClassSession.STATUS["COMPLETED"]]
+        slots = CalendarFeed._timetable_slots(feed)
+        occurrences = defaultdict(lambda: {"first": None, "last": None, "active": set()})
+        
+        if feed["owner_type"] == "faculty":
+            query = {"faculty_id": ObjectId(feed["owner_id"])}
+        else:
+            query = {"group_id": feed["owner_id"]}
+        
+        cursor = db.class_sessions.find(
+            query,
+            {"faculty_id": 1, "group_id": 1, "subject": 1, "topic": 1, "date": 1, "duration": 1,
+             "status": 1, "rescheduled_from": 1, "updated_at": 1}
+        ).sort("date", ASCENDING)
+        
+        for session in cursor:
+            date = session.get("date")
+            if not isinstance(date, datetime.datetime):
+                continue
+            
+            key = (session["faculty_id"], date.strftime("%A").lower(), date.hour * 60 + date.minute)
+            slot = slots.get(key)
+            
+            # Occurrences of a timetable slot are folded into its recurring event
+            if (
+                slot
+                and not session.get("rescheduled_from")
+                and session.get("subject") == slot.get("subject")
+                and session.get("group_id") == slot.get("group_id")
+                and session.get("duration", 1) == slot.get("duration", 1)
+            ):
+                occurrence = occurrences[key]
+                occurrence["first"] = occurrence["first"] or date
+                occurrence["last"] = date
+                if session.get("status") in active:
+                    occurrence["active"].add(date)
+                continue
+            
+            status = None if session.get("status") in active else "CANCELLED"
+            yield CalendarFeed._event(
+                f"class-{session['_id']}",
+                date,
+                date + datetime.timedelta(hours=session.get("duration", 1)),
+                CalendarFeed._session_summary(feed, session, faculty_names),
+                session.get("updated_at"),
+                description=session.get("topic"),
+                status=status
+            )
+        
+        # One recurring event per slot with the weeks it does not run excluded
+        for key, occurrence in occurrences.items():
+            if not occurrence["active"]:
+                continue
+            
+            faculty_id = key[0]
+            slot = slots[key]
+            first = occurrence["first"]
+            excluded = []
+            date = first
+            while date <= occurrence["last"]:
+                if date not in occurrence["active"]:
+                    excluded.append(CalendarFeed._local(date))
+                date += datetime.timedelta(weeks=1)
+            
+            extra = [("RRULE", f"FREQ=WEEKLY;UNTIL={CalendarFeed._local(occurrence['last'])}")]
+            if excluded:
+                extra.append(("EXDATE", ",".join(excluded)))
+            
+            yield CalendarFeed._event(
+                f"slot-{faculty_id}-{slot['day']}-{slot['period']}",
+                first,
+                first + datetime.timedelta(hours=slot.get("duration", 1)),
+                CalendarFeed._session_summary(feed, {**slot, "faculty_id": faculty_id}, faculty_names),
+                slot.get("updated_at"),
+                description=slot.get("topic"),
+                extra=extra
+            )
+    
+    @staticmethod
+    def _session_summary(feed, session, faculty_names):
+        """Event title for a class"""
+        subject = session.get("subject") or "Class"
+        if feed["owner_type"] == "faculty":
+            return f"{subject} ({session.get('group_id')})" if session.get("group_id") else subject
+        
+        faculty_name = faculty_names.get(session.get("faculty_id"))
+        return f"{subject} - {faculty_name}" if faculty_name else subject
+    
+    @staticmethod
+    def _activity_events(faculty_id):
+        """Stream a faculty member's activities, leaving meetings to _meeting_events"""
+        cursor = CalendarFeed.get_db().activities.find(
+            {"faculty_id": ObjectId(faculty_id), "meeting_id": {"$exists": False}},
+            {"start_time": 1, "end_time": 1, "title": 1, "activity_type": 1, "description": 1, "updated_at": 1}
+        ).sort("start_time", ASCENDING)
+        
+        for activity in cursor:
+            if not activity.get("start_time") or not activity.get("end_time"):
+                continue
+            
+            yield CalendarFeed._event(
+                f"activity-{activity['_id']}",
+                activity["start_time"],
+                activity["end_time"],
+                activity.get("title") or activity.get("activity_type", "Activity").replace("_", " ").title(),
+                activity.get("updated_at"),
+                description=activity.get("description")
+            )
+    
+    @staticmethod
+    def _meeting_events(faculty_id):
+        """Stream a faculty member's approved meetings"""
+        cursor = CalendarFeed.get_db().meetings.find(
+            {"faculty_id": ObjectId(faculty_id), "status": "approved"},
+            {"preferred_time": 1, "duration": 1, "student_name": 1, "reason": 1, "updated_at": 1}
+        ).sort("preferred_time", ASCENDING)
+        
+        for meeting in cursor:
+            start = meeting.get("preferred_time")
+            if not isinstance(start, datetime.datetime):
+                continue
+            
+            yield CalendarFeed._event(
+                f"meeting-{meeting['_id']}",
+                start,
+                start + datetime.timedelta(minutes=meeting.get("duration", 30)),
+                f"Meeting with {meeting.get('student_name') or 'student'}",
+                meeting.get("updated_at"),
+                description=meeting.get("reason")
+            )
+    
+    @staticmethod
+    def _holiday_events():
+        """Stream holidays as all-day events"""
+        for holiday in CalendarFeed.get_db().holidays.find(
+            {},
+            {"date": 1, "name": 1, "description": 1, "updated_at": 1}
+        ).sort("date", ASCENDING):
+            date = holiday.get("date")
+            if not isinstance(date, datetime.datetime):
+                continue
+            
+            yield CalendarFeed._event(
+                f"holiday-{holiday['_id']}",
+                date,
+                date + datetime.timedelta(days=1),
+                f"Holiday: {holiday.get('name', '')}",
+                holiday.get("updated_at"),
+                description=holiday.get("description"),
+                all_day=True
+            )
+    
+    @staticmethod
+    def _render(feed):
+        """Render a feed as a stream of iCalendar chunks"""
+        db = CalendarFeed.get_db()
+        
+        if feed["owner_type"] == "faculty":
+            faculty = db.users.find_one({"_id": ObjectId(feed["owner_id"])}, {"name": 1})
+            name = f"{faculty.get('name', 'Faculty') if faculty else 'Faculty'} schedule"
+            faculty_names = {}
+        else:
+            name = f"Group {feed['owner_id']} schedule"
+            
+            # Names of the faculty members who teach the group
+            faculty_ids = db.class_sessions.distinct("faculty_id", {"group_id": feed["owner_id"]})
+            faculty_names = {
+                f["_id"]: f.get("name", "")
+                for f in db.users.find({"_id": {"$in": faculty_ids}}, {"name": 1})
+            }
+        
+        yield "".join([
+            "BEGIN:VCALENDAR\r\n",
+            "VERSION:2.0\r\n",
+            CalendarFeed._line("PRODID", CalendarFeed.PRODID),
+            "CALSCALE:GREGORIAN\r\n",
+            "METHOD:PUBLISH\r\n",
+            CalendarFeed._line("X-WR-CALNAME", CalendarFeed._escape(name))
+        ])
+        
+        yield from CalendarFeed._session_events(feed, faculty_names)
+        
+        if feed["owner_type"] == "faculty":
+            yield from CalendarFeed._activity_events(feed["owner_id"])
+            yield from CalendarFeed._meeting_events(feed["owner_id"])
+        
+        yield from CalendarFeed._holiday_events()
+        
+        yield "END:VCALENDAR\r\n"
+    
+    @staticmethod
+    def stream(feed, etag):
+        """Stream a feed, serving and filling the cache for its ETag"""
+        cached = CalendarFeed._cache.get(etag)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        for chunk in CalendarFeed._render(feed):
+            chunks.append(chunk)
+            yield chunk
+        
+        CalendarFeed._cache.set(etag, "".join(chunks))
\ No newline at end of file
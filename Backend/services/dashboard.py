@@ -0,0 +1,203 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+
+from models.class_session import ClassSession
+from models.meeting import Meeting
+from services.notification import NotificationService
+from utils.cache import TTLCache
+
+class DashboardService:
+    """Dashboard summaries for faculty and students
+    
+    Each collection is queried with a single `$facet` aggregation, the
+    aggregations run in parallel on a small thread pool and the assembled
+    summary is cached per user for a few seconds.
+    """
+    
+    _cache = TTLCache(ttl=15)
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard")
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def _date_ranges(now):
+        """Get the start of today, tomorrow and the end of the coming week"""
+        today = datetime.datetime.combine(now.date(), datetime.time.min)
+        return today, today + datetime.timedelta(days=1), today + datetime.timedelta(days=7)
+    
+    @staticmethod
+    def _run_parallel(tasks):
+        """Run named callables concurrently, each inside an application context"""
+        app = current_app._get_current_object()
+        
+        def run(func):
+            with app.app_context():
+                return func()
+        
+        futures = {
+            name: DashboardService._executor.submit(run, func)
+            for name, func in tasks.items()
+        }
+        
+        return {name: future.result() for name, future in futures.items()}
+    
+    @staticmethod
+    def _class_summary(match, now, with_faculty_name=False):
+        """Today's classes, the coming week's classes and counts by status"""
+        today, tomorrow, week_end = DashboardService._date_ranges(now)
+        
+        faculty_name = [
+            {"$lookup": {"from": "users", "localField": "faculty_id", "foreignField": "_id", "as": "faculty"}},
+            {"$addFields": {"faculty_name": {"$ifNull": [{"$arrayElemAt": ["$faculty.name", 0]}, ""]}}},
+            {"$project": {"faculty": 0}}
+        ] if with_faculty_name else []
+        
+        result = list(DashboardService.get_db().class_sessions.aggregate([
+            {"$match": match},
+            {"$facet": {
+                "today": [
+                    {"$match": {"date": {"$gte": today, "$lt": tomorrow}}},
+                    {"$sort": {"date": 1}},
+                    *faculty_name
+                ],
+                "week": [
+                    {"$match": {"date": {"$gte": tomorrow, "$lt": week_end}}},
+                    {"$sort": {"date": 1}},
+                    *faculty_name
+                ],
+                "by_status": [
+                    {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+                ]
+            }}
+        ]))[0]
+        
+        by_status = {status: 0 for status in ClassSession.STATUS.values()}
+        for item in result["by_status"]:
+            by_status[item["_id"]] = item["count"]
+        
+        return {
+            "today": result["today"],
+            "week": result["week"],
+            "by_status": by_status,
+            "total": sum(by_status.values())
+        }
+    
+    @staticmethod
+    def _meeting_summary(match, other_party, now):
+        """Pending meeting requests and approved meetings in the coming week"""
+        _, _, week_end = DashboardService._date_ranges(now)
+        
+        # Attach the other party's name to each meeting
+        with_name = [
+            {"$lookup": {"from": "users", "localField": f"{other_party}_id", "foreignField": "_id", "as": "party"}},
+            {"$addFields": {f"{other_party}_name": {"$ifNull": [{"$arrayElemAt": ["$party.name", 0]}, ""]}}},
+            {"$project": {"party": 0}}
+        ]
+        
+        result = list(DashboardService.get_db().meetings.aggregate([
+            {"$match": match},
+            {"$facet": {
+                "pending": [
+                    {"$match": {"status": Meeting.STATUS["PENDING"]}},
+                    {"$sort": {"preferred_time": 1}},
+                    *with_name
+                ],
+                "upcoming": [
+                    {"$match": {
+                        "status": Meeting.STATUS["APPROVED"],
+                        "preferred_time": {"$gte": now, "$lt": week_end}
+                    }},
+                    {"$sort": {"preferred_time": 1}},
+                    *with_name
+                ]
+            }}
+        ]))[0]
+        
+        return {
+            "pending": result["pending"],
+            "pending_count": len(result["pending"]),
+            "upcoming": result["upcoming"]
+        }
+    
+    @staticmethod
+    def _activity_summary(faculty_id, now):
+        """Activities starting today or in the coming week"""
+        today, _, week_end = DashboardService._date_ranges(now)
+        
+        result = list(DashboardService.get_db().activities.aggregate([
+            {"$match": {"faculty_id": ObjectId(faculty_id), "start_time": {"$gte": today, "$lt": week_end}}},
+            {"$facet": {
+                "upcoming": [{"$sort": {"start_time": 1}}],
+                "by_type": [{"$group": {"_id": "$activity_type", "count": {"$sum": 1}}}]
+            }}
+        ]))[0]
+        
+        return {
+            "upcoming": result["upcoming"],
+            "by_type": {item["_id"]: item["count"] for item in result["by_type"]},
+            "total": len(result["upcoming"])
+        }
+    
+    @staticmethod
+    def _upcoming_holidays(now, limit=5):
+        """The next few holidays from today"""
+        today, _, _ = DashboardService._date_ranges(now)
+        
+        return list(DashboardService.get_db().holidays.aggregate([
+            {"$match": {"date": {"$gte": today}}},
+            {"$sort": {"date": 1}},
+            {"$limit": limit}
+        ]))
+    
+    @staticmethod
+    def get_faculty_dashboard(faculty_id):
+        """Get the dashboard summary for a faculty member"""
+        cache_key = f"faculty:{faculty_id}"
+        summary = DashboardService._cache.get(cache_key)
+        if summary is not None:
+            return summary
+        
+        now = datetime.datetime.utcnow()
+        summary = DashboardService._run_parallel({
+            "classes": lambda: DashboardService._class_summary({"faculty_id": ObjectId(faculty_id)}, now),
+            "meetings": lambda: DashboardService._meeting_summary({"faculty_id": ObjectId(faculty_id)}, "student", now),
+            "activities": lambda: DashboardService._activity_summary(faculty_id, now),
+            "holidays": lambda: DashboardService._upcoming_holidays(now),
+            "unread_count": lambda: NotificationService.count_unread(faculty_id)
+        })
+        summary["generated_at"] = now
+        
+        DashboardService._cache.set(cache_key, summary, current_app.config.get('DASHBOARD_CACHE_SECONDS', 15))
+        
+        return summary
+    
+    @staticmethod
+    def get_student_dashboard(student_id, group_id):
+        """Get the dashboard summary for a student"""
+        cache_key = f"student:{student_id}:{group_id}"
+        summary = DashboardService._cache.get(cache_key)
+        if summary is not None:
+            return summary
+        
+        now = datetime.datetime.utcnow()
+        tasks = {
+            "meetings": lambda: DashboardService._meeting_summary({"student_id": ObjectId(student_id)}, "faculty", now),
+            "holidays": lambda: DashboardService._upcoming_holidays(now),
+            "notifications": lambda: NotificationService.get_user_notifications(student_id, False, 5),
+            "unread_count": lambda: NotificationService.count_unread(student_id)
+        }
+        if group_id:
+            tasks["classes"] = lambda: DashboardService._class_summary({"group_id": group_id}, now, with_faculty_name=True)
+        
+        summary = DashboardService._run_parallel(tasks)
+        summary.setdefault("classes", None)
+        summary["generated_at"] = now
+        
+        DashboardService._cache.set(cache_key, summary, current_app.config.get('DASHBOARD_CACHE_SECONDS', 15))
+        
+        return summary
\ No newline at end of file
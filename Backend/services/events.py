@@ -0,0 +1,169 @@
+from bson.objectid import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from collections import defaultdict, OrderedDict
+import datetime
+import queue
+import threading
+import time
+
+class Subscription:
+    """A single listener on a set of event channels"""
+    
+    def __init__(self, channels, max_pending=100):
+        self.channels = set(channels)
+        self.queue = queue.Queue(maxsize=max_pending)
+    
+    def get(self, timeout=None):
+        """Wait for the next event, returning None on timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def put(self, event):
+        """Queue an event, dropping the oldest one if the listener is slow"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(event)
+
+class EventBroker:
+    """Pub/sub broker pushing change events to connected clients
+    
+    Events are written to a capped `events` collection and every worker
+    tails it, so a publish from any gunicorn worker or API node reaches the
+    subscribers held in memory by all of them. Without a database the broker
+    falls back to dispatching in-process only.
+    
+    Channels are named `user:<id>`, `group:<group_id>` and `role:<role>`.
+    """
+    
+    def __init__(self):
+        self._db = None
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._thread = None
+    
+    @staticmethod
+    def channels_for_user(user):
+        """Get the channels a user should receive events on"""
+        channels = [f"user:{user['_id']}"]
+        if user.get("role"):
+            channels.append(f"role:{user['role']}")
+        if user.get("group_id"):
+            channels.append(f"group:{user['group_id']}")
+        return channels
+    
+    def start(self, db, collection_size=16 * 1024 * 1024):
+        """Create the capped events collection and start tailing it"""
+        try:
+            db.create_collection("events", capped=True, size=collection_size)
+        except CollectionInvalid:
+            pass  # Collection already exists
+        
+        self._db = db
+        
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._tail, name="event-broker", daemon=True)
+            self._thread.start()
+    
+    def subscribe(self, channels):
+        """Register a new subscription on the given channels"""
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        """Remove a subscription from all of its channels"""
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].discard(subscription)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+    
+    def publish(self, channels, event_type, data=None):
+        """Publish an event to one or more channels"""
+        event = {
+            "_id": ObjectId(),
+            "channels": list(channels),
+            "event": event_type,
+            "data": data or {},
+            "created_at": datetime.datetime.utcnow()
+        }
+        
+        if self._db is not None:
+            try:
+                self._db.events.insert_one(event)
+                return str(event["_id"])
+            except PyMongoError as e:
+                print(f"Event publish failed, delivering locally: {e}")
+        
+        self._dispatch(event)
+        return str(event["_id"])
+    
+    def replay(self, channels, last_event_id, limit=100):
+        """Get events published on the channels after a given event ID"""
+        if self._db is None or not last_event_id:
+            return []
+        
+        try:
+            return list(self._db.events.find({
+                "_id": {"$gt": ObjectId(last_event_id)},
+                "channels": {"$in": list(channels)}
+            }).sort("_id", 1).limit(limit))
+        except Exception:
+            return []
+    
+    def _dispatch(self, event):
+        """Hand an event to every local subscriber of its channels"""
+        with self._lock:
+            subscribers = set()
+            for channel in event["channels"]:
+                subscribers.update(self._subscribers.get(channel, ()))
+        
+        for subscription in subscribers:
+            subscription.put(event)
+    
+    def _tail(self):
+        """Follow the capped events collection and dispatch new events"""
+        # ObjectIds from different processes are only ordered to the second,
+        # so reconnects start slightly early and skip events already seen
+        recent_ids = OrderedDict()
+        resume_from = None
+        
+        while True:
+            try:
+                if resume_from is None:
+                    latest = self._db.events.find_one({}, sort=[("$natural", -1)])
+                    resume_from = latest["_id"].generation_time if latest else datetime.datetime.utcnow()
+                
+                cursor = self._db.events.find(
+                    {"_id": {"$gt": ObjectId.from_datetime(resume_from - datetime.timedelta(seconds=2))}},
+                    cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                
+                while cursor.alive:
+                    for event in cursor:
+                        resume_from = event["_id"].generation_time
+                        if event["_id"] in recent_ids:
+                            continue
+                        
+                        recent_ids[event["_id"]] = True
+                        if len(recent_ids) > 1000:
+                            recent_ids.popitem(last=False)
+                        
+                        self._dispatch(event)
+            except PyMongoError as e:
+                print(f"Event tailing error: {e}")
+            
+            # Tailable cursors die on an empty collection; back off and retry
+            time.sleep(1)
+
+event_broker = EventBroker()
\ No newline at end of file
@@ -0,0 +1,148 @@
+from flask import current_app
+from bisect import bisect_left
+from collections import Counter
+import re
+
+from services.cache_bus import cache_bus
+from utils.cache import TTLCache, single_flight
+
+class FacultyDirectory:
+    """Searchable in-process directory of faculty members
+    
+    The directory is one snapshot of every faculty member, sorted by name,
+    with a prefix index over the words of their names and departments: a
+    sorted array of (word, position) pairs that a query word is bisected
+    into. Searches, department facets and pages are then served from
+    memory. The snapshot is dropped whenever a user changes, through the
+    cache bus or locally by the writer, and rebuilt with a single query on
+    the next read. While the bus is down it is also rebuilt after
+    MAX_AGE_SECONDS, since changes made by other workers go unseen.
+    """
+    
+    MAX_AGE_SECONDS = 30
+    LIVE_MAX_AGE_SECONDS = 60 * 60
+    
+    FIELDS = {"name": 1, "department": 1, "email": 1}
+    
+    _snapshot = TTLCache(ttl=MAX_AGE_SECONDS, maxsize=1)
+    _invalidations = 0
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def _words(text):
+        """Split text into lowercase words"""
+        return re.findall(r"[a-z0-9]+", (text or "").lower())
+    
+    @staticmethod
+    def _build():
+        """Load every faculty member and index the words of their names and departments"""
+        faculty = FacultyDirectory.get_db().users.find({"role": "faculty"}, FacultyDirectory.FIELDS)
+        
+        entries = sorted(
+            (
+                {
+                    "_id": member["_id"],
+                    "name": member.get("name") or "Unknown",
+                    "department": member.get("department") or "",
+                    "email": member.get("email") or ""
+                }
+                for member in faculty
+            ),
+            key=lambda entry: (entry["name"].lower(), str(entry["_id"]))
+        )
+        
+        index = sorted(
+            (word, position)
+            for position, entry in enumerate(entries)
+            for word in set(FacultyDirectory._words(entry["name"]) + FacultyDirectory._words(entry["department"]))
+        )
+        
+        return {
+            "entries": entries,
+            "words": [word for word, _ in index],
+            "positions": [position for _, position in index],
+            "departments": Counter(entry["department"] for entry in entries)
+        }
+    
+    @staticmethod
+    def _get_snapshot():
+        """Get the current snapshot, rebuilding it once if it was dropped or expired"""
+        snapshot = FacultyDirectory._snapshot.get("faculty")
+        if snapshot is not None:
+            return snapshot
+        
+        generation = (cache_bus.generation(), FacultyDirectory._invalidations)
+        snapshot = single_flight.do("faculty_directory", {}, FacultyDirectory._build)
+        
+        # A snapshot loaded while users changed may already be stale
+        if (cache_bus.generation(), FacultyDirectory._invalidations) == generation:
+            ttl = FacultyDirectory.LIVE_MAX_AGE_SECONDS if cache_bus.is_live() else FacultyDirectory.MAX_AGE_SECONDS
+            FacultyDirectory._snapshot.set("faculty", snapshot, ttl)
+        
+        return snapshot
+    
+    @staticmethod
+    def _matching(snapshot, query):
+        """Get the positions of the entries with a word starting with every word of the query"""
+        words, positions = snapshot["words"], snapshot["positions"]
+        matches = None
+        
+        for prefix in set(FacultyDirectory._words(query)):
+            found = set()
+            i = bisect_left(words, prefix)
+            while i < len(words) and words[i].startswith(prefix):
+                found.add(positions[i])
+                i += 1
+            
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        
+        return range(len(snapshot["entries"])) if matches is None else sorted(matches)
+    
+    @staticmethod
+    def search(query=None, department=None, limit=None, skip=0):
+        """Search faculty by name and department word prefixes
+        
+        Every word of the query must start a word of the member's name or
+        department. Department facets count the members matching the query
+        before the department filter is applied. Results are sorted by name
+        and paged with limit and skip; without a limit every match is
+        returned.
+        """
+        snapshot = FacultyDirectory._get_snapshot()
+        entries = snapshot["entries"]
+        matches = FacultyDirectory._matching(snapshot, query)
+        
+        if query and query.strip():
+            departments = Counter(entries[position]["department"] for position in matches)
+        else:
+            departments = snapshot["departments"]
+        
+        if department:
+            department = department.strip().lower()
+            matches = [position for position in matches if entries[position]["department"].lower() == department]
+        
+        end = None if limit is None else skip + limit
+        
+        return {
+            "faculty": [entries[position] for position in matches[skip:end]],
+            "total": len(matches),
+            "departments": [
+                {"department": name, "count": count}
+                for name, count in sorted(departments.items(), key=lambda item: (-item[1], item[0]))
+            ]
+        }
+    
+    @staticmethod
+    def invalidate(user_id=None):
+        """Drop the snapshot so the next read rebuilds it"""
+        FacultyDirectory._invalidations += 1
+        FacultyDirectory._snapshot.clear()
+        single_flight.forget("faculty_directory")
+
+cache_bus.subscribe("users", FacultyDirectory.invalidate, FacultyDirectory.invalidate)
\ No newline at end of file
@@ -0,0 +1,271 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from collections import defaultdict
+import datetime
+
+from services.cache_bus import cache_bus
+from services.calendar_feed import CalendarFeed
+from utils.cache import TTLCache
+from utils.intervals import IntervalIndex
+
+class FreeBusy:
+    """Busy time of each faculty member, materialized per week
+    
+    A week's busy time is a set of sorted interval arrays, one per kind:
+    weekly timetable classes, class sessions, activities (which include
+    approved meetings) and holidays. Weeks are kept in process and in the
+    `freebusy` collection, stored as minutes from the start of the week
+    and tagged with the faculty member's and the holidays' version stamps
+    from `calendar_versions`. Every write to timetables, sessions,
+    activities, meetings or holidays already bumps one of those stamps, so
+    a read costs one stamp lookup and a week is only rebuilt after
+    something in it may have changed.
+    """
+    
+    KINDS = ("class", "session", "activity", "holiday")
+    INACTIVE_STATUSES = ["cancelled", "rescheduled", "holiday"]
+    
+    # Class sessions that start this long before a week can still run into it
+    LOOKBACK = datetime.timedelta(days=1)
+    
+    # faculty_id -> {week_start: (stamp, has_timetable, {kind: IntervalIndex})}
+    _weeks = TTLCache(ttl=24 * 60 * 60, maxsize=4096)
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the index that expires weeks nobody has read for a while"""
+        FreeBusy.get_db().freebusy.create_index([("updated_at", ASCENDING)], expireAfterSeconds=14 * 24 * 60 * 60)
+    
+    @staticmethod
+    def week_start(moment):
+        """Get the Monday midnight that starts the week of a date or datetime"""
+        date = moment.date() if isinstance(moment, datetime.datetime) else moment
+        return datetime.datetime.combine(date - datetime.timedelta(days=date.weekday()), datetime.time.min)
+    
+    @staticmethod
+    def _stamp(faculty_id):
+        """Get the stamp of everything a faculty member's busy time is built from"""
+        owner = CalendarFeed.owner_key("faculty", faculty_id)
+        versions = {
+            v["_id"]: v.get("version", 0)
+            for v in FreeBusy.get_db().calendar_versions.find({"_id": {"$in": [owner, CalendarFeed.HOLIDAYS]}})
+        }
+        
+        return f"{versions.get(owner, 0)}-{versions.get(CalendarFeed.HOLIDAYS, 0)}"
+    
+    @staticmethod
+    def _build(faculty_id, week_start):
+        """Load one week of a faculty member's busy time as minute intervals per kind"""
+        db = FreeBusy.get_db()
+        week_end = week_start + datetime.timedelta(days=7)
+        busy = defaultdict(list)
+        
+        def minutes(moment):
+            return int((moment - week_start).total_seconds() // 60)
+        
+        # The weekly timetable repeats on every day of the week
+        for slot in db.timetable_slots.find({"faculty_id": ObjectId(faculty_id)}, {"weekday": 1, "start": 1, "end": 1}):
+            offset = slot["weekday"] * 24 * 60
+            busy["class"].append((offset + slot["start"], offset + slot["end"], None))
+        
+        sessions = db.class_sessions.find(
+            {
+                "faculty_id": ObjectId(faculty_id),
+                "date": {"$gte": week_start - FreeBusy.LOOKBACK, "$lt": week_end},
+                "status": {"$nin": FreeBusy.INACTIVE_STATUSES}
+            },
+            {"date": 1, "duration": 1}
+        )
+        for session in sessions:
+            end = session["date"] + datetime.timedelta(hours=session.get("duration", 1) or 1)
+            if end > week_start:
+                busy["session"].append((minutes(session["date"]), minutes(end), str(session["_id"])))
+        
+        activities = db.activities.find(
+            {"faculty_id": ObjectId(faculty_id), "start_time": {"$lt": week_end}, "end_time": {"$gt": week_start}},
+            {"start_time": 1, "end_time": 1}
+        )
+        for activity in activities:
+            busy["activity"].append((minutes(activity["start_time"]), minutes(activity["end_time"]), str(activity["_id"])))
+        
+        for holiday in db.holidays.find({"date": {"$gte": week_start, "$lt": week_end}}, {"date": 1}):
+            day = minutes(datetime.datetime.combine(holiday["date"].date(), datetime.time.min))
+            busy["holiday"].append((day, day + 24 * 60, str(holiday["_id"])))
+        
+        has_timetable = db.timetables.find_one({"faculty_id": ObjectId(faculty_id)}, {"_id": 1}) is not None
+        
+        return has_timetable, {kind: sorted(intervals) for kind, intervals in busy.items()}
+    
+    @staticmethod
+    def _to_index(week_start, intervals):
+        """Turn minute intervals into an interval index over datetimes"""
+        return IntervalIndex(
+            (week_start + datetime.timedelta(minutes=start), week_start + datetime.timedelta(minutes=end), ref)
+            for start, end, ref in intervals
+        )
+    
+    @staticmethod
+    def _get_weeks(faculty_id, week_starts):
+        """Get the busy time of a faculty member for each given week
+        
+        While the cache bus is live, writes evict weeks as they happen and
+        cached weeks are used as they are. Otherwise weeks come from the
+        process, then from `freebusy`, and are rebuilt only when their stamp
+        is out of date.
+        """
+        faculty_id = str(faculty_id)
+        generation = cache_bus.generation()
+        cached_weeks = FreeBusy._weeks.get(faculty_id) or {}
+        
+        if cache_bus.is_live() and all(week_start in cached_weeks for week_start in week_starts):
+            return {week_start: cached_weeks[week_start] for week_start in week_starts}
+        
+        stamp = FreeBusy._stamp(faculty_id)
+        weeks, missing = {}, []
+        
+        for week_start in week_starts:
+            cached = cached_weeks.get(week_start)
+            if cached and cached[0] == stamp:
+                weeks[week_start] = cached
+            else:
+                missing.append(week_start)
+        
+        if not missing:
+            return weeks
+        
+        db = FreeBusy.get_db()
+        stored = {
+            doc["week_start"]: doc
+            for doc in db.freebusy.find({
+                "_id": {"$in": [f"{faculty_id}:{week_start.date().isoformat()}" for week_start in missing]},
+                "stamp": stamp
+            })
+        }
+        
+        now = datetime.datetime.utcnow()
+        operations = []
+        for week_start in missing:
+            doc = stored.get(week_start)
+            if doc:
+                has_timetable = doc["has_timetable"]
+                busy = {
+                    kind: list(zip(arrays["starts"], arrays["ends"], arrays["refs"]))
+                    for kind, arrays in doc["busy"].items()
+                }
+            else:
+                has_timetable, busy = FreeBusy._build(faculty_id, week_start)
+                operations.append(UpdateOne(
+                    {"_id": f"{faculty_id}:{week_start.date().isoformat()}"},
+                    {"$set": {
+                        "faculty_id": faculty_id,
+                        "week_start": week_start,
+                        "stamp": stamp,
+                        "has_timetable": has_timetable,
+                        "busy": {
+                            kind: {
+                                "starts": [start for start, _, _ in intervals],
+                                "ends": [end for _, end, _ in intervals],
+                                "refs": [ref for _, _, ref in intervals]
+                            }
+                            for kind, intervals in busy.items()
+                        },
+                        "updated_at": now
+                    }},
+                    upsert=True
+                ))
+            
+            weeks[week_start] = (stamp, has_timetable, {kind: FreeBusy._to_index(week_start, busy.get(kind, ())) for kind in FreeBusy.KINDS})
+        
+        if operations:
+            db.freebusy.bulk_write(operations, ordered=False)
+        
+        # A week loaded while the bus handled events may already be stale
+        if not cache_bus.is_live() or cache_bus.generation() == generation:
+            FreeBusy._weeks.set(faculty_id, {**cached_weeks, **weeks})
+        
+        return weeks
+    
+    @staticmethod
+    def _week_starts(start, end):
+        """Get the starts of the weeks that [start, end) touches"""
+        week_start = FreeBusy.week_start(start)
+        week_starts = []
+        while week_start < end:
+            week_starts.append(week_start)
+            week_start += datetime.timedelta(days=7)
+        return week_starts
+    
+    @staticmethod
+    def get_busy(faculty_id, start, end, kinds=KINDS, exclude=None):
+        """Get the (start, end, kind) busy intervals of a faculty member that overlap [start, end)
+        
+        exclude is the ID of a session or activity being moved, which
+        cannot conflict with itself.
+        """
+        busy = []
+        for week in FreeBusy._get_weeks(faculty_id, FreeBusy._week_starts(start, end)).values():
+            for kind in kinds:
+                busy.extend(
+                    (busy_start, busy_end, kind)
+                    for busy_start, busy_end, ref in week[2][kind].overlapping(start, end)
+                    if ref is None or ref != str(exclude)
+                )
+        
+        return sorted(busy)
+    
+    @staticmethod
+    def first_conflict(faculty_id, start, end, kinds=KINDS, exclude=None):
+        """Get the first of the given kinds that is busy during [start, end), or None"""
+        busy = {kind for _, _, kind in FreeBusy.get_busy(faculty_id, start, end, kinds, exclude)}
+        return next((kind for kind in kinds if kind in busy), None)
+    
+    @staticmethod
+    def find_free_hours(faculty_id, start_date, days=7, hours=range(9, 17), duration=1):
+        """Find the whole hours free of classes, activities and holidays
+        
+        Each free hour starts a block of duration hours within the working
+        hours. Returns None if the faculty member has no timetable.
+        """
+        first = datetime.datetime.combine(start_date, datetime.time.min)
+        last = first + datetime.timedelta(days=days)
+        weeks = FreeBusy._get_weeks(faculty_id, FreeBusy._week_starts(first, last))
+        
+        if not any(week[1] for week in weeks.values()):
+            return None
+        
+        free = []
+        for day in range(days):
+            date = start_date + datetime.timedelta(days=day)
+            indexes = weeks[FreeBusy.week_start(date)][2]
+            
+            for hour in hours:
+                if hour + duration > hours[-1] + 1:
+                    break
+                
+                block_start = datetime.datetime.combine(date, datetime.time(hour))
+                block_end = block_start + datetime.timedelta(hours=duration)
+                if not any(index.any_overlap(block_start, block_end) for index in indexes.values()):
+                    free.append(block_start)
+        
+        return free
+    
+    @staticmethod
+    def evict(key):
+        """Forget the weeks held in process that a calendar stamp change affects"""
+        if key == CalendarFeed.HOLIDAYS:
+            FreeBusy.clear()
+        elif key.startswith("faculty:"):
+            FreeBusy._weeks.delete(key.split(":", 1)[1])
+    
+    @staticmethod
+    def clear():
+        """Forget the weeks held in process"""
+        FreeBusy._weeks.clear()
+
+cache_bus.subscribe("calendar_versions", FreeBusy.evict, FreeBusy.clear)
\ No newline at end of file
@@ -0,0 +1,161 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, TEXT
+import base64
+import heapq
+import itertools
+import json
+
+class HistorySearch:
+    """Full-text search over a faculty member's activities, meetings and classes
+    
+    Each collection has one text index whose first key is faculty_id, so a
+    search only touches the index entries of the faculty member asking,
+    however many years of history the collection holds, and the date is
+    kept in the index after the text keys to filter ranges without
+    fetching documents. Matches from the three collections are ranked by
+    text score and merged. Pages follow a keyset cursor over
+    (score, kind, _id), so a page costs the same wherever it falls.
+    """
+    
+    SOURCES = {
+        "activity": {
+            "collection": "activities",
+            "date": "start_time",
+            "weights": {"title": 3, "description": 1},
+            "projection": {"title": 1, "description": 1, "activity_type": 1, "start_time": 1, "end_time": 1}
+        },
+        "class": {
+            "collection": "class_sessions",
+            "date": "date",
+            "weights": {"topic": 3, "subject": 2, "notes": 1},
+            "projection": {"subject": 1, "topic": 1, "notes": 1, "group_id": 1, "status": 1, "date": 1, "duration": 1}
+        },
+        "meeting": {
+            "collection": "meetings",
+            "date": "preferred_time",
+            "weights": {"reason": 2, "response_message": 1},
+            "projection": {"student_name": 1, "reason": 1, "response_message": 1, "status": 1, "preferred_time": 1, "duration": 1}
+        }
+    }
+    
+    # Ties on score are broken by kind in this order, then by _id
+    KINDS = tuple(sorted(SOURCES))
+    
+    MAX_LIMIT = 100
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the faculty-scoped text index of each searched collection"""
+        db = HistorySearch.get_db()
+        for kind, source in HistorySearch.SOURCES.items():
+            db[source["collection"]].create_index(
+                [("faculty_id", ASCENDING)] +
+                [(field, TEXT) for field in source["weights"]] +
+                [(source["date"], ASCENDING)],
+                weights=source["weights"],
+                default_language="english",
+                name=f"{kind}_search"
+            )
+    
+    @staticmethod
+    def encode_cursor(hit):
+        """Encode the position after a hit as an opaque cursor"""
+        position = [hit["score"], hit["type"], str(hit["_id"])]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor into (score, kind, _id)"""
+        try:
+            score, kind, hit_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if kind not in HistorySearch.KINDS:
+                raise ValueError
+            return float(score), kind, ObjectId(hit_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
+    @staticmethod
+    def _after(kind, cursor):
+        """Build the filter for the matches of a kind that rank after the cursor"""
+        score, cursor_kind, cursor_id = cursor
+        if kind > cursor_kind:
+            return {"score": {"$lte": score}}
+        if kind < cursor_kind:
+            return {"score": {"$lt": score}}
+        
+        return {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "_id": {"$gt": cursor_id}}
+        ]}
+    
+    @staticmethod
+    def _search(kind, faculty_id, text, start_date, end_date, group_id, cursor, limit):
+        """Get the best ranked matches of one kind after the cursor"""
+        source = HistorySearch.SOURCES[kind]
+        query = {"faculty_id": ObjectId(faculty_id), "$text": {"$search": text}}
+        
+        if start_date or end_date:
+            query[source["date"]] = {}
+            if start_date:
+                query[source["date"]]["$gte"] = start_date
+            if end_date:
+                query[source["date"]]["$lt"] = end_date
+        
+        if group_id and kind == "class":
+            query["group_id"] = group_id
+        
+        pipeline = [
+            {"$match": query},
+            {"$project": {**source["projection"], "score": {"$meta": "textScore"}}}
+        ]
+        if cursor:
+            pipeline.append({"$match": HistorySearch._after(kind, cursor)})
+        pipeline += [
+            {"$sort": {"score": -1, "_id": 1}},
+            {"$limit": limit}
+        ]
+        
+        for hit in HistorySearch.get_db()[source["collection"]].aggregate(pipeline):
+            hit["type"] = kind
+            hit["date"] = hit.get(source["date"])
+            yield hit
+    
+    @staticmethod
+    def search(faculty_id, text, kinds=None, start_date=None, end_date=None, group_id=None, cursor=None, limit=20):
+        """Search a faculty member's history, best matches first
+        
+        kinds limits the search to some of activity, class and meeting.
+        group_id narrows classes to one group. Returns the hits of one page
+        and the cursor of the next, or None after the last page.
+        """
+        text = (text or "").strip()
+        if not text:
+            raise ValueError("Search text is required")
+        
+        kinds = kinds or HistorySearch.KINDS
+        unknown = set(kinds) - set(HistorySearch.KINDS)
+        if unknown:
+            raise ValueError(f"Unknown search types: {', '.join(sorted(unknown))}")
+        
+        limit = max(1, min(limit, HistorySearch.MAX_LIMIT))
+        position = HistorySearch.decode_cursor(cursor) if cursor else None
+        
+        # Each kind is already ranked, so merge lazily and stop once the page is full
+        ranked = heapq.merge(
+            *(
+                HistorySearch._search(kind, faculty_id, text, start_date, end_date, group_id, position, limit + 1)
+                for kind in sorted(kinds)
+            ),
+            key=lambda hit: (-hit["score"], hit["type"], hit["_id"])
+        )
+        hits = list(itertools.islice(ranked, limit + 1))
+        
+        next_cursor = HistorySearch.encode_cursor(hits[limit - 1]) if len(hits) > limit else None
+        
+        return {"results": hits[:limit], "next_cursor": next_cursor}
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Handlers for background job types
+
+Importing this module registers the handlers with the JobQueue.
+"""
+from bson.objectid import ObjectId
+from models.class_session import ClassSession
+from services.jobs import JobQueue
+from services.notification import NotificationService
+from services.session_stats import SessionStats
+from services.session_conflicts import SessionConflicts
+from services.timetable_generator import TimetableGenerator
+from services.user_import import UserImporter
+import datetime
+
+@JobQueue.register("generate_classes")
+def generate_classes(params, progress):
+    """Generate a semester of class sessions from a faculty timetable
+    
+    The generation ID is chosen and saved with the job before any session
+    is written, so a retry inserts only the sessions still missing.
+    """
+    generation_id = params.get("generation_id")
+    if not generation_id:
+        generation_id = str(ObjectId())
+        progress(0, params={"generation_id": generation_id})
+    
+    count = ClassSession.create_from_timetable(
+        params["faculty_id"],
+        params["semester_start_date"],
+        params["semester_end_date"],
+        progress=progress,
+        generation_id=generation_id
+    )
+    
+    if count is False:
+        raise ValueError("Timetable not found or failed to generate classes")
+    
+    return {
+        "count": count,
+        "message": f"Generated {count} class sessions successfully"
+    }
+
+@JobQueue.register("notify_all_faculty")
+def notify_all_faculty(params, progress):
+    """Send a notification and SMS to every faculty member
+    
+    The broadcast ID is chosen and saved with the job before the broadcast
+    is created, as is the last faculty member sent an SMS, so a retry
+    neither repeats the broadcast nor resends the SMS already queued.
+    """
+    broadcast_id = params.get("broadcast_id")
+    if not broadcast_id:
+        broadcast_id = str(ObjectId())
+        progress(0, params={"broadcast_id": broadcast_id})
+    
+    NotificationService.create_broadcast(
+        NotificationService.AUDIENCE["ROLE"],
+        "faculty",
+        params["message"],
+        params.get("notification_type", "admin"),
+        params.get("related_id"),
+        broadcast_id
+    )
+    
+    def sent(done, total, last_id):
+        progress(done / total, f"Sent {done} of {total} SMS", params={"sms_after": str(last_id)})
+    
+    NotificationService.send_audience_sms(
+        NotificationService.AUDIENCE["ROLE"],
+        "faculty",
+        params["message"],
+        params.get("notification_type", "admin"),
+        progress=sent,
+        after=params.get("sms_after")
+    )
+    
+    return {"broadcast_id": broadcast_id}
+
+@JobQueue.register("notify_groups")
+def notify_groups(params, progress):
+    """Send a broadcast and SMS to each listed student group
+    
+    Saves the broadcast IDs, the number of groups done and the last
+    student sent an SMS in the current group, so a retry resumes where the
+    previous attempt stopped.
+    """
+    notifications = params["notifications"]
+    notification_type = params.get("notification_type", "class")
+    broadcast_ids = params.get("broadcast_ids", [])
+    after = params.get("sms_after")
+    
+    for index in range(params.get("groups_done", 0), len(notifications)):
+        notification = notifications[index]
+        
+        if index == len(broadcast_ids):
+            broadcast_ids.append(str(ObjectId()))
+            progress(index / len(notifications), params={"broadcast_ids": broadcast_ids})
+        
+        NotificationService.create_broadcast(
+            NotificationService.AUDIENCE["GROUP"],
+            notification["group_id"],
+            notification["message"],
+            notification_type,
+            params.get("related_id"),
+            broadcast_ids[index]
+        )
+        
+        def sent(done, total, last_id):
+            progress((index + done / total) / len(notifications), params={"sms_after": str(last_id)})
+        
+        NotificationService.send_audience_sms(
+            NotificationService.AUDIENCE["GROUP"],
+            notification["group_id"],
+            notification["message"],
+            notification_type,
+            progress=sent,
+            after=after
+        )
+        progress((index + 1) / len(notifications), params={"groups_done": index + 1, "sms_after": None})
+        after = None
+    
+    return {"broadcast_ids": broadcast_ids}
+
+@JobQueue.register("generate_timetables")
+def generate_timetables(params, progress):
+    """Solve and write the weekly timetables of the faculty members in a spec"""
+    return TimetableGenerator.run(params, progress)
+
+@JobQueue.register("rebuild_session_stats")
+def rebuild_session_stats(params, progress):
+    """Recompute the class session rollups"""
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    
+    buckets = SessionStats.rebuild(
+        datetime.datetime.fromisoformat(start_date) if start_date else None,
+        datetime.datetime.fromisoformat(end_date) if end_date else None,
+        progress=progress
+    )
+    
+    return {"buckets": buckets}
+
+@JobQueue.register("rescan_conflicts")
+def rescan_conflicts(params, progress):
+    """Recompute every group clash between class sessions"""
+    return SessionConflicts.rescan(progress)
+
+@JobQueue.register("import_users")
+def import_users(params, progress):
+    """Import a staged upload of users"""
+    return UserImporter.import_staged(params["import_id"], progress)
\ No newline at end of file
@@ -0,0 +1,317 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import datetime
+import threading
+import traceback
+
+from services.background import PeriodicTask
+
+class JobLeaseLost(Exception):
+    """Raised when a worker no longer holds the lease on its job"""
+
+class JobQueue:
+    """Background job queue backed by the `jobs` collection
+    
+    Jobs are claimed atomically with find_one_and_update and held under a
+    lease that a heartbeat thread renews while the handler runs, whether or
+    not it reports progress. Handlers can save params as they go, so a
+    retry resumes from the last step done instead of repeating it. A job
+    whose lease expires (e.g. the worker died) is picked up again until it
+    runs out of attempts, and every state change after the claim is
+    conditional on the lease owner, so a job never completes twice. An
+    optional dedupe key keeps two copies of the same job from being queued
+    or running at the same time.
+    """
+    
+    STATUS = {
+        "QUEUED": "queued",
+        "RUNNING": "running",
+        "SUCCEEDED": "succeeded",
+        "FAILED": "failed"
+    }
+    
+    _handlers = {}
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes used to claim and look up jobs"""
+        jobs = JobQueue.get_db().jobs
+        jobs.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+        jobs.create_index([("active_key", ASCENDING)], unique=True, partialFilterExpression={"active_key": {"$exists": True}})
+        jobs.create_index(
+            [("finished_at", ASCENDING)],
+            expireAfterSeconds=current_app.config.get('JOB_RETENTION_DAYS', 7) * 24 * 60 * 60
+        )
+    
+    @staticmethod
+    def register(job_type):
+        """Decorator registering a handler for a job type
+        
+        Handlers are called as handler(params, progress) inside an
+        application context and return a JSON-serializable result.
+        progress(fraction, message=None, params=None) records progress and
+        merges params into the stored params a retry is called with. It
+        raises JobLeaseLost once another worker may have taken the job.
+        """
+        def decorator(f):
+            JobQueue._handlers[job_type] = f
+            return f
+        return decorator
+    
+    @staticmethod
+    def enqueue(job_type, params=None, created_by=None, dedupe_key=None):
+        """Queue a job, returning the existing job if the dedupe key is active"""
+        if job_type not in JobQueue._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        
+        job = {
+            "type": job_type,
+            "params": params or {},
+            "status": JobQueue.STATUS["QUEUED"],
+            "progress": 0,
+            "message": None,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_by": created_by,
+            "created_at": datetime.datetime.utcnow()
+        }
+        
+        if dedupe_key:
+            job["active_key"] = f"{job_type}:{dedupe_key}"
+        
+        try:
+            result = JobQueue.get_db().jobs.insert_one(job)
+        except DuplicateKeyError:
+            return JobQueue.get_db().jobs.find_one({"active_key": job["active_key"]})
+        
+        return {
+            **job,
+            "_id": result.inserted_id
+        }
+    
+    @staticmethod
+    def get_by_id(job_id):
+        """Get a job by ID"""
+        try:
+            return JobQueue.get_db().jobs.find_one({"_id": ObjectId(job_id)})
+        except Exception:
+            return None
+    
+    @staticmethod
+    def claim(worker_id):
+        """Atomically claim the oldest runnable job for a worker"""
+        config = current_app.config
+        now = datetime.datetime.utcnow()
+        
+        return JobQueue.get_db().jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": JobQueue.STATUS["QUEUED"]},
+                    {
+                        "status": JobQueue.STATUS["RUNNING"],
+                        "lease_expires_at": {"$lt": now},
+                        "attempts": {"$lt": config.get('JOB_MAX_ATTEMPTS', 3)}
+                    }
+                ]
+            },
+            {
+                "$set": {
+                    "status": JobQueue.STATUS["RUNNING"],
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + datetime.timedelta(seconds=config.get('JOB_LEASE_SECONDS', 60)),
+                    "started_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    @staticmethod
+    def update_progress(job_id, worker_id, progress, message=None, params=None):
+        """Record job progress and saved params, and renew the lease"""
+        update = {
+            "progress": round(min(max(progress, 0), 1), 4),
+            "lease_expires_at": datetime.datetime.utcnow() + datetime.timedelta(
+                seconds=current_app.config.get('JOB_LEASE_SECONDS', 60)
+            )
+        }
+        if message:
+            update["message"] = message
+        for key, value in (params or {}).items():
+            update[f"params.{key}"] = value
+        
+        result = JobQueue.get_db().jobs.update_one(
+            {"_id": job_id, "lease_owner": worker_id, "status": JobQueue.STATUS["RUNNING"]},
+            {"$set": update}
+        )
+        
+        if result.matched_count == 0:
+            raise JobLeaseLost(str(job_id))
+    
+    @staticmethod
+    def renew_lease(job_id, worker_id):
+        """Extend the lease on a running job, returning False if it was lost"""
+        result = JobQueue.get_db().jobs.update_one(
+            {"_id": job_id, "lease_owner": worker_id, "status": JobQueue.STATUS["RUNNING"]},
+            {"$set": {"lease_expires_at": datetime.datetime.utcnow() + datetime.timedelta(
+                seconds=current_app.config.get('JOB_LEASE_SECONDS', 60)
+            )}}
+        )
+        
+        return result.matched_count > 0
+    
+    @staticmethod
+    def _heartbeat(app, job_id, worker_id, stop, lost):
+        """Renew a job's lease every third of its length until stopped or lost"""
+        interval = app.config.get('JOB_LEASE_SECONDS', 60) / 3
+        
+        with app.app_context():
+            while not stop.wait(interval):
+                try:
+                    if not JobQueue.renew_lease(job_id, worker_id):
+                        lost.set()
+                        return
+                except PyMongoError as e:
+                    print(f"Job {job_id} lease renewal failed: {e}")
+    
+    @staticmethod
+    def _finish(job_id, worker_id, status, **fields):
+        """Move a job to a final state if the worker still owns it"""
+        result = JobQueue.get_db().jobs.update_one(
+            {"_id": job_id, "lease_owner": worker_id, "status": JobQueue.STATUS["RUNNING"]},
+            {
+                "$set": {
+                    "status": status,
+                    "finished_at": datetime.datetime.utcnow(),
+                    **fields
+                },
+                "$unset": {"active_key": "", "lease_expires_at": ""}
+            }
+        )
+        
+        return result.modified_count > 0
+    
+    @staticmethod
+    def fail_exhausted():
+        """Fail jobs whose lease expired after their last allowed attempt"""
+        result = JobQueue.get_db().jobs.update_many(
+            {
+                "status": JobQueue.STATUS["RUNNING"],
+                "lease_expires_at": {"$lt": datetime.datetime.utcnow()},
+                "attempts": {"$gte": current_app.config.get('JOB_MAX_ATTEMPTS', 3)}
+            },
+            {
+                "$set": {
+                    "status": JobQueue.STATUS["FAILED"],
+                    "error": "Job did not finish within its lease",
+                    "finished_at": datetime.datetime.utcnow()
+                },
+                "$unset": {"active_key": "", "lease_expires_at": ""}
+            }
+        )
+        
+        return result.modified_count
+    
+    @staticmethod
+    def run(job, worker_id):
+        """Run a claimed job and record its outcome"""
+        handler = JobQueue._handlers.get(job["type"])
+        if not handler:
+            JobQueue._finish(job["_id"], worker_id, JobQueue.STATUS["FAILED"], error=f"Unknown job type: {job['type']}")
+            return
+        
+        stop = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(
+            target=JobQueue._heartbeat,
+            args=(current_app._get_current_object(), job["_id"], worker_id, stop, lost),
+            name=f"job-heartbeat-{job['_id']}",
+            daemon=True
+        )
+        
+        def progress(fraction, message=None, params=None):
+            if lost.is_set():
+                raise JobLeaseLost(str(job["_id"]))
+            JobQueue.update_progress(job["_id"], worker_id, fraction, message, params)
+        
+        heartbeat.start()
+        try:
+            result = handler(job.get("params", {}), progress)
+        except JobLeaseLost:
+            print(f"Job {job['_id']} lease lost, abandoning")
+            return
+        except Exception as e:
+            traceback.print_exc()
+            JobQueue._finish(job["_id"], worker_id, JobQueue.STATUS["FAILED"], error=str(e))
+            return
+        finally:
+            stop.set()
+            heartbeat.join()
+        
+        JobQueue._finish(job["_id"], worker_id, JobQueue.STATUS["SUCCEEDED"], progress=1, result=result)
+    
+    @staticmethod
+    def serialize(job):
+        """Convert a job document for JSON responses"""
+        return {
+            "_id": str(job["_id"]),
+            "type": job["type"],
+            "status": job["status"],
+            "progress": job.get("progress", 0),
+            "message": job.get("message"),
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "attempts": job.get("attempts", 0),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at")
+        }
+
+class JobWorkerPool:
+    """Pool of threads that claim and run jobs from the queue"""
+    
+    def __init__(self, app, size=2, poll_interval=1):
+        self.app = app
+        self.size = size
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+    
+    def start(self):
+        """Start the worker threads"""
+        for i in range(self.size):
+            worker_id = f"{PeriodicTask.OWNER_ID}:{i}"
+            thread = threading.Thread(target=self._work, args=(worker_id,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+    
+    def stop(self):
+        """Ask the worker threads to stop after their current job"""
+        self._stop.set()
+    
+    def _work(self, worker_id):
+        """Claim and run jobs until stopped"""
+        while not self._stop.is_set():
+            job = None
+            try:
+                with self.app.app_context():
+                    job = JobQueue.claim(worker_id)
+                    if job:
+                        JobQueue.run(job, worker_id)
+                    else:
+                        JobQueue.fail_exhausted()
+            except PyMongoError as e:
+                print(f"Job worker database error: {e}")
+            
+            if not job:
+                self._stop.wait(self.poll_interval)
\ No newline at end of file
@@ -1,21 +1,164 @@
 from flask import current_app
 from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from collections import Counter, defaultdict
 import datetime
-from services.sms_service import send_sms
+import heapq
+import itertools
+from services.sms_digest import SmsDigest
+from services.events import event_broker
+from utils.helpers import build_projection
 
 class NotificationService:
-    """Service for managing notifications to users"""
+    """Service for managing notifications to users
+    
+    Read state is tracked with a per-user document in `notification_state`
+    holding a read watermark (`last_read_at`) and a denormalised
+    `unread_count` of personal notifications. A notification is read if its
+    own `is_read` flag is set or if it was created at or before the user's
+    watermark.
+    
+    Group and role-wide messages are stored once in `broadcasts`, keyed by
+    audience, and merged into each recipient's feed on read. A user only
+    sees broadcasts sent after they joined the audience. Individual reads
+    of a broadcast are recorded in `broadcast_reads`, which also hold the
+    per-user `hidden` flag that stands in for deleting a shared broadcast.
+    Sending a broadcast writes nothing per member: unread broadcasts are
+    counted on read from the (audience, created_at) index, only those
+    newer than the watermark, less the user's reads since then.
+    """
+    
+    AUDIENCE = {
+        "GROUP": "group",
+        "ROLE": "role"
+    }
+    
+    # Fields clients may request with ?fields=
+    FIELDS = ("message", "type", "related_id", "is_read", "created_at", "read_at")
+    
+    # User fields needed to send or queue an SMS
+    SMS_PROJECTION = {"mobile_number": 1, "sms_digest_minutes": 1}
     
     @staticmethod
     def get_db():
         """Get the database connection"""
         return current_app.config['MONGO_DB']
     
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes used by the notification read paths"""
+        db = NotificationService.get_db()
+        db.notifications.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        db.notifications.create_index([("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING)])
+        db.broadcasts.create_index([("audience_type", ASCENDING), ("audience", ASCENDING), ("created_at", DESCENDING)])
+        db.broadcast_reads.create_index([("user_id", ASCENDING), ("broadcast_id", ASCENDING)], unique=True)
+        db.broadcast_reads.create_index([("user_id", ASCENDING), ("broadcast_created_at", DESCENDING)])
+    
+    @staticmethod
+    def _object_id(user_id):
+        """Normalise a user ID to an ObjectId"""
+        return ObjectId(user_id) if isinstance(user_id, str) else user_id
+    
+    @staticmethod
+    def get_read_state(user_id):
+        """Get the read watermark and unread counter for a user"""
+        user_id = NotificationService._object_id(user_id)
+        db = NotificationService.get_db()
+        
+        state = db.notification_state.find_one({"_id": user_id})
+        if state:
+            return state
+        
+        # First access: nothing sent before the user existed is unread, and
+        # the counter is seeded from what was sent since
+        user = db.users.find_one({"_id": user_id}, {"created_at": 1}) or {}
+        watermark = user.get("created_at")
+        unread_count = db.notifications.count_documents({
+            "user_id": user_id,
+            **NotificationService._read_filter(False, watermark)
+        })
+        
+        return db.notification_state.find_one_and_update(
+            {"_id": user_id},
+            {"$setOnInsert": {"last_read_at": watermark, "unread_count": unread_count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    @staticmethod
+    def _count_unread_broadcasts(user_id, watermark):
+        """Count the broadcasts addressed to a user since the watermark that they have not read"""
+        audiences = NotificationService._get_audiences(user_id)
+        if not audiences:
+            return 0
+        
+        read_ids = NotificationService._get_broadcast_reads(user_id, watermark)[0]
+        return NotificationService.get_db().broadcasts.count_documents({
+            "$and": [
+                {"$or": audiences},
+                NotificationService._broadcast_read_filter(False, watermark, read_ids)
+            ]
+        })
+    
+    @staticmethod
+    def _read_filter(is_read, watermark):
+        """Build the notification query fragment for an is_read filter"""
+        if is_read is None:
+            return {}
+        
+        if is_read:
+            if watermark:
+                return {"$or": [{"is_read": True}, {"created_at": {"$lte": watermark}}]}
+            return {"is_read": True}
+        
+        query = {"is_read": False}
+        if watermark:
+            query["created_at"] = {"$gt": watermark}
+        return query
+    
+    @staticmethod
+    def _increment_unread(user_ids, amount=1):
+        """Adjust the unread counter for one or more users"""
+        if not user_ids:
+            return
+        
+        NotificationService.get_db().notification_state.update_many(
+            {"_id": {"$in": list(user_ids)}},
+            {"$inc": {"unread_count": amount}}
+        )
+    
+    @staticmethod
+    def _decrement_unread_after(user_id, created_at):
+        """Decrement the unread counter if a notification was after the watermark"""
+        NotificationService.get_db().notification_state.update_one(
+            {
+                "_id": user_id,
+                "$or": [
+                    {"last_read_at": None},
+                    {"last_read_at": {"$lt": created_at}}
+                ]
+            },
+            {"$inc": {"unread_count": -1}}
+        )
+    
+    @staticmethod
+    def _publish(channels, notification_id, notification):
+        """Push a newly created notification to connected clients"""
+        event_broker.publish(channels, "notification", {
+            "_id": str(notification_id),
+            "message": notification["message"],
+            "type": notification["type"],
+            "related_id": notification["related_id"],
+            "created_at": notification["created_at"]
+        })
+    
     @staticmethod
     def create_notification(user_id, message, notification_type="system", related_id=None):
         """Create a new notification for a user"""
+        user_id = NotificationService._object_id(user_id)
         notification = {
-            "user_id": ObjectId(user_id) if isinstance(user_id, str) else user_id,
+            "user_id": user_id,
             "message": message,
             "type": notification_type,
             "related_id": related_id,
@@ -24,120 +167,483 @@ class NotificationService:
         }
         
         result = NotificationService.get_db().notifications.insert_one(notification)
+        NotificationService._increment_unread([user_id])
+        NotificationService._publish([f"user:{user_id}"], result.inserted_id, notification)
         
-        # Get user mobile number for SMS
-        user = NotificationService.get_db().users.find_one({"_id": ObjectId(user_id) if isinstance(user_id, str) else user_id})
-        if user and user.get("mobile_number"):
-            try:
-                # Send SMS
-                send_sms(user["mobile_number"], message)
-            except Exception as e:
-                print(f"SMS sending failed: {e}")
+        # Send the SMS now or add it to the user's digest
+        user = NotificationService.get_db().users.find_one({"_id": user_id}, NotificationService.SMS_PROJECTION)
+        if user:
+            SmsDigest.queue([user], message, notification_type)
         
         return str(result.inserted_id)
     
     @staticmethod
-    def mark_as_read(notification_id):
-        """Mark a notification as read"""
-        result = NotificationService.get_db().notifications.update_one(
-            {"_id": ObjectId(notification_id)},
-            {"$set": {"is_read": True}}
+    def create_notifications(notifications):
+        """Create many personal notifications with one write per collection
+        
+        notifications is a list of (user_id, message, notification_type,
+        related_id) tuples. Returns the IDs of the created notifications.
+        """
+        if not notifications:
+            return []
+        
+        db = NotificationService.get_db()
+        now = datetime.datetime.utcnow()
+        documents = [
+            {
+                "user_id": NotificationService._object_id(user_id),
+                "message": message,
+                "type": notification_type,
+                "related_id": related_id,
+                "is_read": False,
+                "created_at": now
+            }
+            for user_id, message, notification_type, related_id in notifications
+        ]
+        
+        result = db.notifications.insert_many(documents)
+        
+        # Users with several notifications get one counter update per count
+        per_user = Counter(document["user_id"] for document in documents)
+        by_count = defaultdict(list)
+        for user_id, count in per_user.items():
+            by_count[count].append(user_id)
+        for count, user_ids in by_count.items():
+            NotificationService._increment_unread(user_ids, count)
+        
+        for notification_id, document in zip(result.inserted_ids, documents):
+            NotificationService._publish([f"user:{document['user_id']}"], notification_id, document)
+        
+        # Look up mobile numbers with a single query
+        recipients = {
+            user["_id"]: user
+            for user in db.users.find({"_id": {"$in": list(per_user)}, "mobile_number": {"$nin": [None, ""]}}, NotificationService.SMS_PROJECTION)
+        }
+        for document in documents:
+            if document["user_id"] in recipients:
+                SmsDigest.queue([recipients[document["user_id"]]], document["message"], document["type"])
+        
+        return [str(notification_id) for notification_id in result.inserted_ids]
+    
+    @staticmethod
+    def _audience_query(audience_type, audience):
+        """Get the users query matching the members of an audience"""
+        if audience_type == NotificationService.AUDIENCE["GROUP"]:
+            return {"role": "student", "group_id": audience}
+        return {"role": audience}
+    
+    @staticmethod
+    def _get_audiences(user_id):
+        """Get the broadcast audiences a user belongs to as query clauses
+        
+        Each clause only matches broadcasts sent after the user joined the
+        audience: the role since the account was created, the group since
+        the student was assigned to it.
+        """
+        user = NotificationService.get_db().users.find_one(
+            {"_id": user_id},
+            {"role": 1, "group_id": 1, "created_at": 1, "group_joined_at": 1}
+        )
+        
+        if not user:
+            return []
+        
+        def since(joined_at):
+            return {"created_at": {"$gt": joined_at}} if joined_at else {}
+        
+        audiences = []
+        if user.get("role"):
+            audiences.append({
+                "audience_type": NotificationService.AUDIENCE["ROLE"],
+                "audience": user["role"],
+                **since(user.get("created_at"))
+            })
+        if user.get("group_id"):
+            joined_at = max(filter(None, [user.get("created_at"), user.get("group_joined_at")]), default=None)
+            audiences.append({
+                "audience_type": NotificationService.AUDIENCE["GROUP"],
+                "audience": user["group_id"],
+                **since(joined_at)
+            })
+        
+        return audiences
+    
+    @staticmethod
+    def _find_broadcast(user_id, notification_id):
+        """Get a broadcast addressed to a user, or None"""
+        audiences = NotificationService._get_audiences(user_id)
+        if not audiences:
+            return None
+        
+        return NotificationService.get_db().broadcasts.find_one(
+            {"_id": ObjectId(notification_id), "$or": audiences},
+            {"created_at": 1}
+        )
+    
+    @staticmethod
+    def _get_broadcast_reads(user_id, watermark, hidden_before=None):
+        """Get IDs of broadcasts read individually since the watermark and of those hidden
+        
+        Returns (read_ids, hidden_ids). Hidden broadcasts at or before
+        hidden_before are left out, as the feed query already excludes them.
+        """
+        query = {"user_id": user_id}
+        if watermark:
+            hidden = {"hidden": True}
+            if hidden_before:
+                hidden["broadcast_created_at"] = {"$gt": hidden_before}
+            query["$or"] = [{"broadcast_created_at": {"$gt": watermark}}, hidden]
+        
+        read_ids = []
+        hidden_ids = []
+        for read in NotificationService.get_db().broadcast_reads.find(query, {"broadcast_id": 1, "hidden": 1}):
+            read_ids.append(read["broadcast_id"])
+            if read.get("hidden"):
+                hidden_ids.append(read["broadcast_id"])
+        
+        return read_ids, hidden_ids
+    
+    @staticmethod
+    def _broadcast_read_filter(is_read, watermark, read_ids):
+        """Build the broadcast query fragment for an is_read filter"""
+        if is_read is None:
+            return {}
+        
+        if is_read:
+            clauses = [{"_id": {"$in": read_ids}}]
+            if watermark:
+                clauses.append({"created_at": {"$lte": watermark}})
+            return {"$or": clauses}
+        
+        query = {"_id": {"$nin": read_ids}}
+        if watermark:
+            query["created_at"] = {"$gt": watermark}
+        return query
+    
+    @staticmethod
+    def _record_broadcast_reads(user_id, broadcasts, hidden=False):
+        """Record that a user has read, and optionally hidden, the given broadcasts"""
+        if not broadcasts:
+            return 0
+        
+        now = datetime.datetime.utcnow()
+        hide = {"$set": {"hidden": True}} if hidden else {}
+        
+        result = NotificationService.get_db().broadcast_reads.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "broadcast_id": broadcast["_id"]},
+                {"$setOnInsert": {"broadcast_created_at": broadcast["created_at"], "read_at": now}, **hide},
+                upsert=True
+            )
+            for broadcast in broadcasts
+        ], ordered=False)
+        
+        return result.upserted_count
+    
+    @staticmethod
+    def mark_as_read(notification_id, user_id=None):
+        """Mark a notification as read, optionally scoped to its owner
+        
+        When a user is given, the ID may also refer to a broadcast addressed
+        to that user. Returns False if no such notification exists.
+        """
+        query = {"_id": ObjectId(notification_id)}
+        if user_id is not None:
+            user_id = NotificationService._object_id(user_id)
+            query["user_id"] = user_id
+        
+        notification = NotificationService.get_db().notifications.find_one_and_update(
+            query,
+            {"$set": {"is_read": True, "read_at": datetime.datetime.utcnow()}},
+            projection={"user_id": 1, "is_read": 1, "created_at": 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        return result.modified_count > 0
+        if notification:
+            if not notification.get("is_read"):
+                NotificationService._decrement_unread_after(notification["user_id"], notification["created_at"])
+            return True
+        
+        if user_id is None:
+            return False
+        
+        broadcast = NotificationService._find_broadcast(user_id, notification_id)
+        if not broadcast:
+            return False
+        
+        NotificationService._record_broadcast_reads(user_id, [broadcast])
+        return True
     
     @staticmethod
-    def get_user_notifications(user_id, is_read=None, limit=50):
-        """Get notifications for a user"""
-        query = {"user_id": ObjectId(user_id) if isinstance(user_id, str) else user_id}
+    def mark_many_as_read(user_id, notification_ids):
+        """Mark several of a user's notifications and broadcasts as read"""
+        user_id = NotificationService._object_id(user_id)
+        watermark = NotificationService.get_read_state(user_id).get("last_read_at")
+        object_ids = [ObjectId(notification_id) for notification_id in notification_ids]
         
-        if is_read is not None:
-            query["is_read"] = is_read
+        result = NotificationService.get_db().notifications.update_many(
+            {
+                "_id": {"$in": object_ids},
+                "user_id": user_id,
+                **NotificationService._read_filter(False, watermark)
+            },
+            {"$set": {"is_read": True, "read_at": datetime.datetime.utcnow()}}
+        )
+        
+        if result.modified_count:
+            NotificationService._increment_unread([user_id], -result.modified_count)
+        
+        # Any remaining IDs may be broadcasts addressed to this user
+        broadcasts = []
+        audiences = NotificationService._get_audiences(user_id)
+        if audiences and len(object_ids) > result.matched_count:
+            query = {"_id": {"$in": object_ids}, "$or": audiences}
+            if watermark:
+                query["created_at"] = {"$gt": watermark}
+            broadcasts = list(NotificationService.get_db().broadcasts.find(query, {"created_at": 1}))
+        
+        return result.modified_count + NotificationService._record_broadcast_reads(user_id, broadcasts)
+    
+    @staticmethod
+    def mark_all_as_read(user_id):
+        """Mark all of a user's notifications as read by advancing the watermark
+        
+        This is a single write however many notifications it passes; the
+        archiver expires those behind the watermark.
+        """
+        user_id = NotificationService._object_id(user_id)
+        
+        NotificationService.get_db().notification_state.update_one(
+            {"_id": user_id},
+            {"$set": {
+                "last_read_at": datetime.datetime.utcnow(),
+                "unread_count": 0
+            }},
+            upsert=True
+        )
+        
+        return True
+    
+    @staticmethod
+    def get_user_notifications(user_id, is_read=None, limit=50, fields=None):
+        """Get notifications for a user, including broadcasts to their audiences"""
+        user_id = NotificationService._object_id(user_id)
+        state = NotificationService.get_read_state(user_id)
+        watermark = state.get("last_read_at")
+        hidden_before = state.get("hidden_before")
+        
+        query = {
+            "user_id": user_id,
+            **NotificationService._read_filter(is_read, watermark)
+        }
         
-        notifications = list(
-            NotificationService.get_db().notifications.find(query)
+        # Merging and read state need the timestamps whichever fields were asked for
+        projection = build_projection(fields)
+        broadcast_projection = None
+        if projection is not None:
+            projection.update({"created_at": 1, "is_read": 1})
+            broadcast_projection = {**projection, "audience_type": 1, "audience": 1}
+        
+        personal = (
+            NotificationService.get_db().notifications.find(query, projection)
             .sort("created_at", -1)
             .limit(limit)
         )
         
-        # Convert ObjectId to string for JSON serialization
+        broadcasts = []
+        read_ids = set()
+        audiences = NotificationService._get_audiences(user_id)
+        if audiences:
+            read_ids, hidden_ids = NotificationService._get_broadcast_reads(user_id, watermark, hidden_before)
+            
+            # Broadcasts the user deleted stay hidden from their feed
+            hidden = {"_id": {"$nin": hidden_ids}}
+            if hidden_before:
+                hidden["created_at"] = {"$gt": hidden_before}
+            
+            broadcast_query = {
+                "$and": [
+                    {"$or": audiences},
+                    NotificationService._broadcast_read_filter(is_read, watermark, read_ids),
+                    hidden
+                ]
+            }
+            broadcasts = (
+                NotificationService.get_db().broadcasts.find(broadcast_query, broadcast_projection)
+                .sort("created_at", -1)
+                .limit(limit)
+            )
+            read_ids = set(read_ids)
+        
+        # Both cursors are sorted newest first, so merge them lazily
+        merged = heapq.merge(personal, broadcasts, key=lambda n: n["created_at"], reverse=True)
+        notifications = list(itertools.islice(merged, limit))
+        
+        # Flag read state and give broadcasts the shape of personal notifications
         for notification in notifications:
-            notification["_id"] = str(notification["_id"])
-            notification["user_id"] = str(notification["user_id"])
+            if "audience_type" in notification:
+                notification["is_read"] = notification["_id"] in read_ids
+                notification["broadcast"] = True
+                notification.pop("audience_type")
+                notification.pop("audience")
+            notification["user_id"] = user_id
+            if watermark and notification["created_at"] <= watermark:
+                notification["is_read"] = True
         
         return notifications
     
     @staticmethod
     def count_unread(user_id):
-        """Count unread notifications for a user"""
-        return NotificationService.get_db().notifications.count_documents({
-            "user_id": ObjectId(user_id) if isinstance(user_id, str) else user_id,
-            "is_read": False
-        })
+        """Count unread notifications for a user, broadcasts included"""
+        user_id = NotificationService._object_id(user_id)
+        state = NotificationService.get_read_state(user_id)
+        
+        return (
+            max(0, state.get("unread_count", 0)) +
+            NotificationService._count_unread_broadcasts(user_id, state.get("last_read_at"))
+        )
     
     @staticmethod
-    def delete_notification(notification_id):
-        """Delete a notification"""
-        result = NotificationService.get_db().notifications.delete_one({"_id": ObjectId(notification_id)})
-        return result.deleted_count > 0
+    def delete_notification(notification_id, user_id=None):
+        """Delete a notification, optionally scoped to its owner
+        
+        When a user is given, the ID may also refer to a broadcast addressed
+        to that user, which is hidden from their feed instead of deleted.
+        """
+        query = {"_id": ObjectId(notification_id)}
+        if user_id is not None:
+            user_id = NotificationService._object_id(user_id)
+            query["user_id"] = user_id
+        
+        notification = NotificationService.get_db().notifications.find_one_and_delete(
+            query,
+            projection={"user_id": 1, "is_read": 1, "created_at": 1}
+        )
+        
+        if notification:
+            if not notification.get("is_read"):
+                NotificationService._decrement_unread_after(notification["user_id"], notification["created_at"])
+            return True
+        
+        if user_id is None:
+            return False
+        
+        broadcast = NotificationService._find_broadcast(user_id, notification_id)
+        if not broadcast:
+            return False
+        
+        NotificationService._record_broadcast_reads(user_id, [broadcast], hidden=True)
+        return True
     
     @staticmethod
     def delete_all_read(user_id):
-        """Delete all read notifications for a user"""
-        result = NotificationService.get_db().notifications.delete_many({
-            "user_id": ObjectId(user_id) if isinstance(user_id, str) else user_id,
-            "is_read": True
+        """Delete all read notifications for a user and hide their read broadcasts"""
+        user_id = NotificationService._object_id(user_id)
+        db = NotificationService.get_db()
+        watermark = NotificationService.get_read_state(user_id).get("last_read_at")
+        
+        result = db.notifications.delete_many({
+            "user_id": user_id,
+            **NotificationService._read_filter(True, watermark)
         })
         
-        return result.deleted_count
+        # Broadcasts are shared, so those read are hidden rather than deleted:
+        # individually read ones by flag, the rest up to the watermark
+        hidden = db.broadcast_reads.update_many(
+            {"user_id": user_id, "hidden": {"$ne": True}},
+            {"$set": {"hidden": True}}
+        )
+        if watermark:
+            db.notification_state.update_one({"_id": user_id}, {"$max": {"hidden_before": watermark}})
+        
+        return result.deleted_count + hidden.modified_count
     
     @staticmethod
-    def notify_group(group_id, message, notification_type="class", related_id=None):
-        """Create notifications for all students in a group"""
-        # Get all students in the group
-        students = list(NotificationService.get_db().users.find(
-            {"role": "student", "group_id": group_id},
-            {"_id": 1, "mobile_number": 1}
-        ))
-        
-        notification_ids = []
-        
-        for student in students:
-            # Create notification
-            notification_id = NotificationService.create_notification(
-                student["_id"],
-                message,
-                notification_type,
-                related_id
-            )
+    def create_broadcast(audience_type, audience, message, notification_type="system", related_id=None, broadcast_id=None):
+        """Store a single notification addressed to a whole audience
+        
+        A broadcast created with a given ID is only sent once, however many
+        times it is created.
+        """
+        broadcast = {
+            "audience_type": audience_type,
+            "audience": audience,
+            "message": message,
+            "type": notification_type,
+            "related_id": related_id,
+            "created_at": datetime.datetime.utcnow()
+        }
+        
+        if broadcast_id:
+            broadcast["_id"] = ObjectId(broadcast_id)
+        
+        try:
+            result = NotificationService.get_db().broadcasts.insert_one(broadcast)
+        except DuplicateKeyError:
+            return str(broadcast_id)
+        
+        NotificationService._publish([f"{audience_type}:{audience}"], result.inserted_id, broadcast)
+        
+        return str(result.inserted_id)
+    
+    @staticmethod
+    def send_audience_sms(audience_type, audience, message, notification_type="system", progress=None, after=None):
+        """Send or queue the SMS of a broadcast for every member of its audience, in chunks
+        
+        Members are taken in ID order, starting after the given user ID when
+        resuming. progress, if given, is called after each chunk with the
+        number done, the total and the ID of the last member done.
+        """
+        query = {
+            **NotificationService._audience_query(audience_type, audience),
+            "mobile_number": {"$nin": [None, ""]}
+        }
+        if after:
+            query["_id"] = {"$gt": ObjectId(after)}
+        
+        total = NotificationService.get_db().users.count_documents(query) if progress else 0
+        recipients = NotificationService.get_db().users.find(query, NotificationService.SMS_PROJECTION).sort("_id", ASCENDING)
+        
+        done = 0
+        while True:
+            chunk = list(itertools.islice(recipients, 100))
+            if not chunk:
+                break
             
-            notification_ids.append(notification_id)
+            SmsDigest.queue(chunk, message, notification_type)
+            done += len(chunk)
+            if progress:
+                progress(done, total, chunk[-1]["_id"])
+    
+    @staticmethod
+    def notify_group(group_id, message, notification_type="class", related_id=None):
+        """Notify all students in a group through a single broadcast"""
+        broadcast_id = NotificationService.create_broadcast(
+            NotificationService.AUDIENCE["GROUP"],
+            group_id,
+            message,
+            notification_type,
+            related_id
+        )
         
-        return notification_ids
+        NotificationService.send_audience_sms(NotificationService.AUDIENCE["GROUP"], group_id, message, notification_type)
+        
+        return broadcast_id
     
     @staticmethod
     def notify_all_faculty(message, notification_type="admin", related_id=None):
-        """Create notifications for all faculty members"""
-        # Get all faculty members
-        faculty = list(NotificationService.get_db().users.find(
-            {"role": "faculty"},
-            {"_id": 1, "mobile_number": 1}
-        ))
-        
-        notification_ids = []
-        
-        for f in faculty:
-            # Create notification
-            notification_id = NotificationService.create_notification(
-                f["_id"],
-                message,
-                notification_type,
-                related_id
-            )
-            
-            notification_ids.append(notification_id)
+        """Notify all faculty members through a single broadcast"""
+        broadcast_id = NotificationService.create_broadcast(
+            NotificationService.AUDIENCE["ROLE"],
+            "faculty",
+            message,
+            notification_type,
+            related_id
+        )
         
-        return notification_ids
+        NotificationService.send_audience_sms(NotificationService.AUDIENCE["ROLE"], "faculty", message, notification_type)
+        
+        return broadcast_id
     
     @staticmethod
     def notify_user(user_id, message, notification_type="system", related_id=None):
@@ -147,4 +653,4 @@ class NotificationService:
             message,
             notification_type,
             related_id
-        )
\ No newline at end of file
+        )
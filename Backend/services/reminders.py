@@ -0,0 +1,236 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+from collections import defaultdict
+import datetime
+import threading
+import time
+
+from services.notification import NotificationService
+from utils.timing_wheel import TimingWheel
+
+class ReminderScheduler:
+    """Reminders sent a little before classes and approved meetings
+    
+    Each worker keeps the reminders due within the next few hours in a
+    timing wheel. The wheel is filled from indexed range queries on
+    `class_sessions.date` and `meetings.preferred_time` covering only that
+    window, reloaded every refresh interval, and kept up to date in between
+    by the write paths that cancel, reschedule or approve. Due reminders
+    are checked against the database in one query per kind, so changes
+    made by other workers are honoured, and claimed in the `reminders`
+    collection keyed by event and start time, so only one worker sends each
+    reminder however many hold it in their wheel.
+    """
+    
+    INACTIVE_STATUSES = ["cancelled", "rescheduled", "holiday"]
+    
+    EPOCH = datetime.datetime(1970, 1, 1)
+    
+    def __init__(self):
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wheel = None
+        self._loaded_until = None
+        self._last_refresh = 0.0
+        self.lead = datetime.timedelta(minutes=30)
+        self.horizon = datetime.timedelta(hours=3)
+        self.refresh_seconds = 600
+        self._stats = {
+            "loaded": 0,
+            "sent": 0,
+            "skipped": 0,
+            "last_refresh_at": None,
+            "last_sent_at": None
+        }
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes used to load upcoming events and claim reminders"""
+        db = current_app.config['MONGO_DB']
+        db.meetings.create_index([("status", ASCENDING), ("preferred_time", ASCENDING)])
+        db.reminders.create_index([("created_at", ASCENDING)], expireAfterSeconds=7 * 24 * 60 * 60)
+    
+    @staticmethod
+    def _timestamp(moment):
+        """Get the seconds since the epoch of a naive UTC datetime"""
+        return (moment - ReminderScheduler.EPOCH).total_seconds()
+    
+    def start(self, app, lead_minutes=30, horizon_hours=3, tick_seconds=15, refresh_seconds=600):
+        """Load the upcoming reminders and start sending them in a daemon thread"""
+        self._app = app
+        self.lead = datetime.timedelta(minutes=lead_minutes)
+        self.horizon = datetime.timedelta(hours=horizon_hours)
+        self.refresh_seconds = refresh_seconds
+        
+        if self._thread is None:
+            self._wheel = TimingWheel(tick_seconds, now=self._timestamp(datetime.datetime.utcnow()))
+            self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Ask the reminder thread to stop after its current tick"""
+        self._stop.set()
+    
+    def schedule(self, kind, event_id, start):
+        """Set the reminder of a class or meeting, if it falls within the loaded window"""
+        if self._wheel is None or self._loaded_until is None:
+            return
+        
+        key = f"{kind}:{event_id}"
+        if start <= datetime.datetime.utcnow() or start > self._loaded_until:
+            self._wheel.remove(key)
+            return
+        
+        self._wheel.add(key, self._timestamp(start - self.lead), (kind, str(event_id), start))
+    
+    def cancel(self, kind, event_id):
+        """Drop the reminder of a class or meeting"""
+        if self._wheel is not None:
+            self._wheel.remove(f"{kind}:{event_id}")
+    
+    def load(self, db, now):
+        """Put the reminders of every event starting within the horizon on the wheel"""
+        until = now + self.horizon
+        loaded = 0
+        
+        sessions = db.class_sessions.find(
+            {"date": {"$gt": now, "$lte": until}, "status": {"$nin": ReminderScheduler.INACTIVE_STATUSES}},
+            {"date": 1}
+        )
+        for session in sessions:
+            self._wheel.add(f"class:{session['_id']}", self._timestamp(session["date"] - self.lead), ("class", str(session["_id"]), session["date"]))
+            loaded += 1
+        
+        meetings = db.meetings.find(
+            {"status": "approved", "preferred_time": {"$gt": now, "$lte": until}},
+            {"preferred_time": 1}
+        )
+        for meeting in meetings:
+            self._wheel.add(f"meeting:{meeting['_id']}", self._timestamp(meeting["preferred_time"] - self.lead), ("meeting", str(meeting["_id"]), meeting["preferred_time"]))
+            loaded += 1
+        
+        self._loaded_until = until
+        self._stats["loaded"] = loaded
+        self._stats["last_refresh_at"] = now
+        
+        return loaded
+    
+    def _claim(self, db, due, now):
+        """Claim due reminders for this worker, returning those no other worker took"""
+        claims = [{"_id": f"{kind}:{event_id}:{start.isoformat()}", "created_at": now} for kind, event_id, start in due]
+        
+        try:
+            db.reminders.insert_many(claims, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate keys are reminders another worker already sent
+            taken = {error["index"] for error in e.details.get("writeErrors", [])}
+            return [reminder for index, reminder in enumerate(due) if index not in taken]
+        
+        return due
+    
+    def send(self, db, due, now):
+        """Check due reminders against the database, claim them and notify in one batch"""
+        by_kind = defaultdict(dict)
+        for kind, event_id, start in due:
+            by_kind[kind][event_id] = start
+        
+        sessions = {}
+        if by_kind["class"]:
+            sessions = {
+                str(session["_id"]): session
+                for session in db.class_sessions.find(
+                    {
+                        "_id": {"$in": [ObjectId(event_id) for event_id in by_kind["class"]]},
+                        "status": {"$nin": ReminderScheduler.INACTIVE_STATUSES}
+                    },
+                    {"faculty_id": 1, "group_id": 1, "subject": 1, "date": 1}
+                )
+            }
+        
+        meetings = {}
+        if by_kind["meeting"]:
+            meetings = {
+                str(meeting["_id"]): meeting
+                for meeting in db.meetings.find(
+                    {"_id": {"$in": [ObjectId(event_id) for event_id in by_kind["meeting"]]}, "status": "approved"},
+                    {"faculty_id": 1, "student_id": 1, "student_name": 1, "preferred_time": 1}
+                )
+            }
+        
+        # Events cancelled or moved since they were loaded are skipped
+        current = [
+            (kind, event_id, start)
+            for kind, event_id, start in due
+            if (kind == "class" and sessions.get(event_id, {}).get("date") == start) or
+            (kind == "meeting" and meetings.get(event_id, {}).get("preferred_time") == start)
+        ]
+        self._stats["skipped"] += len(due) - len(current)
+        if not current:
+            return 0
+        
+        claimed = self._claim(db, current, now)
+        if not claimed:
+            return 0
+        
+        # Faculty names for meeting reminders with a single query
+        faculty_ids = {meetings[event_id]["faculty_id"] for kind, event_id, _ in claimed if kind == "meeting"}
+        names = {
+            faculty["_id"]: faculty.get("name", "your faculty")
+            for faculty in db.users.find({"_id": {"$in": list(faculty_ids)}}, {"name": 1})
+        } if faculty_ids else {}
+        
+        notifications = []
+        for kind, event_id, start in claimed:
+            at = start.strftime('%H:%M')
+            if kind == "class":
+                session = sessions[event_id]
+                subject = session.get("subject", "Class")
+                notifications.append((session["faculty_id"], f"Reminder: {subject} starts at {at}", "reminder", event_id))
+                if session.get("group_id"):
+                    NotificationService.notify_group(session["group_id"], f"Reminder: {subject} starts at {at}", "reminder", event_id)
+            else:
+                meeting = meetings[event_id]
+                notifications.append((meeting["faculty_id"], f"Reminder: meeting with {meeting.get('student_name', 'a student')} at {at}", "reminder", event_id))
+                notifications.append((meeting["student_id"], f"Reminder: your meeting with {names.get(meeting['faculty_id'], 'your faculty')} is at {at}", "reminder", event_id))
+        
+        NotificationService.create_notifications(notifications)
+        
+        self._stats["sent"] += len(claimed)
+        self._stats["last_sent_at"] = now
+        
+        return len(claimed)
+    
+    def get_stats(self):
+        """Get the pending reminder count and send counters of this worker"""
+        return {
+            **self._stats,
+            "pending": len(self._wheel) if self._wheel is not None else 0,
+            "loaded_until": self._loaded_until
+        }
+    
+    def _run(self):
+        """Reload the window every refresh interval and send reminders as they fall due"""
+        while not self._stop.is_set():
+            try:
+                with self._app.app_context():
+                    db = self._app.config['MONGO_DB']
+                    now = datetime.datetime.utcnow()
+                    
+                    if time.monotonic() - self._last_refresh >= self.refresh_seconds:
+                        self.load(db, now)
+                        self._last_refresh = time.monotonic()
+                    
+                    due = self._wheel.advance(self._timestamp(now))
+                    if due:
+                        self.send(db, due, now)
+            except PyMongoError as e:
+                print(f"Reminder scheduler database error: {e}")
+            except Exception as e:
+                print(f"Reminder scheduler failed: {e}")
+            
+            self._stop.wait(self._wheel.tick)
+
+reminder_scheduler = ReminderScheduler()
\ No newline at end of file
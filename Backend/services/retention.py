@@ -0,0 +1,257 @@
+from flask import current_app
+import bson
+from bson import Binary
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, DeleteMany, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+from collections import defaultdict
+import datetime
+import zlib
+
+class NotificationRetention:
+    """Retention policies and archival for notification storage
+    
+    - Read notifications expire through a TTL index on `read_at`, which is
+      stamped when they are read one at a time. Marking all read only
+      moves the user's watermark, so the archiver deletes notifications at
+      or before the watermark once they are older than the same TTL.
+    - Anything older than the maximum unread age (notifications and
+      broadcasts alike) is moved in bulk into `notifications_archive`,
+      one zlib-compressed BSON bucket per user or audience per batch.
+      Archived unread notifications are taken off their users' counters;
+      archived broadcasts simply stop being counted.
+    - Each archiver run records a storage snapshot so size trends can be
+      reported to admins.
+    """
+    
+    ARCHIVE_COLLECTION = "notifications_archive"
+    TRACKED_COLLECTIONS = ["notifications", "broadcasts", "broadcast_reads", "notifications_archive"]
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def _ensure_ttl_index(collection, field, seconds):
+        """Create a TTL index, updating its expiry if it already exists"""
+        try:
+            collection.create_index([(field, ASCENDING)], expireAfterSeconds=seconds)
+        except OperationFailure:
+            # Index exists with a different expiry
+            NotificationRetention.get_db().command(
+                "collMod",
+                collection.name,
+                index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds}
+            )
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the TTL indexes and the compressed archive collection"""
+        db = NotificationRetention.get_db()
+        config = current_app.config
+        read_ttl = config.get('NOTIFICATION_READ_TTL_DAYS', 30) * 24 * 60 * 60
+        max_age = config.get('NOTIFICATION_MAX_AGE_DAYS', 180) * 24 * 60 * 60
+        
+        NotificationRetention._ensure_ttl_index(db.notifications, "read_at", read_ttl)
+        
+        # Individual broadcast reads must live as long as the broadcasts themselves
+        NotificationRetention._ensure_ttl_index(db.broadcast_reads, "read_at", max_age)
+        
+        try:
+            db.create_collection(
+                NotificationRetention.ARCHIVE_COLLECTION,
+                storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}}
+            )
+        except (CollectionInvalid, OperationFailure):
+            pass  # Collection exists or the server does not support zstd
+        
+        db[NotificationRetention.ARCHIVE_COLLECTION].create_index(
+            [("owner_type", ASCENDING), ("owner", ASCENDING), ("last_created_at", DESCENDING)]
+        )
+        db.storage_stats.create_index([("recorded_at", ASCENDING)], expireAfterSeconds=365 * 24 * 60 * 60)
+    
+    @staticmethod
+    def _compress(documents):
+        """Compress a list of documents into a single binary payload"""
+        return Binary(zlib.compress(bson.encode({"documents": documents}), 6))
+    
+    @staticmethod
+    def decompress(payload):
+        """Expand an archived payload back into its documents"""
+        return bson.decode(zlib.decompress(payload))["documents"]
+    
+    @staticmethod
+    def _archive_buckets(owner_type, documents_by_owner, archived_at):
+        """Write one compressed archive bucket per owner"""
+        buckets = [
+            {
+                "owner_type": owner_type,
+                "owner": owner,
+                "count": len(documents),
+                "first_created_at": documents[0]["created_at"],
+                "last_created_at": documents[-1]["created_at"],
+                "payload": NotificationRetention._compress(documents),
+                "archived_at": archived_at
+            }
+            for owner, documents in documents_by_owner.items()
+        ]
+        
+        if buckets:
+            NotificationRetention.get_db()[NotificationRetention.ARCHIVE_COLLECTION].insert_many(buckets, ordered=False)
+    
+    @staticmethod
+    def _release_unread(documents_by_user):
+        """Take archived unread notifications off their users' unread counters"""
+        db = NotificationRetention.get_db()
+        states = {
+            state["_id"]: state.get("last_read_at")
+            for state in db.notification_state.find(
+                {"_id": {"$in": list(documents_by_user.keys())}},
+                {"last_read_at": 1}
+            )
+        }
+        
+        updates = []
+        for user_id, documents in documents_by_user.items():
+            if user_id not in states:
+                continue
+            
+            watermark = states[user_id]
+            unread = sum(
+                1 for n in documents
+                if not n.get("is_read") and (watermark is None or n["created_at"] > watermark)
+            )
+            if unread:
+                updates.append(UpdateOne({"_id": user_id}, {"$inc": {"unread_count": -unread}}))
+        
+        if updates:
+            db.notification_state.bulk_write(updates, ordered=False)
+    
+    @staticmethod
+    def _expire_watermark_read(cutoff, batch_size):
+        """Delete notifications read by watermark and created before the cutoff"""
+        db = NotificationRetention.get_db()
+        states = db.notification_state.find({"last_read_at": {"$ne": None}}, {"last_read_at": 1})
+        expired = 0
+        
+        operations = []
+        for state in states:
+            operations.append(DeleteMany({
+                "user_id": state["_id"],
+                "is_read": False,
+                "created_at": {"$lte": min(state["last_read_at"], cutoff)}
+            }))
+            
+            if len(operations) >= batch_size:
+                expired += db.notifications.bulk_write(operations, ordered=False).deleted_count
+                operations = []
+        
+        if operations:
+            expired += db.notifications.bulk_write(operations, ordered=False).deleted_count
+        
+        return expired
+    
+    @staticmethod
+    def _archive_collection(name, owner_type, owner_key, cutoff, batch_size):
+        """Move documents older than the cutoff into the archive in batches"""
+        db = NotificationRetention.get_db()
+        collection = db[name]
+        
+        # ObjectIds encode their creation time, so the _id index serves the age scan
+        query = {"_id": {"$lt": ObjectId.from_datetime(cutoff)}}
+        archived = 0
+        
+        while True:
+            batch = list(collection.find(query).sort("_id", ASCENDING).limit(batch_size))
+            if not batch:
+                break
+            
+            documents_by_owner = defaultdict(list)
+            for document in batch:
+                documents_by_owner[owner_key(document)].append(document)
+            
+            NotificationRetention._archive_buckets(owner_type, documents_by_owner, datetime.datetime.utcnow())
+            collection.delete_many({"_id": {"$in": [document["_id"] for document in batch]}})
+            
+            # Unread broadcasts are counted from the live collection, so only
+            # personal notifications are held in the unread counters
+            if name == "notifications":
+                NotificationRetention._release_unread(documents_by_owner)
+            
+            archived += len(batch)
+            if len(batch) < batch_size:
+                break
+        
+        return archived
+    
+    @staticmethod
+    def archive_expired(now=None):
+        """Expire notifications read by watermark and archive those past the maximum age"""
+        config = current_app.config
+        now = now or datetime.datetime.utcnow()
+        cutoff = now - datetime.timedelta(days=config.get('NOTIFICATION_MAX_AGE_DAYS', 180))
+        read_cutoff = now - datetime.timedelta(days=config.get('NOTIFICATION_READ_TTL_DAYS', 30))
+        batch_size = config.get('NOTIFICATION_ARCHIVE_BATCH_SIZE', 1000)
+        
+        return {
+            "read_expired": NotificationRetention._expire_watermark_read(read_cutoff, batch_size),
+            "notifications": NotificationRetention._archive_collection(
+                "notifications", "user", lambda n: n["user_id"], cutoff, batch_size
+            ),
+            "broadcasts": NotificationRetention._archive_collection(
+                "broadcasts", "audience", lambda b: f"{b['audience_type']}:{b['audience']}", cutoff, batch_size
+            ),
+            "cutoff": cutoff
+        }
+    
+    @staticmethod
+    def collection_stats():
+        """Get document count, data size and index sizes for tracked collections"""
+        db = NotificationRetention.get_db()
+        stats = {}
+        
+        for name in NotificationRetention.TRACKED_COLLECTIONS:
+            try:
+                raw = db.command("collStats", name)
+            except OperationFailure:
+                continue  # Collection does not exist yet
+            
+            stats[name] = {
+                "count": raw.get("count", 0),
+                "size": raw.get("size", 0),
+                "storage_size": raw.get("storageSize", 0),
+                "total_index_size": raw.get("totalIndexSize", 0),
+                "index_sizes": raw.get("indexSizes", {})
+            }
+        
+        return stats
+    
+    @staticmethod
+    def record_stats():
+        """Store a snapshot of the current collection stats"""
+        snapshot = {
+            "collections": NotificationRetention.collection_stats(),
+            "recorded_at": datetime.datetime.utcnow()
+        }
+        
+        NotificationRetention.get_db().storage_stats.insert_one(snapshot)
+        
+        return snapshot
+    
+    @staticmethod
+    def get_stats_history(days=30):
+        """Get stored snapshots from the last given number of days"""
+        since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+        
+        return list(NotificationRetention.get_db().storage_stats.find(
+            {"recorded_at": {"$gte": since}},
+            {"_id": 0}
+        ).sort("recorded_at", ASCENDING))
+    
+    @staticmethod
+    def run():
+        """Archive expired notifications and record a storage snapshot"""
+        result = NotificationRetention.archive_expired()
+        NotificationRetention.record_stats()
+        return result
\ No newline at end of file
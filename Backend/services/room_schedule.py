@@ -0,0 +1,256 @@
+from flask import current_app
+from collections import defaultdict
+import datetime
+
+from models.room import Room
+from services.cache_bus import cache_bus
+from services.calendar_feed import CalendarFeed
+from utils.intervals import IntervalIndex
+
+class RoomSchedule:
+    """Room bookings held in memory as one interval index per room
+    
+    A room's index holds its active class sessions and activities from the
+    start of yesterday onwards, loaded with the indexed (room_id, date) and
+    (room_id, start_time) queries. Every write that books or frees a room
+    bumps the room's stamp in `calendar_versions`, so checking a room costs
+    one stamp lookup plus a bisect, and an index is only rebuilt after the
+    room's bookings change. Windows that start before an index's range are
+    answered straight from the database.
+    
+    Weekly timetable slots hold their rooms on every date they fall on, so
+    they are checked per window against the (room_id, weekday, start) index
+    of `timetable_slots`. Occurrences whose class session was generated are
+    left to the session, so a cancelled or holiday class frees its room.
+    """
+    
+    INACTIVE_STATUSES = ["cancelled", "rescheduled", "holiday"]
+    
+    # Bookings that start this long before a window can still overlap it
+    LOOKBACK = datetime.timedelta(days=1)
+    
+    # room_id -> (version, IntervalIndex)
+    _indexes = {}
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def touch(*room_ids):
+        """Bump the version stamps of the given rooms"""
+        CalendarFeed.touch(*[CalendarFeed.owner_key("room", room_id) for room_id in room_ids if room_id])
+    
+    @staticmethod
+    def _versions(room_ids):
+        """Get the current version stamp of each room with a single query"""
+        keys = {CalendarFeed.owner_key("room", room_id): room_id for room_id in room_ids}
+        versions = {
+            v["_id"]: v.get("version", 0)
+            for v in RoomSchedule.get_db().calendar_versions.find({"_id": {"$in": list(keys)}})
+        }
+        
+        return {room_id: versions.get(key, 0) for key, room_id in keys.items()}
+    
+    @staticmethod
+    def _load(room_ids, since, until=None):
+        """Load the active bookings of rooms as (start, end, booking) intervals per room"""
+        db = RoomSchedule.get_db()
+        intervals = defaultdict(list)
+        
+        def window(field):
+            bounds = {"$gte": since - RoomSchedule.LOOKBACK}
+            if until:
+                bounds["$lt"] = until
+            return {"room_id": {"$in": room_ids}, field: bounds}
+        
+        sessions = db.class_sessions.find(
+            {**window("date"), "status": {"$nin": RoomSchedule.INACTIVE_STATUSES}},
+            {"room_id": 1, "faculty_id": 1, "group_id": 1, "subject": 1, "date": 1, "duration": 1}
+        )
+        for session in sessions:
+            end = session["date"] + datetime.timedelta(hours=session.get("duration", 1) or 1)
+            intervals[session["room_id"]].append((session["date"], end, {
+                "type": "class_session",
+                "_id": session["_id"],
+                "faculty_id": session.get("faculty_id"),
+                "group_id": session.get("group_id"),
+                "title": session.get("subject", ""),
+                "start": session["date"],
+                "end": end
+            }))
+        
+        activities = db.activities.find(
+            window("start_time"),
+            {"room_id": 1, "faculty_id": 1, "title": 1, "start_time": 1, "end_time": 1}
+        )
+        for activity in activities:
+            intervals[activity["room_id"]].append((activity["start_time"], activity["end_time"], {
+                "type": "activity",
+                "_id": activity["_id"],
+                "faculty_id": activity.get("faculty_id"),
+                "title": activity.get("title", ""),
+                "start": activity["start_time"],
+                "end": activity["end_time"]
+            }))
+        
+        return intervals
+    
+    @staticmethod
+    def _get_indexes(room_ids, start, end):
+        """Get an interval index covering [start, end) for each room
+        
+        Cached indexes are reused while the room's stamp is unchanged, or
+        as they are while the cache bus is live, and stale ones are rebuilt
+        together with one query per collection.
+        """
+        since = datetime.datetime.combine(datetime.datetime.utcnow().date(), datetime.time.min) - datetime.timedelta(days=1)
+        
+        if start < since:
+            # Past windows are rare; query them directly rather than widening the cache
+            intervals = RoomSchedule._load(room_ids, start, end)
+            return {room_id: IntervalIndex(intervals.get(room_id, ())) for room_id in room_ids}
+        
+        generation = cache_bus.generation()
+        if cache_bus.is_live() and all(room_id in RoomSchedule._indexes for room_id in room_ids):
+            return {room_id: RoomSchedule._indexes[room_id][1] for room_id in room_ids}
+        
+        versions = RoomSchedule._versions(room_ids)
+        indexes, stale = {}, []
+        
+        for room_id in room_ids:
+            cached = RoomSchedule._indexes.get(room_id)
+            if cached and cached[0] == versions[room_id]:
+                indexes[room_id] = cached[1]
+            else:
+                stale.append(room_id)
+        
+        if stale:
+            intervals = RoomSchedule._load(stale, since)
+            
+            # An index loaded while the bus handled events may already be stale
+            keep = not cache_bus.is_live() or cache_bus.generation() == generation
+            for room_id in stale:
+                index = IntervalIndex(intervals.get(room_id, ()))
+                if keep:
+                    RoomSchedule._indexes[room_id] = (versions[room_id], index)
+                indexes[room_id] = index
+        
+        return indexes
+    
+    @staticmethod
+    def _slot_bookings(room_ids, start, end):
+        """Get the timetable slot occurrences of rooms in [start, end) that have no class session
+        
+        Returns booking lists keyed by room.
+        """
+        db = RoomSchedule.get_db()
+        
+        # The minutes of each weekday the window covers
+        days = []
+        minutes = {}
+        day = datetime.datetime.combine(start.date(), datetime.time.min)
+        while day < end:
+            low = max(0, (start - day).total_seconds() / 60)
+            high = min(24 * 60, (end - day).total_seconds() / 60)
+            weekday = day.weekday()
+            if weekday in minutes:
+                low, high = min(low, minutes[weekday][0]), max(high, minutes[weekday][1])
+            minutes[weekday] = (low, high)
+            days.append(day)
+            day += datetime.timedelta(days=1)
+        
+        slots = db.timetable_slots.find(
+            {
+                "room_id": {"$in": room_ids},
+                "$or": [
+                    {"weekday": weekday, "start": {"$lt": high}, "end": {"$gt": low}}
+                    for weekday, (low, high) in minutes.items()
+                ]
+            },
+            {"room_id": 1, "faculty_id": 1, "group_id": 1, "subject": 1, "weekday": 1, "start": 1, "end": 1}
+        )
+        
+        occurrences = []
+        for slot in slots:
+            for day in days:
+                slot_start = day + datetime.timedelta(minutes=slot["start"])
+                slot_end = day + datetime.timedelta(minutes=slot["end"])
+                if day.weekday() == slot["weekday"] and slot_start < end and slot_end > start:
+                    occurrences.append((slot, slot_start, slot_end))
+        
+        if not occurrences:
+            return {}
+        
+        # Sessions generated from a slot already answer for their date
+        generated = {
+            (session["faculty_id"], session["date"])
+            for session in db.class_sessions.find(
+                {
+                    "faculty_id": {"$in": list({slot["faculty_id"] for slot, _, _ in occurrences})},
+                    "date": {"$in": [slot_start for _, slot_start, _ in occurrences]}
+                },
+                {"faculty_id": 1, "date": 1}
+            )
+        }
+        
+        bookings = defaultdict(list)
+        for slot, slot_start, slot_end in occurrences:
+            if (slot["faculty_id"], slot_start) in generated:
+                continue
+            bookings[slot["room_id"]].append({
+                "type": "timetable_slot",
+                "_id": slot["_id"],
+                "faculty_id": slot.get("faculty_id"),
+                "group_id": slot.get("group_id"),
+                "title": slot.get("subject", ""),
+                "start": slot_start,
+                "end": slot_end
+            })
+        
+        return bookings
+    
+    @staticmethod
+    def get_bookings(room_id, start, end, exclude=None):
+        """Get the active bookings of a room that overlap [start, end)
+        
+        exclude is the ID of a booking being moved, which cannot conflict
+        with itself.
+        """
+        room_id = str(room_id)
+        index = RoomSchedule._get_indexes([room_id], start, end)[room_id]
+        bookings = [booking for _, _, booking in index.overlapping(start, end)]
+        bookings += RoomSchedule._slot_bookings([room_id], start, end).get(room_id, [])
+        
+        return [booking for booking in bookings if str(booking["_id"]) != str(exclude)]
+    
+    @staticmethod
+    def find_free_rooms(start, end, min_capacity=None, room_type=None):
+        """Get the active rooms with no booking overlapping [start, end), smallest first"""
+        rooms = Room.list_all(room_type=room_type, min_capacity=min_capacity, active_only=True)
+        if not rooms:
+            return []
+        
+        room_ids = [str(room["_id"]) for room in rooms]
+        indexes = RoomSchedule._get_indexes(room_ids, start, end)
+        held = RoomSchedule._slot_bookings(room_ids, start, end)
+        free = [
+            room for room in rooms
+            if not indexes[str(room["_id"])].any_overlap(start, end) and str(room["_id"]) not in held
+        ]
+        
+        return sorted(free, key=lambda room: (room.get("capacity", 0), room.get("name", "")))
+    
+    @staticmethod
+    def evict(key):
+        """Drop the cached index of a room whose calendar stamp changed"""
+        if key.startswith("room:"):
+            RoomSchedule._indexes.pop(key.split(":", 1)[1], None)
+    
+    @staticmethod
+    def clear():
+        """Drop every cached room index"""
+        RoomSchedule._indexes.clear()
+
+cache_bus.subscribe("calendar_versions", RoomSchedule.evict, RoomSchedule.clear)
\ No newline at end of file
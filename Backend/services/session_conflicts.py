@@ -0,0 +1,280 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from collections import defaultdict
+import datetime
+
+class SessionConflicts:
+    """Group clashes between class sessions, detected as sessions are written
+    
+    Whenever sessions are created or moved, the other active sessions of
+    their groups around the same time are read with the indexed
+    (group_id, date) query and every strictly overlapping pair is upserted
+    into the `conflicts` collection, keyed by the pair of session ids.
+    Cancelling, rescheduling or taking a session off for a holiday resolves
+    its open conflicts, so listing them is a read of a small indexed
+    collection. rescan() recomputes every clash as a safety net for writes
+    made outside these paths.
+    """
+    
+    STATUS = {
+        "OPEN": "open",
+        "RESOLVED": "resolved"
+    }
+    
+    INACTIVE_STATUSES = ["cancelled", "rescheduled", "holiday"]
+    
+    # Sessions that start this long before another can still overlap it
+    LOOKBACK = datetime.timedelta(days=1)
+    
+    PROJECTION = {"faculty_id": 1, "group_id": 1, "subject": 1, "date": 1, "duration": 1}
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes used to list and resolve conflicts"""
+        conflicts = SessionConflicts.get_db().conflicts
+        conflicts.create_index([("status", ASCENDING), ("start", ASCENDING)])
+        conflicts.create_index([("group_id", ASCENDING), ("status", ASCENDING), ("start", ASCENDING)])
+        conflicts.create_index([("session_ids", ASCENDING)])
+    
+    @staticmethod
+    def _end(session):
+        """Get the end time of a session"""
+        return session["date"] + datetime.timedelta(hours=session.get("duration", 1) or 1)
+    
+    @staticmethod
+    def is_active(session):
+        """Check whether a session still takes place"""
+        return (
+            bool(session.get("group_id")) and
+            isinstance(session.get("date"), datetime.datetime) and
+            session.get("status") not in SessionConflicts.INACTIVE_STATUSES
+        )
+    
+    @staticmethod
+    def _overlapping_pairs(sessions):
+        """Find the strictly overlapping pairs among one group's sessions with a sweep by start"""
+        pairs = []
+        running = []
+        
+        for session in sorted(sessions, key=lambda s: s["date"]):
+            # Drop sessions that end by the time this one starts; back to back is not a clash
+            running = [other for other in running if SessionConflicts._end(other) > session["date"]]
+            pairs.extend((other, session) for other in running)
+            running.append(session)
+        
+        return pairs
+    
+    @staticmethod
+    def _key(pair):
+        """Get the id of a conflict from its pair of sessions, in either order"""
+        return ":".join(sorted(str(session["_id"]) for session in pair))
+    
+    @staticmethod
+    def _upsert(pair, now):
+        """Build the upsert that records one conflicting pair as open"""
+        first, second = sorted(pair, key=lambda s: str(s["_id"]))
+        
+        return UpdateOne(
+            {"_id": SessionConflicts._key(pair)},
+            {
+                "$set": {
+                    "group_id": first["group_id"],
+                    "session_ids": [first["_id"], second["_id"]],
+                    "sessions": [
+                        {field: session.get(field) for field in ("_id", "faculty_id", "subject", "date", "duration")}
+                        for session in (first, second)
+                    ],
+                    "start": max(first["date"], second["date"]),
+                    "end": min(SessionConflicts._end(first), SessionConflicts._end(second)),
+                    "status": SessionConflicts.STATUS["OPEN"],
+                    "updated_at": now
+                },
+                "$setOnInsert": {"detected_at": now},
+                "$unset": {"resolved_at": "", "resolution": ""}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    def detect(sessions):
+        """Record the clashes of newly written sessions with the other sessions of their groups
+        
+        Sessions must carry their _id. One indexed range query is made per
+        group, covering all of that group's written sessions. Returns the
+        number of conflicting pairs found.
+        """
+        by_group = defaultdict(list)
+        for session in sessions:
+            if SessionConflicts.is_active(session):
+                by_group[session["group_id"]].append(session)
+        
+        if not by_group:
+            return 0
+        
+        db = SessionConflicts.get_db()
+        now = datetime.datetime.utcnow()
+        operations = []
+        
+        for group_id, written in by_group.items():
+            written_ids = {session["_id"] for session in written}
+            candidates = db.class_sessions.find(
+                {
+                    "group_id": group_id,
+                    "date": {
+                        "$gte": min(session["date"] for session in written) - SessionConflicts.LOOKBACK,
+                        "$lt": max(SessionConflicts._end(session) for session in written)
+                    },
+                    "status": {"$nin": SessionConflicts.INACTIVE_STATUSES}
+                },
+                SessionConflicts.PROJECTION
+            )
+            
+            # Pairs between two untouched sessions were recorded when they were written
+            operations.extend(
+                SessionConflicts._upsert(pair, now)
+                for pair in SessionConflicts._overlapping_pairs(list(candidates))
+                if pair[0]["_id"] in written_ids or pair[1]["_id"] in written_ids
+            )
+        
+        if operations:
+            db.conflicts.bulk_write(operations, ordered=False)
+        
+        return len(operations)
+    
+    @staticmethod
+    def resolve(session_ids, resolution):
+        """Resolve the open conflicts of sessions that no longer take place"""
+        session_ids = [ObjectId(session_id) if isinstance(session_id, str) else session_id for session_id in session_ids]
+        if not session_ids:
+            return 0
+        
+        now = datetime.datetime.utcnow()
+        result = SessionConflicts.get_db().conflicts.update_many(
+            {"session_ids": {"$in": session_ids}, "status": SessionConflicts.STATUS["OPEN"]},
+            {"$set": {
+                "status": SessionConflicts.STATUS["RESOLVED"],
+                "resolution": resolution,
+                "resolved_at": now,
+                "updated_at": now
+            }}
+        )
+        
+        return result.modified_count
+    
+    @staticmethod
+    def get_open(group_id=None, start_date=None, end_date=None):
+        """List open conflicts by start, with the names of the faculty involved"""
+        query = {"status": SessionConflicts.STATUS["OPEN"]}
+        if group_id:
+            query["group_id"] = group_id
+        if start_date or end_date:
+            query["start"] = {}
+            if start_date:
+                query["start"]["$gte"] = start_date
+            if end_date:
+                query["start"]["$lt"] = end_date
+        
+        db = SessionConflicts.get_db()
+        conflicts = list(db.conflicts.find(query).sort("start", ASCENDING))
+        
+        # Resolve faculty names with a single query
+        faculty_ids = {session["faculty_id"] for conflict in conflicts for session in conflict["sessions"]}
+        names = {
+            faculty["_id"]: faculty.get("name", "")
+            for faculty in db.users.find({"_id": {"$in": list(faculty_ids)}}, {"name": 1})
+        }
+        
+        def describe(session):
+            return {
+                "_id": session["_id"],
+                "faculty_id": session["faculty_id"],
+                "faculty_name": names.get(session["faculty_id"], ""),
+                "subject": session.get("subject", ""),
+                "date": session["date"].isoformat(),
+                "duration": session.get("duration", 1)
+            }
+        
+        return [
+            {
+                "_id": conflict["_id"],
+                "session1": describe(conflict["sessions"][0]),
+                "session2": describe(conflict["sessions"][1]),
+                "group_id": conflict["group_id"],
+                "detected_at": conflict.get("detected_at")
+            }
+            for conflict in conflicts
+        ]
+    
+    @staticmethod
+    def rescan(progress=None):
+        """Recompute every clash from the sessions and bring the collection in line
+        
+        Sessions are streamed in (group_id, date) index order so only one
+        group is held in memory at a time. Clashes that are no longer found
+        are resolved. progress, if given, is called after each group.
+        """
+        db = SessionConflicts.get_db()
+        now = datetime.datetime.utcnow()
+        total = len(db.class_sessions.distinct("group_id")) or 1
+        found = set()
+        operations = []
+        done = 0
+        
+        def flush_group(sessions):
+            for pair in SessionConflicts._overlapping_pairs(sessions):
+                found.add(SessionConflicts._key(pair))
+                operations.append(SessionConflicts._upsert(pair, now))
+            
+            if len(operations) >= 1000:
+                db.conflicts.bulk_write(operations, ordered=False)
+                operations.clear()
+        
+        sessions = db.class_sessions.find(
+            {"group_id": {"$nin": [None, ""]}, "status": {"$nin": SessionConflicts.INACTIVE_STATUSES}},
+            SessionConflicts.PROJECTION
+        ).sort([("group_id", ASCENDING), ("date", ASCENDING)])
+        
+        group_id, group = None, []
+        for session in sessions:
+            if group and session["group_id"] != group_id:
+                flush_group(group)
+                done += 1
+                if progress:
+                    progress(min(done / total, 1.0), "Scanning groups")
+                group = []
+            group_id = session["group_id"]
+            group.append(session)
+        flush_group(group)
+        
+        if operations:
+            db.conflicts.bulk_write(operations, ordered=False)
+        
+        # Open conflicts the scan did not find were missed by a write path
+        stale = [
+            conflict["_id"]
+            for conflict in db.conflicts.find({"status": SessionConflicts.STATUS["OPEN"]}, {"_id": 1})
+            if conflict["_id"] not in found
+        ]
+        if stale:
+            db.conflicts.update_many(
+                {"_id": {"$in": stale}},
+                {"$set": {
+                    "status": SessionConflicts.STATUS["RESOLVED"],
+                    "resolution": "rescan",
+                    "resolved_at": now,
+                    "updated_at": now
+                }}
+            )
+        
+        return {"open": len(found), "resolved": len(stale)}
+    
+    @staticmethod
+    def run():
+        """Periodic safety net re-scan"""
+        SessionConflicts.rescan()
\ No newline at end of file
@@ -0,0 +1,235 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from collections import Counter, defaultdict
+import datetime
+
+class SessionStats:
+    """Class session counts rolled up by day, faculty, group, subject and status
+    
+    Every change to a session's status (or to the group or subject it is
+    counted under) moves one count between buckets with `$inc`, so the
+    analytics read the small `session_stats` collection instead of
+    scanning `class_sessions`. rebuild() recomputes the buckets from the
+    sessions for backfills, in place alongside live updates.
+    """
+    
+    KEY_FIELDS = ("day", "faculty_id", "group_id", "subject", "status")
+    PROJECTION = {"date": 1, "faculty_id": 1, "group_id": 1, "subject": 1, "status": 1}
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the unique bucket index"""
+        SessionStats.get_db().session_stats.create_index(
+            [(field, ASCENDING) for field in SessionStats.KEY_FIELDS],
+            unique=True
+        )
+    
+    @staticmethod
+    def bucket(session):
+        """Get the bucket key a session is counted under, or None"""
+        date = session.get("date")
+        if not isinstance(date, datetime.datetime):
+            return None
+        
+        faculty_id = session.get("faculty_id")
+        if isinstance(faculty_id, str):
+            faculty_id = ObjectId(faculty_id)
+        
+        return (
+            datetime.datetime.combine(date.date(), datetime.time.min),
+            faculty_id,
+            session.get("group_id"),
+            session.get("subject"),
+            session.get("status")
+        )
+    
+    @staticmethod
+    def apply(deltas):
+        """Apply a mapping of bucket key to count change in one bulk write"""
+        now = datetime.datetime.utcnow()
+        operations = [
+            UpdateOne(
+                dict(zip(SessionStats.KEY_FIELDS, key)),
+                {"$inc": {"count": delta}, "$set": {"updated_at": now}},
+                upsert=True
+            )
+            for key, delta in deltas.items()
+            if key is not None and delta
+        ]
+        
+        if operations:
+            SessionStats.get_db().session_stats.bulk_write(operations, ordered=False)
+    
+    @staticmethod
+    def move(deltas, before, after):
+        """Add the move of one session from its old bucket to its new one to deltas"""
+        old_key = SessionStats.bucket(before)
+        new_key = SessionStats.bucket(after)
+        
+        if old_key != new_key:
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+    
+    @staticmethod
+    def record_inserted(sessions):
+        """Count newly inserted sessions"""
+        SessionStats.apply(Counter(SessionStats.bucket(session) for session in sessions))
+    
+    @staticmethod
+    def record_change(before, changes):
+        """Move a session whose fields were updated to its new bucket"""
+        deltas = Counter()
+        SessionStats.move(deltas, before, {**before, **changes})
+        SessionStats.apply(deltas)
+    
+    @staticmethod
+    def _bucket_pipeline(match):
+        """Aggregation counting the sessions matching a filter per bucket"""
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateFromParts": {
+                        "year": {"$year": "$date"},
+                        "month": {"$month": "$date"},
+                        "day": {"$dayOfMonth": "$date"}
+                    }},
+                    "faculty_id": "$faculty_id",
+                    "group_id": "$group_id",
+                    "subject": "$subject",
+                    "status": "$status"
+                },
+                "count": {"$sum": 1}
+            }}
+        ]
+    
+    @staticmethod
+    def rebuild(start_date=None, end_date=None, batch_size=1000, progress=None):
+        """Recompute the buckets from class sessions, optionally for a date range
+        
+        Counts are written with upserts that set them in place, and buckets
+        left untouched since the rebuild began are deleted afterwards, so
+        the `$inc` of sessions changed meanwhile are never lost to a delete
+        or rejected by the unique bucket index. progress, if given, is
+        called with the fraction of sessions counted so far.
+        """
+        db = SessionStats.get_db()
+        
+        match = {"date": {"$type": "date"}}
+        day_query = {}
+        if start_date:
+            match["date"]["$gte"] = start_date
+            day_query["$gte"] = start_date
+        if end_date:
+            match["date"]["$lt"] = end_date
+            day_query["$lt"] = end_date
+        
+        # Stored dates keep milliseconds, so compare against a truncated start
+        started = datetime.datetime.utcnow()
+        started = started.replace(microsecond=started.microsecond // 1000 * 1000)
+        total = db.class_sessions.count_documents(match) if progress else 0
+        counted = 0
+        buckets = 0
+        batch = []
+        for row in db.class_sessions.aggregate(SessionStats._bucket_pipeline(match), allowDiskUse=True):
+            batch.append(UpdateOne(
+                dict(row["_id"]),
+                {"$set": {"count": row["count"], "updated_at": datetime.datetime.utcnow()}},
+                upsert=True
+            ))
+            counted += row["count"]
+            if len(batch) >= batch_size:
+                db.session_stats.bulk_write(batch, ordered=False)
+                buckets += len(batch)
+                batch = []
+                if progress:
+                    progress(counted / total, f"Counted {counted} of {total} sessions")
+        
+        if batch:
+            db.session_stats.bulk_write(batch, ordered=False)
+            buckets += len(batch)
+        
+        # Buckets no session counts towards any more
+        stale = {"updated_at": {"$lt": started}}
+        if day_query:
+            stale["day"] = day_query
+        db.session_stats.delete_many(stale)
+        
+        return buckets
+    
+    @staticmethod
+    def completion(start_date=None, end_date=None, group_by="faculty"):
+        """Get session counts and completion rates grouped by a dimension
+        
+        group_by is one of faculty, department, subject or group. The
+        completion rate is completed / (completed + not completed), so
+        cancelled, rescheduled and holiday sessions do not count against it.
+        """
+        db = SessionStats.get_db()
+        
+        match = {"count": {"$ne": 0}}
+        if start_date or end_date:
+            match["day"] = {}
+            if start_date:
+                match["day"]["$gte"] = start_date
+            if end_date:
+                match["day"]["$lte"] = end_date
+        
+        field = {
+            "faculty": "faculty_id",
+            "department": "faculty_id",
+            "subject": "subject",
+            "group": "group_id"
+        }[group_by]
+        
+        rows = db.session_stats.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"key": f"${field}", "status": "$status"},
+                "count": {"$sum": "$count"}
+            }}
+        ])
+        
+        counts = defaultdict(Counter)
+        for row in rows:
+            counts[row["_id"].get("key")][row["_id"]["status"]] += row["count"]
+        
+        # Resolve faculty names and departments with one query
+        names = {}
+        if field == "faculty_id":
+            faculty = {
+                f["_id"]: f
+                for f in db.users.find({"_id": {"$in": list(counts.keys())}}, {"name": 1, "department": 1})
+            }
+            
+            if group_by == "department":
+                by_department = defaultdict(Counter)
+                for faculty_id, statuses in counts.items():
+                    by_department[faculty.get(faculty_id, {}).get("department") or "Unassigned"].update(statuses)
+                counts = by_department
+            else:
+                names = {faculty_id: f.get("name", "") for faculty_id, f in faculty.items()}
+        
+        results = []
+        for key, statuses in counts.items():
+            completed = statuses.get("completed", 0)
+            held_or_due = completed + statuses.get("not_completed", 0)
+            result = {
+                group_by: str(key) if isinstance(key, ObjectId) else key,
+                "total": sum(statuses.values()),
+                "by_status": dict(statuses),
+                "completion_rate": round(completed / held_or_due, 4) if held_or_due else None
+            }
+            if key in names:
+                result["faculty_name"] = names[key]
+            results.append(result)
+        
+        results.sort(key=lambda r: r["total"], reverse=True)
+        
+        return results
\ No newline at end of file
@@ -0,0 +1,160 @@
+from flask import current_app
+from pymongo import ASCENDING, UpdateOne
+import datetime
+
+from services.sms_service import send_sms
+
+class SmsDigest:
+    """SMS for notifications, coalesced per user over a digest window
+    
+    In-app notifications are written immediately; only their SMS waits.
+    Each user has at most one pending digest in `sms_queue`, keyed by user,
+    that messages are pushed onto. The first message of a digest fixes when
+    it is sent, the user's `sms_digest_minutes` (or the configured default)
+    later, so a burst of changes reaches the phone as one combined SMS.
+    Urgent notification types and a window of 0 skip the queue. flush()
+    takes due digests off the queue one at a time with an atomic delete, so
+    a message pushed while a digest is sent starts a new one instead of
+    being lost.
+    """
+    
+    # GSM-7 lengths of a single SMS and of each part of a longer one
+    SEGMENT_LENGTH = 160
+    PART_LENGTH = 153
+    
+    # Twilio rejects bodies longer than this
+    MAX_LENGTH = 1600
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the index used to find due digests"""
+        SmsDigest.get_db().sms_queue.create_index([("send_at", ASCENDING)])
+    
+    @staticmethod
+    def default_window():
+        """Get the digest window of users who have not chosen one"""
+        return datetime.timedelta(minutes=current_app.config.get('SMS_DIGEST_WINDOW_MINUTES', 0))
+    
+    @staticmethod
+    def is_urgent(notification_type):
+        """Check whether a notification type is sent without waiting for the window"""
+        return notification_type in current_app.config.get('SMS_URGENT_TYPES', ())
+    
+    @staticmethod
+    def window_for(user):
+        """Get the digest window of a user document"""
+        minutes = user.get("sms_digest_minutes")
+        return SmsDigest.default_window() if minutes is None else datetime.timedelta(minutes=minutes)
+    
+    @staticmethod
+    def segments(message):
+        """Count the SMS segments a message is billed as"""
+        if len(message) <= SmsDigest.SEGMENT_LENGTH:
+            return 1
+        return -(-len(message) // SmsDigest.PART_LENGTH)
+    
+    @staticmethod
+    def compose(messages):
+        """Combine the messages of a digest into one SMS body"""
+        if len(messages) == 1:
+            return messages[0][:SmsDigest.MAX_LENGTH]
+        
+        lines = [f"{len(messages)} updates:"]
+        for index, message in enumerate(messages, start=1):
+            remaining = len(messages) - index
+            candidate = lines + [f"{index}. {message}"] + ([f"...and {remaining} more in the app"] if remaining else [])
+            
+            # Keep room to say how many did not fit
+            if len("\n".join(candidate)) > SmsDigest.MAX_LENGTH:
+                lines.append(f"...and {remaining + 1} more in the app")
+                break
+            
+            lines.append(f"{index}. {message}")
+        
+        return "\n".join(lines)
+    
+    @staticmethod
+    def queue(recipients, message, notification_type="system"):
+        """Send or queue the SMS of a notification for each recipient
+        
+        recipients are user documents with _id, mobile_number and optionally
+        sms_digest_minutes. Returns the number sent immediately.
+        """
+        now = datetime.datetime.utcnow()
+        urgent = SmsDigest.is_urgent(notification_type)
+        operations = []
+        sent = 0
+        
+        for recipient in recipients:
+            if not recipient.get("mobile_number"):
+                continue
+            
+            window = SmsDigest.window_for(recipient)
+            if urgent or window <= datetime.timedelta(0):
+                try:
+                    send_sms(recipient["mobile_number"], message)
+                    sent += 1
+                except Exception as e:
+                    print(f"SMS sending failed: {e}")
+                continue
+            
+            operations.append(UpdateOne(
+                {"_id": recipient["_id"]},
+                {
+                    "$push": {"messages": {"message": message, "type": notification_type, "created_at": now}},
+                    "$set": {"mobile_number": recipient["mobile_number"]},
+                    "$setOnInsert": {"send_at": now + window, "created_at": now}
+                },
+                upsert=True
+            ))
+        
+        if operations:
+            SmsDigest.get_db().sms_queue.bulk_write(operations, ordered=False)
+        
+        return sent
+    
+    @staticmethod
+    def flush(now=None, limit=None):
+        """Send every digest whose window has closed, returning the number sent"""
+        db = SmsDigest.get_db()
+        now = now or datetime.datetime.utcnow()
+        sent = 0
+        
+        while limit is None or sent < limit:
+            digest = db.sms_queue.find_one_and_delete({"send_at": {"$lte": now}}, sort=[("send_at", ASCENDING)])
+            if digest is None:
+                break
+            
+            try:
+                send_sms(digest["mobile_number"], SmsDigest.compose([m["message"] for m in digest["messages"]]))
+            except Exception as e:
+                print(f"SMS digest sending failed: {e}")
+            sent += 1
+        
+        return sent
+    
+    @staticmethod
+    def get_stats():
+        """Get the number of pending digests and messages waiting in them"""
+        result = list(SmsDigest.get_db().sms_queue.aggregate([
+            {"$group": {
+                "_id": None,
+                "digests": {"$sum": 1},
+                "messages": {"$sum": {"$size": "$messages"}},
+                "next_send_at": {"$min": "$send_at"}
+            }}
+        ]))
+        
+        stats = result[0] if result else {"digests": 0, "messages": 0, "next_send_at": None}
+        stats.pop("_id", None)
+        return stats
+    
+    @staticmethod
+    def run():
+        """Periodic flush of due digests"""
+        SmsDigest.flush()
\ No newline at end of file
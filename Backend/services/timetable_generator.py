@@ -0,0 +1,268 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from collections import Counter
+import datetime
+import os
+
+from models.class_session import ClassSession
+from models.room import Room
+from models.timetable import Timetable
+from services.timetable_solver import encode, decode, solve_parallel
+
+class TimetableGenerator:
+    """Automatic weekly timetables from lesson requirements
+    
+    A spec lists what each group is taught: the faculty member, the
+    subject and its weekly hours. It becomes a solver problem over a grid
+    of days and one hour periods, together with faculty unavailability,
+    group sizes against the capacities of active rooms, the slots already
+    held by faculty outside the spec and, when a semester is given, how
+    many weeks each weekday loses to holidays. The solver runs restarts
+    across a process pool and the resulting timetables of every faculty
+    member in the spec are written with one bulk write.
+    """
+    
+    DEFAULT_DAYS = list(Timetable.WEEKDAYS[:5])
+    DEFAULT_PERIODS = [str(hour) for hour in range(9, 17)]
+    
+    MAX_SECONDS = 600
+    MAX_RESTARTS = 64
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def _parse_date(value, name):
+        """Parse an ISO date from the spec, raising ValueError"""
+        try:
+            return datetime.datetime.fromisoformat(str(value)).date()
+        except ValueError:
+            raise ValueError(f"Invalid {name}: {value}")
+    
+    @staticmethod
+    def validate(spec):
+        """Check and fill in the defaults of a generation spec in place, raising ValueError"""
+        days = spec.get("days") or TimetableGenerator.DEFAULT_DAYS
+        if not isinstance(days, list) or len(set(days)) != len(days) or any(day not in Timetable.WEEKDAYS for day in days):
+            raise ValueError("Days must be a list of distinct weekday names")
+        spec["days"] = days
+        
+        # Periods are one hour long, so their starts must be at least an hour apart
+        periods = sorted({str(period) for period in spec.get("periods") or TimetableGenerator.DEFAULT_PERIODS}, key=Timetable.parse_period)
+        starts = [Timetable.parse_period(period) for period in periods]
+        if any(later - earlier < 60 for earlier, later in zip(starts, starts[1:])) or starts[-1] > 23 * 60:
+            raise ValueError("Periods must start at least an hour apart and end by midnight")
+        spec["periods"] = periods
+        
+        assignments = spec.get("assignments")
+        if not isinstance(assignments, list) or not assignments:
+            raise ValueError("At least one assignment is required")
+        
+        for index, assignment in enumerate(assignments, start=1):
+            if not isinstance(assignment, dict):
+                raise ValueError(f"Assignment {index} must be an object")
+            if not ObjectId.is_valid(str(assignment.get("faculty_id", ""))):
+                raise ValueError(f"Assignment {index} has an invalid faculty_id")
+            if not assignment.get("group_id") or not assignment.get("subject"):
+                raise ValueError(f"Assignment {index} needs a group_id and a subject")
+            try:
+                hours = int(assignment.get("hours_per_week"))
+            except (TypeError, ValueError):
+                raise ValueError(f"Assignment {index} needs a whole number of hours_per_week")
+            if not 1 <= hours <= len(days) * len(periods):
+                raise ValueError(f"Assignment {index} has an impossible number of hours_per_week")
+            
+            assignment.update(
+                faculty_id=str(assignment["faculty_id"]),
+                group_id=str(assignment["group_id"]),
+                subject=str(assignment["subject"]),
+                hours_per_week=hours
+            )
+        
+        faculty_ids = {assignment["faculty_id"] for assignment in assignments}
+        found = TimetableGenerator.get_db().users.count_documents(
+            {"_id": {"$in": [ObjectId(faculty_id) for faculty_id in faculty_ids]}, "role": "faculty"}
+        )
+        if found != len(faculty_ids):
+            raise ValueError("Every assignment must refer to an existing faculty member")
+        
+        for entry in spec.setdefault("unavailability", []):
+            if not isinstance(entry, dict) or entry.get("faculty_id") not in faculty_ids or entry.get("day") not in Timetable.WEEKDAYS:
+                raise ValueError("Unavailability entries need a faculty_id from the assignments and a day")
+            if entry.get("period") is not None:
+                entry["period"] = str(entry["period"])
+                Timetable.parse_period(entry["period"])
+        
+        if bool(spec.get("semester_start_date")) != bool(spec.get("semester_end_date")):
+            raise ValueError("Give both semester dates or neither")
+        if spec.get("semester_start_date"):
+            start = TimetableGenerator._parse_date(spec["semester_start_date"], "semester_start_date")
+            end = TimetableGenerator._parse_date(spec["semester_end_date"], "semester_end_date")
+            if end < start:
+                raise ValueError("Semester end date must not be before the start date")
+        
+        try:
+            spec["seconds"] = float(spec.get("seconds") or current_app.config.get('TIMETABLE_SOLVER_SECONDS', 60))
+            spec["restarts"] = int(spec["restarts"]) if spec.get("restarts") else None
+        except (TypeError, ValueError):
+            raise ValueError("Seconds and restarts must be numbers")
+        if not 1 <= spec["seconds"] <= TimetableGenerator.MAX_SECONDS:
+            raise ValueError(f"Seconds must be between 1 and {TimetableGenerator.MAX_SECONDS}")
+        if spec["restarts"] is not None and not 1 <= spec["restarts"] <= TimetableGenerator.MAX_RESTARTS:
+            raise ValueError(f"Restarts must be between 1 and {TimetableGenerator.MAX_RESTARTS}")
+        
+        spec["use_rooms"] = bool(spec.get("use_rooms", True))
+        spec["sync_sessions"] = bool(spec.get("sync_sessions", True))
+        spec["dry_run"] = bool(spec.get("dry_run", False))
+        
+        return spec
+    
+    @staticmethod
+    def _holiday_weights(spec):
+        """Count the holidays that fall on each weekday of the semester"""
+        if not spec.get("semester_start_date"):
+            return None
+        
+        start = TimetableGenerator._parse_date(spec["semester_start_date"], "semester_start_date")
+        end = TimetableGenerator._parse_date(spec["semester_end_date"], "semester_end_date")
+        weights = Counter()
+        
+        # Recurring holidays repeat on the same date every year
+        query = {"$or": [
+            {"date": {
+                "$gte": datetime.datetime.combine(start, datetime.time.min),
+                "$lte": datetime.datetime.combine(end, datetime.time.max)
+            }},
+            {"is_recurring": True}
+        ]}
+        for holiday in TimetableGenerator.get_db().holidays.find(query, {"date": 1, "is_recurring": 1}):
+            dates = [holiday["date"].date()]
+            if holiday.get("is_recurring"):
+                dates = []
+                for year in range(start.year, end.year + 1):
+                    try:
+                        dates.append(holiday["date"].date().replace(year=year))
+                    except ValueError:
+                        pass  # 29 February in a non-leap year
+            
+            for date in dates:
+                if start <= date <= end:
+                    weights[Timetable.WEEKDAYS[date.weekday()]] += 1
+        
+        return dict(weights)
+    
+    @staticmethod
+    def build_problem(spec):
+        """Load everything a validated spec depends on and encode the solver problem"""
+        db = TimetableGenerator.get_db()
+        days, periods = spec["days"], spec["periods"]
+        faculty_ids = {assignment["faculty_id"] for assignment in spec["assignments"]}
+        group_ids = {assignment["group_id"] for assignment in spec["assignments"]}
+        
+        sizes = {
+            group["_id"]: group["count"]
+            for group in db.users.aggregate([
+                {"$match": {"role": "student", "group_id": {"$in": list(group_ids)}}},
+                {"$group": {"_id": "$group_id", "count": {"$sum": 1}}}
+            ])
+        }
+        
+        lessons = [
+            {
+                "faculty": assignment["faculty_id"],
+                "group": assignment["group_id"],
+                "subject": assignment["subject"],
+                "hours": assignment["hours_per_week"],
+                "size": sizes.get(assignment["group_id"], 0)
+            }
+            for assignment in spec["assignments"]
+        ]
+        
+        # Slots kept by faculty outside the spec stay taken for their groups and rooms
+        grid = {period: Timetable.slot_bounds(period, {}) for period in periods}
+        blocked_groups, blocked_rooms = [], []
+        fixed_slots = db.timetable_slots.find(
+            {"faculty_id": {"$nin": [ObjectId(faculty_id) for faculty_id in faculty_ids]}, "day": {"$in": days}},
+            {"group_id": 1, "room_id": 1, "day": 1, "start": 1, "end": 1}
+        )
+        for slot in fixed_slots:
+            for period, (start, end) in grid.items():
+                if slot["start"] < end and slot["end"] > start:
+                    if slot.get("group_id") in group_ids:
+                        blocked_groups.append((slot["group_id"], slot["day"], period))
+                    if slot.get("room_id"):
+                        blocked_rooms.append((slot["room_id"], slot["day"], period))
+        
+        rooms = None
+        if spec["use_rooms"]:
+            rooms = [
+                (str(room["_id"]), room["capacity"])
+                for room in Room.list_all(active_only=True, fields=["capacity"])
+            ] or None  # No rooms set up yet
+        
+        return encode(
+            days,
+            periods,
+            lessons,
+            rooms=rooms,
+            unavailable=[(entry["faculty_id"], entry["day"], entry.get("period")) for entry in spec["unavailability"]],
+            blocked_groups=blocked_groups,
+            blocked_rooms=blocked_rooms,
+            day_weights=TimetableGenerator._holiday_weights(spec)
+        )
+    
+    @staticmethod
+    def run(spec, progress=None):
+        """Generate and, unless it is a dry run, write the timetables for a spec
+        
+        Raises ValueError if the spec cannot be met or no clash-free
+        timetable is found within the time budget.
+        """
+        problem = TimetableGenerator.build_problem(spec)
+        workers = current_app.config.get('TIMETABLE_SOLVER_WORKERS') or os.cpu_count() or 1
+        restarts = spec.get("restarts") or current_app.config.get('TIMETABLE_SOLVER_RESTARTS') or workers
+        
+        result = solve_parallel(
+            problem,
+            restarts,
+            workers,
+            spec["seconds"],
+            progress=(lambda fraction: progress(fraction * 0.9, "Searching for a timetable")) if progress else None
+        )
+        
+        if result["hard"]:
+            raise ValueError(
+                f"No clash-free timetable found within {spec['seconds']:g} seconds "
+                f"({result['hard']} clashes left); allow more time or relax the constraints"
+            )
+        
+        schedules = decode(problem, result)
+        report = {
+            "faculty": len(schedules),
+            "hours": len(problem["units"]),
+            "soft_cost": result["soft"],
+            "restarts": result["restarts"],
+            "iterations": result["iterations"],
+            "seconds": result["seconds"]
+        }
+        
+        if spec.get("dry_run"):
+            report["schedules"] = schedules
+            return report
+        
+        if progress:
+            progress(0.9, "Writing timetables")
+        previous = Timetable.replace_schedules(schedules)
+        report["written"] = len(schedules)
+        
+        # Bring already generated sessions in line with the new timetables
+        if spec.get("sync_sessions", True):
+            sessions = Counter()
+            for faculty_id, schedule in schedules.items():
+                summary = ClassSession.sync_with_timetable(faculty_id, previous[faculty_id], schedule)
+                sessions.update({key: summary[key] for key in ("inserted", "updated", "cancelled")})
+            report["sessions"] = dict(sessions)
+        
+        return report
\ No newline at end of file
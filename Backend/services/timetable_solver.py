@@ -0,0 +1,487 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from collections import defaultdict
+import random
+import time
+
+from utils.helpers import process_context
+
+# Set in pool workers so a restart that finds a perfect timetable can stop the rest
+_stop_event = None
+
+def _init_worker(stop_event):
+    """Keep the shared stop event in a pool worker"""
+    global _stop_event
+    _stop_event = stop_event
+
+def encode(days, periods, lessons, rooms=None, unavailable=(), blocked_groups=(), blocked_rooms=(), day_weights=None):
+    """Build a solver problem from plain lesson requirements
+    
+    lessons are dicts with faculty, group, subject, hours (per week) and
+    size (students). rooms are (room_id, capacity) pairs, or None to ignore
+    rooms. unavailable holds (faculty, day, period) and blocked_groups and
+    blocked_rooms hold (group, day, period) and (room_id, day, period)
+    taken by timetables outside the problem; a period of None covers the
+    whole day. day_weights is the soft cost of one hour on each day.
+    Raises ValueError if a lesson, faculty member or group has fewer open
+    slots than weekly hours.
+    """
+    slots = [(day, period) for day in days for period in periods]
+    faculty_index, group_index, subject_index = {}, {}, {}
+    
+    def blocked(entries):
+        taken = defaultdict(set)
+        for owner, day, period in entries:
+            taken[owner].update(
+                index for index, (slot_day, slot_period) in enumerate(slots)
+                if slot_day == day and period in (None, slot_period)
+            )
+        return taken
+    
+    faculty_blocked = blocked(unavailable)
+    group_blocked = blocked(blocked_groups)
+    room_blocked = blocked(blocked_rooms)
+    
+    encoded = []
+    units = []
+    for lesson in lessons:
+        domain = [
+            index for index in range(len(slots))
+            if index not in faculty_blocked[lesson["faculty"]] and index not in group_blocked[lesson["group"]]
+        ]
+        if len(domain) < lesson["hours"]:
+            raise ValueError(
+                f"{lesson['subject']} for group {lesson['group']} needs {lesson['hours']} hours "
+                f"but only {len(domain)} slots are open"
+            )
+        
+        encoded.append((
+            faculty_index.setdefault(lesson["faculty"], len(faculty_index)),
+            group_index.setdefault(lesson["group"], len(group_index)),
+            subject_index.setdefault((lesson["group"], lesson["subject"]), len(subject_index)),
+            lesson.get("size", 0),
+            domain
+        ))
+        units += [len(encoded) - 1] * lesson["hours"]
+    
+    # Nobody can be taught or teach more hours than they have open slots
+    for position, name in ((0, "faculty member"), (1, "group")):
+        hours, open_slots = defaultdict(int), defaultdict(set)
+        for lesson, (faculty, group, _, _, domain) in zip(lessons, encoded):
+            owner = lesson["faculty"] if position == 0 else lesson["group"]
+            hours[owner] += lesson["hours"]
+            open_slots[owner].update(domain)
+        for owner, total in hours.items():
+            if total > len(open_slots[owner]):
+                raise ValueError(f"{name.capitalize()} {owner} needs {total} hours but only {len(open_slots[owner])} slots are open")
+    
+    # Free rooms per slot as (capacity, room) pairs, largest first
+    room_ids = [room_id for room_id, _ in rooms] if rooms is not None else None
+    slot_rooms = None
+    if rooms is not None:
+        slot_rooms = [
+            sorted(
+                ((capacity, index) for index, (room_id, capacity) in enumerate(rooms) if slot not in room_blocked[room_id]),
+                reverse=True
+            )
+            for slot in range(len(slots))
+        ]
+    
+    # Only differences between days matter, so the lightest day costs nothing
+    day_weights = day_weights or {}
+    lightest = min((day_weights.get(day, 0) for day in days), default=0)
+    
+    return {
+        "days": list(days),
+        "periods": list(periods),
+        "lessons": lessons,
+        "encoded": encoded,
+        "units": units,
+        "faculty_count": len(faculty_index),
+        "group_count": len(group_index),
+        "room_ids": room_ids,
+        "slot_rooms": slot_rooms,
+        "day_weights": [day_weights.get(day, 0) - lightest for day in days]
+    }
+
+def decode(problem, result):
+    """Turn a solver result into weekly schedules keyed by faculty
+    
+    Each slot holds the group, subject, a one hour duration and the room
+    when rooms were part of the problem.
+    """
+    periods = problem["periods"]
+    schedules = {}
+    
+    for unit, slot in enumerate(result["slots"]):
+        lesson = problem["lessons"][problem["units"][unit]]
+        day, period = problem["days"][slot // len(periods)], periods[slot % len(periods)]
+        schedule = schedules.setdefault(lesson["faculty"], {day: {} for day in problem["days"]})
+        
+        data = {"group_id": lesson["group"], "subject": lesson["subject"], "duration": 1}
+        if result["rooms"] and result["rooms"][unit] is not None:
+            data["room_id"] = problem["room_ids"][result["rooms"][unit]]
+        schedule[day][period] = data
+    
+    return schedules
+
+def solve(problem, seed, seconds):
+    """Run one restart of the solver"""
+    return TimetableSolver(problem, seed).run(seconds)
+
+def solve_parallel(problem, restarts, workers, seconds, seed=None, progress=None):
+    """Run independent restarts across a process pool and keep the best
+    
+    The wall clock budget is shared out so all restarts finish within
+    about `seconds`; a restart that reaches zero cost stops the others.
+    progress is called every few seconds with the elapsed fraction of the
+    budget, so with a progress callback even a single worker runs in the
+    pool. Without one, a single worker runs the restarts in-process.
+    """
+    restarts = max(1, restarts)
+    workers = max(1, min(workers, restarts))
+    budget = seconds * workers / restarts
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    started = time.monotonic()
+    results = []
+    
+    if workers == 1 and not progress:
+        for restart in range(restarts):
+            results.append(solve(problem, seed + restart, budget))
+            if TimetableSolver.cost(results[-1]) == 0:
+                break
+    else:
+        context = process_context()
+        stop_event = context.Event()
+        
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(stop_event,)) as executor:
+            pending = {executor.submit(solve, problem, seed + restart, budget) for restart in range(restarts)}
+            
+            try:
+                while pending:
+                    done, pending = wait(pending, timeout=5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.cancelled():
+                            continue
+                        results.append(future.result())
+                        if TimetableSolver.cost(results[-1]) == 0:
+                            stop_event.set()
+                            for other in pending:
+                                other.cancel()
+                    
+                    if progress:
+                        progress(min((time.monotonic() - started) / seconds, 1))
+            except BaseException:
+                # A lost job lease or failed restart stops the running restarts before the pool is shut down
+                stop_event.set()
+                for future in pending:
+                    future.cancel()
+                raise
+    
+    best = min(results, key=TimetableSolver.cost)
+    return {
+        **best,
+        "restarts": len(results),
+        "iterations": sum(result["iterations"] for result in results),
+        "seconds": round(time.monotonic() - started, 3)
+    }
+
+class TimetableSolver:
+    """Weekly timetable search for one restart
+    
+    Every weekly hour of a lesson is a unit placed in one slot of the day
+    by period grid, always within the slots its faculty member and group
+    have open. Hard costs count double-booked faculty members and groups
+    and lessons left without a big enough free room; soft costs count a
+    subject repeated on one day for a group (weighted well above a day's
+    holiday weight) plus the weight of the day of each hour. Units are
+    first placed most constrained first, with forward checking of the
+    slots each lesson still has free, then improved by tabu min-conflicts
+    moves and swaps until the cost is zero, the time runs out or a
+    clash-free timetable stops improving.
+    """
+    
+    HARD_WEIGHT = 1000
+    SPREAD_WEIGHT = 10
+    TABU_TENURE = 10
+    NOISE = 0.02
+    STALL_ITERATIONS = 20000  # Stop a clash-free search that has stopped improving
+    
+    def __init__(self, problem, seed):
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.slot_count = len(problem["days"]) * len(problem["periods"])
+        self.period_count = len(problem["periods"])
+        self.lessons = problem["encoded"]
+        self.unit_lesson = problem["units"]
+        self.slot_rooms = problem["slot_rooms"]
+        self.capacities = [[capacity for capacity, _ in rooms] for rooms in self.slot_rooms] if self.slot_rooms else None
+        self.day_weights = problem["day_weights"]
+        
+        self.slots = [-1] * len(self.unit_lesson)
+        self.faculty_load = [0] * (problem["faculty_count"] * self.slot_count)
+        self.group_load = [0] * (problem["group_count"] * self.slot_count)
+        self.daily = defaultdict(int)
+        self.slot_units = [set() for _ in range(self.slot_count)]
+        self.slot_sizes = [[] for _ in range(self.slot_count)]
+        self.shortage = [0] * self.slot_count
+        self.hard = 0
+        self.soft = 0
+    
+    @staticmethod
+    def cost(result):
+        """Get the weighted cost of a result"""
+        return result["hard"] * TimetableSolver.HARD_WEIGHT + result["soft"]
+    
+    @staticmethod
+    def _room_shortage(sizes, capacities):
+        """Count lessons left without a room when the largest lessons take the largest rooms"""
+        if not sizes:
+            return 0
+        if len(sizes) <= len(capacities) and capacities[len(sizes) - 1] >= max(sizes):
+            return 0
+        
+        room, unplaced = 0, 0
+        for size in sorted(sizes, reverse=True):
+            if room < len(capacities) and capacities[room] >= size:
+                room += 1
+            else:
+                unplaced += 1
+        return unplaced
+    
+    def _delta(self, unit, target):
+        """Get the (hard, soft) cost change of moving a unit to a slot"""
+        faculty, group, subject, size, _ = self.lessons[self.unit_lesson[unit]]
+        current = self.slots[unit]
+        faculty_offset = faculty * self.slot_count
+        group_offset = group * self.slot_count
+        hard, soft = 0, 0
+        
+        if current >= 0:
+            hard -= (self.faculty_load[faculty_offset + current] > 1) + (self.group_load[group_offset + current] > 1)
+        hard += (self.faculty_load[faculty_offset + target] > 0) + (self.group_load[group_offset + target] > 0)
+        
+        if self.capacities:
+            if current >= 0:
+                sizes = list(self.slot_sizes[current])
+                sizes.remove(size)
+                hard += self._room_shortage(sizes, self.capacities[current]) - self.shortage[current]
+            hard += self._room_shortage(self.slot_sizes[target] + [size], self.capacities[target]) - self.shortage[target]
+        
+        target_day = target // self.period_count
+        current_day = current // self.period_count if current >= 0 else None
+        if target_day != current_day:
+            if current_day is not None:
+                soft -= (self.daily[(subject, current_day)] > 1) * self.SPREAD_WEIGHT + self.day_weights[current_day]
+            soft += (self.daily[(subject, target_day)] > 0) * self.SPREAD_WEIGHT + self.day_weights[target_day]
+        
+        return hard, soft
+    
+    def _move(self, unit, target, hard, soft):
+        """Move a unit to a slot, applying its precomputed cost change"""
+        faculty, group, subject, size, _ = self.lessons[self.unit_lesson[unit]]
+        current = self.slots[unit]
+        
+        if current >= 0:
+            self.faculty_load[faculty * self.slot_count + current] -= 1
+            self.group_load[group * self.slot_count + current] -= 1
+            self.daily[(subject, current // self.period_count)] -= 1
+            self.slot_units[current].discard(unit)
+            self.slot_sizes[current].remove(size)
+            if self.capacities:
+                self.shortage[current] = self._room_shortage(self.slot_sizes[current], self.capacities[current])
+        
+        self.faculty_load[faculty * self.slot_count + target] += 1
+        self.group_load[group * self.slot_count + target] += 1
+        self.daily[(subject, target // self.period_count)] += 1
+        self.slot_units[target].add(unit)
+        self.slot_sizes[target].append(size)
+        if self.capacities:
+            self.shortage[target] = self._room_shortage(self.slot_sizes[target], self.capacities[target])
+        
+        self.slots[unit] = target
+        self.hard += hard
+        self.soft += soft
+    
+    def _is_free(self, lesson, slot):
+        """Check that a lesson's faculty member and group are both free in a slot"""
+        faculty, group, _, _, _ = self.lessons[lesson]
+        return (
+            self.faculty_load[faculty * self.slot_count + slot] == 0
+            and self.group_load[group * self.slot_count + slot] == 0
+        )
+    
+    def _construct(self):
+        """Place every unit, most constrained lesson first, with forward checking"""
+        remaining = defaultdict(int)
+        for lesson in self.unit_lesson:
+            remaining[lesson] += 1
+        
+        unplaced = defaultdict(list)
+        for unit, lesson in enumerate(self.unit_lesson):
+            unplaced[lesson].append(unit)
+        
+        # Lessons sharing a faculty member or group lose the same free slots
+        by_faculty, by_group = defaultdict(list), defaultdict(list)
+        for index, (faculty, group, _, _, _) in enumerate(self.lessons):
+            by_faculty[faculty].append(index)
+            by_group[group].append(index)
+        domains = [set(domain) for _, _, _, _, domain in self.lessons]
+        free = [len(domain) for domain in domains]
+        
+        while remaining:
+            lesson = min(remaining, key=lambda index: (free[index] - remaining[index], self.random.random()))
+            unit = unplaced[lesson].pop()
+            faculty, group, _, _, domain = self.lessons[lesson]
+            
+            candidates = [slot for slot in domain if self._is_free(lesson, slot)] or domain
+            best, best_score = None, None
+            for slot in candidates:
+                hard, soft = self._delta(unit, slot)
+                score = (hard * self.HARD_WEIGHT + soft, self.random.random())
+                if best_score is None or score < best_score:
+                    best, best_score = (slot, hard, soft), score
+            
+            slot = best[0]
+            for other in set(by_faculty[faculty] + by_group[group]):
+                if slot in domains[other] and self._is_free(other, slot):
+                    free[other] -= 1
+            
+            self._move(unit, *best)
+            remaining[lesson] -= 1
+            if not remaining[lesson]:
+                del remaining[lesson]
+    
+    def _conflicted_units(self):
+        """Get the units involved in a hard conflict"""
+        units = []
+        for slot in range(self.slot_count):
+            for unit in self.slot_units[slot]:
+                faculty, group, _, _, _ = self.lessons[self.unit_lesson[unit]]
+                if (
+                    self.shortage[slot]
+                    or self.faculty_load[faculty * self.slot_count + slot] > 1
+                    or self.group_load[group * self.slot_count + slot] > 1
+                ):
+                    units.append(unit)
+        return units
+    
+    def _swap_delta(self, unit, other):
+        """Get the cost change of swapping the slots of two units"""
+        unit_slot, other_slot = self.slots[unit], self.slots[other]
+        
+        hard, soft = self._delta(unit, other_slot)
+        self._move(unit, other_slot, hard, soft)
+        other_hard, other_soft = self._delta(other, unit_slot)
+        self._move(unit, unit_slot, -hard, -soft)
+        
+        return hard + other_hard, soft + other_soft
+    
+    def run(self, seconds):
+        """Search for up to `seconds` and return the best assignment found"""
+        started = time.monotonic()
+        deadline = started + seconds
+        self._construct()
+        
+        best_cost = self.hard * self.HARD_WEIGHT + self.soft
+        best = (self.hard, self.soft, list(self.slots))
+        feasible_at = time.monotonic() if not self.hard else None
+        tabu = {}
+        iterations = 0
+        improved_at = 0
+        
+        while best_cost and self.slot_count > 1:
+            if iterations % 32 == 0 and (time.monotonic() >= deadline or (_stop_event and _stop_event.is_set())):
+                break
+            if not best[0] and iterations - improved_at > self.STALL_ITERATIONS:
+                break
+            iterations += 1
+            
+            unit = self.random.choice(self._conflicted_units()) if self.hard else self.random.randrange(len(self.slots))
+            current = self.slots[unit]
+            lesson = self.unit_lesson[unit]
+            cost = self.hard * self.HARD_WEIGHT + self.soft
+            
+            if self.random.random() < self.NOISE:
+                target = self.random.choice(self.lessons[lesson][4])
+                if target != current:
+                    tabu[(unit, current)] = iterations + self.TABU_TENURE
+                    self._move(unit, target, *self._delta(unit, target))
+                continue
+            
+            # Best non-tabu move; a tabu move is allowed if it beats the best so far
+            move, move_score = None, None
+            for target in self.lessons[lesson][4]:
+                if target == current:
+                    continue
+                hard, soft = self._delta(unit, target)
+                score = hard * self.HARD_WEIGHT + soft
+                if tabu.get((unit, target), 0) > iterations and cost + score >= best_cost:
+                    continue
+                if move_score is None or (score, self.random.random()) < move_score:
+                    move, move_score = (target, hard, soft), (score, self.random.random())
+            
+            # Without an improving move, try swapping with a unit of the same group or faculty member
+            if move_score is None or move_score[0] > 0:
+                faculty, group, _, _, _ = self.lessons[lesson]
+                for target in self.lessons[lesson][4]:
+                    if target == current:
+                        continue
+                    for other in self.slot_units[target]:
+                        other_faculty, other_group, _, _, other_domain = self.lessons[self.unit_lesson[other]]
+                        if (other_group != group and other_faculty != faculty) or current not in other_domain:
+                            continue
+                        hard, soft = self._swap_delta(unit, other)
+                        score = hard * self.HARD_WEIGHT + soft
+                        if move_score is None or (score, self.random.random()) < move_score:
+                            move, move_score = (target, hard, soft, other), (score, self.random.random())
+            
+            if move is None:
+                continue
+            
+            tabu[(unit, current)] = iterations + self.TABU_TENURE
+            if len(move) == 4:
+                target, hard, soft, other = move
+                tabu[(other, target)] = iterations + self.TABU_TENURE
+                unit_hard, unit_soft = self._delta(unit, target)
+                self._move(unit, target, unit_hard, unit_soft)
+                self._move(other, current, hard - unit_hard, soft - unit_soft)
+            else:
+                self._move(unit, *move)
+            
+            if self.hard * self.HARD_WEIGHT + self.soft < best_cost:
+                best_cost = self.hard * self.HARD_WEIGHT + self.soft
+                best = (self.hard, self.soft, list(self.slots))
+                improved_at = iterations
+                if not self.hard and feasible_at is None:
+                    feasible_at = time.monotonic()
+        
+        hard, soft, slots = best
+        return {
+            "hard": hard,
+            "soft": soft,
+            "slots": slots,
+            "rooms": self._assign_rooms(slots),
+            "iterations": iterations,
+            "feasible_seconds": round(feasible_at - started, 3) if feasible_at else None,
+            "seed": self.seed
+        }
+    
+    def _assign_rooms(self, slots):
+        """Give the lessons in each slot rooms, largest lesson to largest free room"""
+        if not self.slot_rooms:
+            return None
+        
+        by_slot = defaultdict(list)
+        for unit, slot in enumerate(slots):
+            by_slot[slot].append(unit)
+        
+        rooms = [None] * len(slots)
+        for slot, units in by_slot.items():
+            free = self.slot_rooms[slot]
+            position = 0
+            for unit in sorted(units, key=lambda unit: self.lessons[self.unit_lesson[unit]][3], reverse=True):
+                if position < len(free) and free[position][0] >= self.lessons[self.unit_lesson[unit]][3]:
+                    rooms[unit] = free[position][1]
+                    position += 1
+        
+        return rooms
\ No newline at end of file
@@ -0,0 +1,305 @@
+from flask import current_app
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, InsertOne
+from pymongo.errors import BulkWriteError
+from werkzeug.security import generate_password_hash
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+import csv
+import datetime
+import io
+import json
+import os
+
+from auth.utils import validate_registration_number
+from models.user import User
+from services.cache_bus import cache_bus
+from services.faculty_directory import FacultyDirectory
+from utils.helpers import process_context
+
+class UserImporter:
+    """Bulk import of users from CSV or NDJSON
+    
+    Rows are validated up front, existing registration numbers are found
+    with a single `$in` query, passwords are hashed across a process pool
+    and new users are written with one unordered `bulk_write`. Rows for
+    existing students that carry a `group_id` are reassigned to that group
+    in the same pass. Every rejected row is reported with its line number.
+    
+    Imports too large to finish within a request are staged in
+    `user_imports` and run by a background job, which removes the staged
+    rows once it is done. Passwords are hashed before rows are staged, so
+    only hashes are ever stored, and the rows are split over documents of
+    STAGE_CHUNK_ROWS to stay well under the document size limit. Rows that
+    fall back to the default password share its single hash.
+    """
+    
+    STAGE_CHUNK_ROWS = 1000
+    
+    FIELDS = ["registration_number", "name", "email", "mobile_number", "department", "group_id", "password"]
+    
+    @staticmethod
+    def get_db():
+        """Get the database connection"""
+        return current_app.config['MONGO_DB']
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the index used to read staged imports and expire those never run"""
+        db = UserImporter.get_db()
+        db.user_imports.create_index([("import_id", ASCENDING), ("chunk", ASCENDING)])
+        db.user_imports.create_index([("created_at", ASCENDING)], expireAfterSeconds=24 * 60 * 60)
+    
+    @staticmethod
+    def parse(content, file_format):
+        """Parse CSV or NDJSON content into a list of row dicts"""
+        if isinstance(content, bytes):
+            content = content.decode("utf-8-sig")
+        
+        if file_format == "csv":
+            return [dict(row) for row in csv.DictReader(io.StringIO(content))]
+        
+        if file_format in ("ndjson", "jsonl"):
+            rows = []
+            for line in content.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    rows.append(None)  # Reported as an invalid row
+            return rows
+        
+        raise ValueError(f"Unsupported import format: {file_format}")
+    
+    @staticmethod
+    def _clean_row(row, default_password, hashed=False):
+        """Normalise a row and return (user_data, error)
+        
+        With hashed, the row carries a staged `password_hash` and
+        default_password is already a hash.
+        """
+        if not isinstance(row, dict):
+            return None, "Invalid row"
+        
+        data = {}
+        for field in UserImporter.FIELDS:
+            value = row.get(field)
+            if value is None or value == "":
+                continue
+            data[field] = str(value).strip()
+        
+        if hashed:
+            data.pop("password", None)
+            if row.get("password_hash"):
+                data["password"] = row["password_hash"]
+        
+        if not data.get("registration_number"):
+            return None, "Missing required field: registration_number"
+        
+        if not data.get("mobile_number"):
+            return None, "Missing required field: mobile_number"
+        
+        role = validate_registration_number(data["registration_number"])
+        if not role:
+            return None, "Invalid registration number format"
+        
+        if row.get("role") and row["role"] != role:
+            return None, f"Role {row['role']} does not match registration number"
+        
+        data["role"] = role
+        
+        if "password" not in data:
+            if not default_password:
+                return None, "Missing required field: password"
+            data["password"] = default_password
+        
+        if role != "student":
+            data.pop("group_id", None)
+        
+        return data, None
+    
+    @staticmethod
+    def _hash_passwords(passwords, workers, progress=None):
+        """Hash passwords in parallel across a process pool
+        
+        progress, if given, is called with the number hashed so far.
+        """
+        if workers <= 1 or len(passwords) < 2:
+            hashes = map(generate_password_hash, passwords)
+            executor = None
+        else:
+            chunksize = max(1, len(passwords) // (workers * 4))
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=process_context())
+            hashes = executor.map(generate_password_hash, passwords, chunksize=chunksize)
+        
+        results = []
+        try:
+            for password_hash in hashes:
+                results.append(password_hash)
+                if progress and len(results) % 100 == 0:
+                    progress(len(results))
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+        
+        return results
+    
+    @staticmethod
+    def import_users(rows, default_password=None, workers=None, progress=None, hashed=False):
+        """Validate, hash and insert a batch of user rows
+        
+        Returns a report with the number of created users, the number of
+        existing students reassigned to a group and a per-row error list.
+        Row numbers are 1-based data rows. progress, if given, is called
+        with the fraction done and a message as passwords are hashed.
+        hashed marks staged rows whose passwords were hashed by stage().
+        """
+        workers = workers or current_app.config.get('USER_IMPORT_HASH_WORKERS') or os.cpu_count() or 1
+        errors = []
+        candidates = []
+        seen = set()
+        
+        # Validate every row before touching the database
+        for index, row in enumerate(rows, start=1):
+            data, error = UserImporter._clean_row(row, default_password, hashed)
+            if error:
+                registration_number = row.get("registration_number") if isinstance(row, dict) else None
+                errors.append({"row": index, "registration_number": registration_number, "error": error})
+                continue
+            
+            if data["registration_number"] in seen:
+                errors.append({"row": index, "registration_number": data["registration_number"], "error": "Duplicate registration number in file"})
+                continue
+            
+            seen.add(data["registration_number"])
+            candidates.append((index, data))
+        
+        # Find existing users with one query
+        existing = {
+            user["registration_number"]: user
+            for user in UserImporter.get_db().users.find(
+                {"registration_number": {"$in": list(seen)}},
+                {"registration_number": 1, "role": 1}
+            )
+        }
+        
+        new_rows = []
+        group_assignments = defaultdict(list)
+        for index, data in candidates:
+            user = existing.get(data["registration_number"])
+            if not user:
+                new_rows.append((index, data))
+            elif user.get("role") == "student" and data.get("group_id"):
+                group_assignments[data["group_id"]].append(str(user["_id"]))
+            else:
+                errors.append({"row": index, "registration_number": data["registration_number"], "error": "Registration number already exists"})
+        
+        def hashed_count(count):
+            progress(0.9 * count / len(new_rows), f"Hashed {count} of {len(new_rows)} passwords")
+        
+        # Hash all new passwords in parallel
+        if hashed:
+            hashes = [data["password"] for _, data in new_rows]
+        else:
+            hashes = UserImporter._hash_passwords(
+                [data["password"] for _, data in new_rows],
+                workers,
+                hashed_count if progress else None
+            )
+        
+        now = datetime.datetime.utcnow()
+        users = []
+        for (index, data), password_hash in zip(new_rows, hashes):
+            user = {
+                **data,
+                "password": password_hash,
+                "is_verified": True,
+                "created_at": now,
+                "updated_at": now
+            }
+            if user["role"] == "student":
+                user.setdefault("group_id", None)
+            users.append(user)
+        
+        created = 0
+        if users:
+            try:
+                result = UserImporter.get_db().users.bulk_write([InsertOne(user) for user in users], ordered=False)
+                created = result.inserted_count
+            except BulkWriteError as e:
+                created = e.details.get("nInserted", 0)
+                for write_error in e.details.get("writeErrors", []):
+                    index, data = new_rows[write_error["index"]]
+                    message = "Registration number already exists" if write_error.get("code") == 11000 else write_error.get("errmsg", "Insert failed")
+                    errors.append({"row": index, "registration_number": data["registration_number"], "error": message})
+            
+            # The driver fills in the _id of each inserted document
+            cache_bus.publish("users", [user.get("_id") for user in users])
+            FacultyDirectory.invalidate()
+        
+        # Reassign existing students, one update per group
+        reassigned = 0
+        for group_id, student_ids in group_assignments.items():
+            reassigned += User.update_group_assignment(student_ids, group_id)
+        
+        errors.sort(key=lambda error: error["row"])
+        
+        return {
+            "total": len(rows),
+            "created": created,
+            "reassigned": reassigned,
+            "failed": len(errors),
+            "errors": errors
+        }
+    
+    @staticmethod
+    def stage(rows, default_password=None, workers=None):
+        """Hash the passwords of rows and store them for a background import, returning the staged import ID"""
+        workers = workers or current_app.config.get('USER_IMPORT_HASH_WORKERS') or os.cpu_count() or 1
+        
+        # Hash exactly what _clean_row would read as the password
+        with_password = [
+            index for index, row in enumerate(rows)
+            if isinstance(row, dict) and row.get("password") not in (None, "")
+        ]
+        hashes = UserImporter._hash_passwords([str(rows[index]["password"]).strip() for index in with_password], workers)
+        password_hashes = dict(zip(with_password, hashes))
+        
+        staged_rows = []
+        for index, row in enumerate(rows):
+            if isinstance(row, dict):
+                row = {key: value for key, value in row.items() if key not in ("password", "password_hash")}
+                if index in password_hashes:
+                    row["password_hash"] = password_hashes[index]
+            staged_rows.append(row)
+        
+        import_id = ObjectId()
+        now = datetime.datetime.utcnow()
+        UserImporter.get_db().user_imports.insert_many([
+            {
+                "import_id": import_id,
+                "chunk": chunk,
+                "rows": staged_rows[start:start + UserImporter.STAGE_CHUNK_ROWS],
+                "default_password_hash": generate_password_hash(default_password) if default_password and chunk == 0 else None,
+                "created_at": now
+            }
+            for chunk, start in enumerate(range(0, max(len(staged_rows), 1), UserImporter.STAGE_CHUNK_ROWS))
+        ])
+        
+        return str(import_id)
+    
+    @staticmethod
+    def import_staged(import_id, progress=None):
+        """Import staged rows and remove them, returning the import report"""
+        db = UserImporter.get_db()
+        chunks = list(db.user_imports.find({"import_id": ObjectId(import_id)}).sort("chunk", ASCENDING))
+        if not chunks:
+            raise ValueError("Staged import not found or expired")
+        
+        rows = [row for chunk in chunks for row in chunk["rows"]]
+        report = UserImporter.import_users(rows, chunks[0].get("default_password_hash"), progress=progress, hashed=True)
+        db.user_imports.delete_many({"import_id": chunks[0]["import_id"]})
+        
+        return report
\ No newline at end of file
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+import threading
+import time
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after a fixed time
+    
+    The least recently used entry is evicted once maxsize is reached.
+    """
+    
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Get a cached value, or default if it is missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """Cache a value for ttl seconds (the cache default if not given)"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        """Remove a cached value if present"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Remove all cached values"""
+        with self._lock:
+            self._data.clear()
+
+class SingleFlight:
+    """Coalesce concurrent identical reads within a worker
+    
+    The first caller for a key runs the read while later callers with the
+    same key wait for its result instead of issuing their own query. The
+    result is then kept for a short micro-TTL so a burst of requests that
+    arrive just after it also share it. Keys are a name plus a normalized
+    signature of the query parameters, and results are shared between
+    callers, so they must not be mutated.
+    """
+    
+    def __init__(self, ttl=0.25, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._results = OrderedDict()
+        self._stats = {}
+    
+    @staticmethod
+    def _freeze(value):
+        """Turn query parameters into a hashable value independent of dict order"""
+        if isinstance(value, dict):
+            return tuple(sorted((str(key), SingleFlight._freeze(item)) for key, item in value.items()))
+        if isinstance(value, (list, tuple)):
+            return tuple(SingleFlight._freeze(item) for item in value)
+        if isinstance(value, (set, frozenset)):
+            return tuple(sorted(repr(item) for item in value))
+        return value
+    
+    def _count(self, name, outcome):
+        """Count a call outcome for a name; the caller holds the lock"""
+        stats = self._stats.setdefault(name, {"calls": 0, "executed": 0, "coalesced": 0, "cached": 0, "errors": 0})
+        stats["calls"] += 1
+        stats[outcome] += 1
+    
+    def do(self, name, params, func):
+        """Get the result of func for these parameters, sharing it with identical concurrent calls"""
+        key = (name, SingleFlight._freeze(params))
+        
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._count(name, "cached")
+                return cached[1]
+            
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = {"done": threading.Event(), "result": None, "error": None}
+                self._count(name, "executed")
+            else:
+                self._count(name, "coalesced")
+        
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["result"]
+        
+        try:
+            flight["result"] = func()
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if flight["error"] is None:
+                    self._results[key] = (time.monotonic() + self.ttl, flight["result"])
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.maxsize:
+                        self._results.popitem(last=False)
+                else:
+                    self._stats[name]["errors"] += 1
+            flight["done"].set()
+        
+        return flight["result"]
+    
+    def forget(self, name):
+        """Drop the kept results for a name after a write, so the writer reads its own change"""
+        with self._lock:
+            for key in [key for key in self._results if key[0] == name]:
+                del self._results[key]
+    
+    def get_stats(self):
+        """Get the call counts per name, with the share of calls that skipped a query"""
+        with self._lock:
+            return {
+                name: {
+                    **stats,
+                    "saved_ratio": round((stats["coalesced"] + stats["cached"]) / stats["calls"], 3) if stats["calls"] else 0.0
+                }
+                for name, stats in self._stats.items()
+            }
+
+# Shared by the model read paths of this worker
+single_flight = SingleFlight()
\ No newline at end of file
@@ -0,0 +1,103 @@
+from flask.json.provider import JSONProvider
+from bson.objectid import ObjectId
+import datetime
+import json
+import multiprocessing
+import orjson
+
+def encode_default(obj):
+    """Encode types the JSON and MessagePack libraries do not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        return _isoformat(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", "replace")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _isoformat(value):
+    """Format a datetime as ISO 8601 UTC, treating naive values as UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat() + "Z"
+
+class MongoJSONProvider(JSONProvider):
+    """JSON provider backed by orjson that encodes ObjectId, datetime and date
+    
+    Datetimes are written as ISO 8601 in UTC with a trailing Z (naive
+    values are assumed to be UTC, as Flask's default provider does). Calls
+    with extra json.dumps options such as indent use the standard library.
+    """
+    
+    ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        """Serialize data as a JSON string"""
+        return self.dumps_bytes(obj, **kwargs).decode("utf-8")
+    
+    def dumps_bytes(self, obj, **kwargs):
+        """Serialize data as UTF-8 encoded JSON"""
+        if not kwargs:
+            return orjson.dumps(obj, default=encode_default, option=MongoJSONProvider.ORJSON_OPTIONS)
+        
+        kwargs.setdefault("default", encode_default)
+        kwargs.setdefault("ensure_ascii", False)
+        kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, **kwargs).encode("utf-8")
+    
+    def loads(self, s, **kwargs):
+        """Deserialize data from a JSON string or bytes"""
+        if not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        """Serialize the given arguments as JSON and return a response"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype="application/json")
+
+def parse_fields(value, allowed):
+    """Parse a comma separated ?fields= sparse fieldset
+    
+    Returns None when no fields are requested. Raises ValueError naming
+    any field that is not in allowed.
+    """
+    if not value:
+        return None
+    
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    
+    return fields
+
+def build_projection(fields, derived=None):
+    """Build a MongoDB inclusion projection from a sparse fieldset
+    
+    derived maps computed response fields to the stored field they are
+    looked up from, so that field is fetched in their place.
+    """
+    if fields is None:
+        return None
+    
+    derived = derived or {}
+    return {derived.get(field, field): 1 for field in fields}
+
+def wants(fields, field):
+    """Check whether a sparse fieldset includes a field (None means all fields)"""
+    return fields is None or field in fields
+
+def process_context():
+    """Get the multiprocessing context for process pools
+    
+    Pool processes are started from a forkserver, or spawned where there is
+    none, rather than forked: a forked copy of a server holding a MongoClient
+    and background threads can deadlock on a lock one of those threads held.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
\ No newline at end of file
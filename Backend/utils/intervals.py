@@ -0,0 +1,41 @@
+from bisect import bisect_left
+
+class IntervalIndex:
+    """Static index over half-open [start, end) intervals
+    
+    Intervals are kept sorted by start alongside a running maximum of their
+    ends, which makes the list an implicit interval tree: whether anything
+    overlaps a window is one bisect, and listing the overlaps only walks
+    back over intervals that can still reach the window. Bounds may be any
+    mutually comparable values (datetimes, minutes).
+    """
+    
+    def __init__(self, intervals=()):
+        self._intervals = sorted(intervals, key=lambda interval: interval[0])
+        self._starts = [interval[0] for interval in self._intervals]
+        self._max_ends = []
+        
+        for _, end, _ in self._intervals:
+            self._max_ends.append(max(end, self._max_ends[-1]) if self._max_ends else end)
+    
+    def __len__(self):
+        return len(self._intervals)
+    
+    def any_overlap(self, start, end):
+        """Check whether any interval overlaps [start, end)"""
+        position = bisect_left(self._starts, end)
+        return position > 0 and self._max_ends[position - 1] > start
+    
+    def overlapping(self, start, end):
+        """Get the (start, end, item) intervals that overlap [start, end), by start"""
+        position = bisect_left(self._starts, end) - 1
+        matches = []
+        
+        # Every interval at or before position starts before end; stop once none can reach start
+        while position >= 0 and self._max_ends[position] > start:
+            if self._intervals[position][1] > start:
+                matches.append(self._intervals[position])
+            position -= 1
+        
+        matches.reverse()
+        return matches
\ No newline at end of file
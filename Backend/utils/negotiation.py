@@ -0,0 +1,121 @@
+from flask import current_app, request, has_request_context
+import brotli
+import msgpack
+import zlib
+
+from utils.helpers import MongoJSONProvider, encode_default
+
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+# Body formats worth compressing; event streams must reach clients unbuffered
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/x-msgpack",
+    "text/calendar",
+    "text/csv",
+    "text/plain"
+)
+
+class NegotiatingJSONProvider(MongoJSONProvider):
+    """JSON provider that answers with MessagePack when the client prefers it
+    
+    The body format is picked from the Accept header, so every jsonify
+    response can be served as application/msgpack. Values are encoded the
+    same way in both formats (ObjectIds and datetimes as strings).
+    """
+    
+    def response(self, *args, **kwargs):
+        """Serialize the given arguments as JSON or MessagePack and return a response"""
+        obj = self._prepare_response_obj(args, kwargs)
+        mimetype = "application/json"
+        
+        if has_request_context():
+            mimetype = request.accept_mimetypes.best_match(("application/json",) + MSGPACK_MIMETYPES) or mimetype
+        
+        if mimetype in MSGPACK_MIMETYPES:
+            body = msgpack.packb(obj, default=encode_default)
+        else:
+            body = self.dumps_bytes(obj)
+        
+        response = self._app.response_class(body, mimetype=mimetype)
+        response.vary.add("Accept")
+        return response
+
+def _compressor(encoding):
+    """Get (compress, flush) functions for a streaming compressor"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=current_app.config["BROTLI_QUALITY"])
+        return compressor.process, compressor.finish
+    
+    # wbits of 31 selects the gzip container
+    compressor = zlib.compressobj(current_app.config["GZIP_LEVEL"], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def _chunks(data, size):
+    """Split a body into chunks of at most size bytes"""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def _compress_stream(chunks, compress, flush):
+    """Compress a body chunk by chunk as it is sent"""
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        
+        data = compress(chunk)
+        if data:
+            yield data
+    
+    yield flush()
+
+def compress_response(response):
+    """Compress a response with brotli or gzip when the client accepts it
+    
+    Bodies under COMPRESSION_MIN_BYTES are sent as is. Bodies over
+    COMPRESSION_STREAM_BYTES and streamed responses are compressed chunk by
+    chunk and sent with chunked transfer encoding, so the first bytes go
+    out before the whole body is compressed.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    
+    # Caches must key on the encoding even when this body goes out uncompressed
+    response.vary.add("Accept-Encoding")
+    
+    encoding = request.accept_encodings.best_match(("br", "gzip"))
+    if not encoding:
+        return response
+    
+    config = current_app.config
+    if not response.is_streamed:
+        size = response.content_length or 0
+        if size < config["COMPRESSION_MIN_BYTES"]:
+            return response
+    
+    compress, flush = _compressor(encoding)
+    
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, compress, flush)
+    elif size > config["COMPRESSION_STREAM_BYTES"]:
+        body = response.get_data()
+        response.response = _compress_stream(_chunks(body, config["COMPRESSION_CHUNK_BYTES"]), compress, flush)
+    else:
+        response.set_data(compress(response.get_data()) + flush())
+    
+    if response.is_streamed:
+        response.headers.pop("Content-Length", None)
+    
+    response.headers["Content-Encoding"] = encoding
+    
+    # The compressed body is no longer byte-identical, so only a weak validator still holds
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    
+    return response
\ No newline at end of file
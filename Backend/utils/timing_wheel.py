@@ -0,0 +1,112 @@
+import threading
+
+class TimingWheel:
+    """Hierarchical timing wheel of keyed timers
+    
+    Time is counted in ticks. Level 0 has one slot per tick; each level
+    above has slots that span a whole turn of the level below. A timer is
+    put on the lowest level whose turn reaches its deadline and moves down
+    a level each time the wheel reaches the start of its slot, so adding,
+    removing and expiring a timer are constant time however many are
+    pending. Timers further away than the top level can reach wait in its
+    last slot and are placed again when it comes round.
+    """
+    
+    def __init__(self, tick, slots=64, levels=3, now=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._current = int(now // tick)
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._where = {}
+        self._overdue = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._where) + len(self._overdue)
+    
+    def __contains__(self, key):
+        return key in self._where or key in self._overdue
+    
+    def _place(self, key, deadline, value):
+        """Put a timer in the slot its deadline falls in"""
+        delay = deadline - self._current
+        if delay <= 0:
+            self._overdue[key] = value
+            return
+        
+        # Past the reach of the top level, wait in its last slot
+        deadline_in_reach = min(deadline, self._current + self.slots ** self.levels - 1)
+        delay = deadline_in_reach - self._current
+        
+        level = 0
+        while level < self.levels - 1 and delay >= self.slots ** (level + 1):
+            level += 1
+        
+        slot = (deadline_in_reach // self.slots ** level) % self.slots
+        self._wheels[level][slot][key] = (deadline, value)
+        self._where[key] = (level, slot)
+    
+    def _remove(self, key):
+        """Take a timer off the wheel, returning its value"""
+        if key in self._overdue:
+            return self._overdue.pop(key)
+        
+        where = self._where.pop(key, None)
+        if where is None:
+            return None
+        
+        level, slot = where
+        return self._wheels[level][slot].pop(key)[1]
+    
+    def add(self, key, when, value):
+        """Set the timer of a key to fire at a time, replacing any it had"""
+        with self._lock:
+            self._remove(key)
+            self._place(key, int(when // self.tick), value)
+    
+    def remove(self, key):
+        """Cancel the timer of a key, returning its value or None"""
+        with self._lock:
+            return self._remove(key)
+    
+    def advance(self, now):
+        """Move the wheel up to a time and get the values of the timers that fired"""
+        target = int(now // self.tick)
+        fired = []
+        
+        with self._lock:
+            fired.extend(self._overdue.values())
+            self._overdue.clear()
+            
+            while self._current < target:
+                self._current += 1
+                
+                # Bring the timers of upper slots starting now down a level, top first
+                for level in range(self.levels - 1, 0, -1):
+                    span = self.slots ** level
+                    if self._current % span:
+                        continue
+                    
+                    slot = self._wheels[level][(self._current // span) % self.slots]
+                    timers = list(slot.items())
+                    slot.clear()
+                    for key, (deadline, value) in timers:
+                        del self._where[key]
+                        self._place(key, deadline, value)
+                
+                slot = self._wheels[0][self._current % self.slots]
+                timers = list(slot.items())
+                slot.clear()
+                for key, (deadline, value) in timers:
+                    del self._where[key]
+                    if deadline > self._current:
+                        self._place(key, deadline, value)  # Still out of reach of a single level
+                    else:
+                        fired.append(value)
+            
+            # Timers cascaded onto the current tick
+            fired.extend(self._overdue.values())
+            self._overdue.clear()
+        
+        return fired
\ No newline at end of file
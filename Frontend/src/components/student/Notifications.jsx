@@ -5,6 +5,7 @@ import Button from '../common/Button';
 import Spinner from '../common/Spinner';
 import { useToast } from '../../context/ToastContext';
 import studentService from '../../services/studentService';
+import eventService from '../../services/eventService';
 
 const Notifications = () => {
   const { showSuccess, showError } = useToast();
@@ -17,6 +18,17 @@ const Notifications = () => {
     fetchNotifications();
   }, [showAll]);
 
+  // Refresh when the server pushes a new notification instead of polling
+  useEffect(() => {
+    const unsubscribe = eventService.subscribe((type) => {
+      if (type === 'notification') {
+        fetchNotifications();
+      }
+    });
+
+    return unsubscribe;
+  }, [showAll]);
+
   const fetchNotifications = async () => {
     try {
       setLoading(true);
@@ -56,12 +68,8 @@ const Notifications = () => {
       
       if (unreadNotifications.length === 0) return;
       
-      // Mark each notification as read
-      const promises = unreadNotifications.map(notif => 
-        studentService.markNotificationRead(notif._id)
-      );
-      
-      await Promise.all(promises);
+      // Advance the read watermark in a single request
+      await studentService.markAllNotificationsRead();
       
       // Update state locally
       setNotifications(notifications.map(notif => ({...notif, is_read: true})));
@@ -48,7 +48,7 @@ const Dashboard = () => {
           totalFaculty: facultyResponse.total,
           totalStudents: studentsResponse.total,
           totalHolidays: holidaysResponse.total,
-          conflicts: conflictsResponse?.length || 0
+          conflicts: conflictsResponse?.total || 0
         });
         
         setRecentUsers(usersResponse.users);
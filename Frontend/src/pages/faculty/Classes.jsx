@@ -7,6 +7,7 @@ import Spinner from '../../components/common/Spinner';
 import Modal from '../../components/common/Modal';
 import { useToast } from '../../context/ToastContext';
 import facultyService from '../../services/facultyService';
+import jobService from '../../services/jobService';
 import ClassDetails from '../../components/faculty/ClassDetails';
 import Timetable from '../../components/faculty/Timetable';
 import DatePicker from 'react-datepicker';
@@ -87,9 +88,18 @@ const Classes = () => {
       
       const response = await facultyService.generateClasses(startDateStr, endDateStr);
       
-      showSuccess(`${response.message || 'Classes generated successfully'}`);
+      showSuccess(`${response.message || 'Class generation started'}`);
       setShowGenerateModal(false);
       
+      // Generation runs as a background job; wait for it before refreshing
+      const job = await jobService.waitForJob(response.job_id);
+      if (job.status === 'failed') {
+        showError(job.error || 'Failed to generate classes');
+        return;
+      }
+      
+      showSuccess(job.result?.message || 'Classes generated successfully');
+      
       // Refresh classes
       fetchClasses();
     } catch (error) {
@@ -36,44 +36,19 @@ const Dashboard = () => {
       try {
         setLoading(true);
         
-        // Get today's date range
-        const today = new Date();
-        const todayStr = today.toISOString().split('T')[0];
-        
-        // Get next 7 days
-        const nextWeek = new Date(today);
-        nextWeek.setDate(nextWeek.getDate() + 7);
-        const nextWeekStr = nextWeek.toISOString().split('T')[0];
-        
-        // Fetch classes for today
-        const classesResponse = await facultyService.getFacultyClasses(todayStr, todayStr);
-        
-        // Fetch meetings
-        const approvedMeetingsResponse = await facultyService.getFacultyMeetings(
-          'approved', 
-          todayStr, 
-          nextWeekStr
-        );
-        
-        // Fetch pending meeting requests
-        const pendingMeetingsResponse = await facultyService.getFacultyMeetings('pending');
-        
-        // Fetch activities
-        const activitiesResponse = await facultyService.getFacultyActivities(
-          todayStr, 
-          nextWeekStr
-        );
-        
-        // Fetch all classes for the semester for stats
-        const allClassesResponse = await facultyService.getFacultyClasses();
-        const completedClasses = (allClassesResponse.classes || []).filter(cls => cls.status === 'completed').length;
+        // Fetch the whole dashboard summary in one request
+        const dashboard = await facultyService.getDashboard();
+        const classesResponse = { classes: dashboard.classes.today };
+        const approvedMeetingsResponse = { meetings: dashboard.meetings.upcoming };
+        const pendingMeetingsResponse = { meetings: dashboard.meetings.pending };
+        const activitiesResponse = { activities: dashboard.activities.upcoming };
         
         // Update stats
         setStats({
-          totalClasses: allClassesResponse.total || allClassesResponse.classes?.length || 0,
-          completedClasses: completedClasses,
-          pendingMeetings: pendingMeetingsResponse.total || pendingMeetingsResponse.meetings?.length || 0,
-          activities: activitiesResponse.total || activitiesResponse.activities?.length || 0
+          totalClasses: dashboard.classes.total,
+          completedClasses: dashboard.classes.by_status.completed || 0,
+          pendingMeetings: dashboard.meetings.pending_count,
+          activities: dashboard.activities.total
         });
         
         // Compile all events for calendar
@@ -23,35 +23,14 @@ const Dashboard = () => {
       try {
         setLoading(true);
         
-        // Get date ranges
-        const today = new Date();
-        const todayStr = today.toISOString().split('T')[0];
-        
-        const tomorrow = new Date(today);
-        tomorrow.setDate(tomorrow.getDate() + 1);
-        const tomorrowStr = tomorrow.toISOString().split('T')[0];
-        
-        const nextWeek = new Date(today);
-        nextWeek.setDate(nextWeek.getDate() + 7);
-        const nextWeekStr = nextWeek.toISOString().split('T')[0];
-        
-        // Fetch today's classes
-        const todayClassesResponse = await studentService.getStudentClasses(todayStr, todayStr);
-        
-        // Fetch upcoming classes (next 7 days excluding today)
-        const upcomingClassesResponse = await studentService.getStudentClasses(tomorrowStr, nextWeekStr);
-        
-        // Fetch meetings
-        const meetingsResponse = await studentService.getStudentMeetings();
-        
-        // Fetch notifications
-        const notificationsResponse = await studentService.getNotifications(false, 5);
+        // Fetch the whole dashboard summary in one request
+        const dashboard = await studentService.getDashboard();
         
         // Update states
-        setTodayClasses(todayClassesResponse.classes);
-        setUpcomingClasses(upcomingClassesResponse.classes);
-        setMeetings(meetingsResponse.meetings);
-        setNotifications(notificationsResponse.notifications);
+        setTodayClasses(dashboard.classes ? dashboard.classes.today : []);
+        setUpcomingClasses(dashboard.classes ? dashboard.classes.week : []);
+        setMeetings([...dashboard.meetings.pending, ...dashboard.meetings.upcoming]);
+        setNotifications(dashboard.notifications);
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
         showError('Failed to load dashboard data');
@@ -54,6 +54,15 @@ const adminService = {
   // Conflict Resolution
   getConflicts: async () => {
     return await apiService.get('/admin/conflicts');
+  },
+
+  rescanConflicts: async () => {
+    return await apiService.post('/admin/conflicts/rescan');
+  },
+
+  // Timetable Generation (queued; poll the returned job_id)
+  generateTimetables: async (spec) => {
+    return await apiService.post('/admin/timetables/generate', spec);
   }
 };
 
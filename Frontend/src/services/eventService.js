@@ -0,0 +1,30 @@
+const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/api';
+
+const EVENT_TYPES = ['notification', 'class_cancelled', 'class_rescheduled', 'meeting_status'];
+
+const eventService = {
+  // Subscribe to pushed notifications and schedule changes.
+  // Returns a function that closes the stream.
+  subscribe: (onEvent) => {
+    const token = localStorage.getItem('token');
+    if (!token || typeof EventSource === 'undefined') {
+      return () => {};
+    }
+
+    const source = new EventSource(`${API_URL}/events/stream?token=${encodeURIComponent(token)}`);
+
+    EVENT_TYPES.forEach((type) => {
+      source.addEventListener(type, (event) => {
+        try {
+          onEvent(type, JSON.parse(event.data));
+        } catch (error) {
+          console.error('Failed to parse event:', error);
+        }
+      });
+    });
+
+    return () => source.close();
+  }
+};
+
+export default eventService;
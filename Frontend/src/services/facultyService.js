@@ -1,6 +1,16 @@
 import apiService from './apiService';
 
 const facultyService = {
+  // Dashboard
+  getDashboard: async () => {
+    return await apiService.get('/faculty/dashboard');
+  },
+
+  // Calendar Feed
+  getCalendarFeed: async (rotate = false) => {
+    return await apiService.post('/faculty/calendar-feed', { rotate });
+  },
+
   // Timetable Management
   getFacultyTimetable: async () => {
     return await apiService.get('/faculty/timetable');
@@ -46,8 +56,13 @@ const facultyService = {
     return await apiService.put(`/faculty/classes/${classId}/cancel`, { reason });
   },
 
-  rescheduleClass: async (classId, newDate, notes) => {
-    return await apiService.post(`/faculty/classes/${classId}/reschedule`, { new_date: newDate, notes });
+  rescheduleClass: async (classId, newDate, notes, roomId) => {
+    return await apiService.post(`/faculty/classes/${classId}/reschedule`, { new_date: newDate, notes, room_id: roomId });
+  },
+
+  // Pass a null roomId to clear the class's room
+  assignClassRoom: async (classId, roomId) => {
+    return await apiService.put(`/faculty/classes/${classId}/room`, { room_id: roomId });
   },
 
   // Activity Management
@@ -98,6 +113,17 @@ const facultyService = {
     if (startDate) params.start_date = startDate;
     if (endDate) params.end_date = endDate;
     return await apiService.get('/faculty/holidays', params);
+  },
+
+  // History Search (pass the returned next_cursor to get the next page)
+  searchHistory: async (query, { types, startDate, endDate, groupId, cursor, limit = 20 } = {}) => {
+    const params = { q: query, limit };
+    if (types) params.types = types.join(',');
+    if (startDate) params.start_date = startDate;
+    if (endDate) params.end_date = endDate;
+    if (groupId) params.group_id = groupId;
+    if (cursor) params.cursor = cursor;
+    return await apiService.get('/faculty/search', params);
   }
 };
 
@@ -0,0 +1,26 @@
+import apiService from './apiService';
+
+const FINISHED_STATUSES = ['succeeded', 'failed'];
+
+const jobService = {
+  getJob: async (jobId) => {
+    return await apiService.get(`/jobs/${jobId}`);
+  },
+
+  // Poll a background job until it succeeds or fails
+  waitForJob: async (jobId, intervalMs = 1000, timeoutMs = 5 * 60 * 1000) => {
+    const deadline = Date.now() + timeoutMs;
+
+    while (Date.now() < deadline) {
+      const { job } = await jobService.getJob(jobId);
+      if (FINISHED_STATUSES.includes(job.status)) {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+
+    throw { error: 'Timed out waiting for the job to finish' };
+  }
+};
+
+export default jobService;
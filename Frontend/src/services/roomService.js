@@ -0,0 +1,37 @@
+import apiService from './apiService';
+
+const roomService = {
+  getRooms: async (roomType, minCapacity) => {
+    const params = {};
+    if (roomType) params.room_type = roomType;
+    if (minCapacity) params.min_capacity = minCapacity;
+    return await apiService.get('/rooms', params);
+  },
+
+  // Rooms of at least minCapacity with nothing booked between start and end
+  getAvailableRooms: async (start, end, minCapacity, roomType) => {
+    const params = { start, end };
+    if (minCapacity) params.min_capacity = minCapacity;
+    if (roomType) params.room_type = roomType;
+    return await apiService.get('/rooms/available', params);
+  },
+
+  getRoomBookings: async (roomId, start, end) => {
+    return await apiService.get(`/rooms/${roomId}/bookings`, { start, end });
+  },
+
+  // Admin only
+  createRoom: async (roomData) => {
+    return await apiService.post('/rooms', roomData);
+  },
+
+  updateRoom: async (roomId, roomData) => {
+    return await apiService.put(`/rooms/${roomId}`, roomData);
+  },
+
+  deleteRoom: async (roomId) => {
+    return await apiService.delete(`/rooms/${roomId}`);
+  }
+};
+
+export default roomService;
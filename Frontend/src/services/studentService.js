@@ -1,6 +1,16 @@
 import apiService from './apiService';
 
 const studentService = {
+  // Dashboard
+  getDashboard: async () => {
+    return await apiService.get('/student/dashboard');
+  },
+
+  // Calendar Feed
+  getCalendarFeed: async (rotate = false) => {
+    return await apiService.post('/student/calendar-feed', { rotate });
+  },
+
   // Timetable Management
   getStudentTimetable: async () => {
     return await apiService.get('/student/timetable');
@@ -25,6 +35,14 @@ const studentService = {
     return await apiService.get('/student/faculty-list');
   },
 
+  // Search Faculty Members by name or department prefix
+  searchFacultyMembers: async (query, department, limit = 20, skip = 0) => {
+    const params = { limit, skip };
+    if (query) params.q = query;
+    if (department) params.department = department;
+    return await apiService.get('/student/faculty-list', params);
+  },
+
   // Meeting Management
   getStudentMeetings: async (status) => {
     const params = {};
@@ -49,6 +67,18 @@ const studentService = {
 
   markNotificationRead: async (notificationId) => {
     return await apiService.put(`/student/notifications/${notificationId}/read`);
+  },
+
+  markNotificationsRead: async (notificationIds) => {
+    return await apiService.put('/student/notifications/read', { notification_ids: notificationIds });
+  },
+
+  markAllNotificationsRead: async () => {
+    return await apiService.put('/student/notifications/read-all');
+  },
+
+  getUnreadCount: async () => {
+    return await apiService.get('/student/notifications/unread-count');
   }
 };
 